@@ -1,9 +1,28 @@
 import flet as ft
 import requests
-import pandas as pd
 
-# Cargar datos del CSV para obtener las opciones de los dropdowns
-df = pd.read_csv('chollos.csv')
+from offer_client import API_URL, NetworkThreads, OfferPager, fetch_similar
+
+# Alto fijo de cada tarjeta: la lista sólo construye las que se ven
+OFFER_HEIGHT = 190
+# Se pide la página siguiente cuando faltan estas tarjetas para llegar al final
+PREFETCH_OFFERS = 10
+
+# Peticiones al backend desde unos pocos hilos, cada uno con su sesión (keep-alive):
+# requests.Session no se puede compartir entre hilos
+network = NetworkThreads(requests.Session)
+
+def load_facets():
+    # Valores de los desplegables del catálogo que sirve el backend (GET /facets)
+    try:
+        response = network.session().get(f"{API_URL}/facets", timeout=5)
+        response.raise_for_status()
+        return response.json()["facets"], None
+    except Exception as e:
+        return {}, f"🚨 No se pudieron cargar los filtros: {str(e)}"
+
+def facet_options(facets, key):
+    return [ft.dropdown.Option(str(value)) for value in facets.get(key, {}).get("values", [])]
 
 def main(page: ft.Page):
     page.title = "Buscador de Ofertas de Portátiles"
@@ -12,16 +31,63 @@ def main(page: ft.Page):
     page.theme_mode = ft.ThemeMode.LIGHT
 
     def format_offer(offer):
-        return f"""
-        🖥️ {offer.get('Procesador', 'N/A')}
-        💾 {offer.get('RAM', 'N/A')}GB {offer.get('Tipo RAM', 'N/A')}
-        💽 {offer.get('Almacenamiento', 'N/A')}GB | 🎮 {offer.get('Graficos', 'N/A')}
-        📺 {offer.get('Pantalla', 'N/A')}\" {offer.get('Resolucion', 'N/A')}
-        🔋 {offer.get('Bateria', 'N/A')}Wh | 💰 {offer.get('Precio', 'N/A')}€
-        🔍 IA: {'✅ CH0LLO' if offer.get('Prediccion_IA') == 1 else '❌ Regular'} 
-        📊 Prob: {offer.get('Probabilidad_IA', 'N/A')}%
-        {'='*40}
-        """
+        return f"""🖥️ {offer.get('Procesador', 'N/A')}
+💾 {offer.get('RAM', 'N/A')}GB {offer.get('Tipo RAM', 'N/A')}
+💽 {offer.get('Almacenamiento', 'N/A')}GB | 🎮 {offer.get('Graficos', 'N/A')}
+📺 {offer.get('Pantalla', 'N/A')}\" {offer.get('Resolucion', 'N/A')}
+🔋 {offer.get('Bateria', 'N/A')}Wh | 💰 {offer.get('Precio', 'N/A')}€
+🔍 IA: {'✅ CH0LLO' if offer.get('Prediccion_IA') == 1 else '❌ Regular'}
+📊 Prob: {offer.get('Probabilidad_IA', 'N/A')}%"""
+
+    def price_delta(offer):
+        delta = offer.get('price_delta_pct')
+        return f"{delta:+.1f}% vs mediana" if delta is not None else "sin mediana"
+
+    def format_similar(offer):
+        return (f"🖥️ {offer.get('Procesador', 'N/A')} | 💾 {offer.get('RAM', 'N/A')}GB | "
+                f"💽 {offer.get('Almacenamiento', 'N/A')}GB | 💰 {offer.get('Precio', 'N/A')}€ ({price_delta(offer)})")
+
+    # Llega desde el hilo de la petición (fetch_similar)
+    def show_similar(data):
+        offer = data["offer"]
+        dialog = ft.AlertDialog(
+            title=ft.Text(f"Similares a {offer.get('Procesador', 'N/A')} ({offer.get('Precio', 'N/A')}€)"),
+            content=ft.Column([
+                ft.Text(f"📐 {data['partition']} | mediana {data['median_price']}€ | "
+                        f"esta oferta: {price_delta(offer)}", size=13),
+                *(ft.Text(format_similar(o), selectable=True, size=13) for o in data["similar"]),
+            ], tight=True, scroll=ft.ScrollMode.AUTO),
+        )
+        page.dialog = dialog
+        dialog.open = True
+        page.update()
+
+    def offer_card(offer, catalog_version):
+        similar_button = ft.IconButton(icon=ft.icons.COMPARE_ARROWS, tooltip="Portátiles similares",
+                                       on_click=lambda e: fetch_similar(network, offer["id"], catalog_version,
+                                                                        show_similar, show_error))
+        return ft.Card(content=ft.Container(ft.Row([
+            ft.Text(format_offer(offer), selectable=True, size=14, expand=True),
+            similar_button,
+        ], vertical_alignment=ft.CrossAxisAlignment.START), padding=10))
+
+    # Llegan desde el hilo de la petición (OfferPager)
+    def show_page(offers, offset, total):
+        if offset == 0:
+            results.controls.clear()
+            results.scroll_to(offset=0)
+        results.controls.extend(offer_card(o, pager.catalog_version) for o in offers)
+        if total:
+            result_text.value = f"📦 {total} ofertas (mostrando {len(results.controls)})"
+        else:
+            result_text.value = "⚠️ No se encontraron resultados"
+        page.update()
+
+    def show_error(message):
+        result_text.value = message
+        page.update()
+
+    pager = OfferPager(network, show_page, show_error)
 
     def search_offers(e):
         params = {
@@ -37,50 +103,42 @@ def main(page: ft.Page):
             "price": price.value
         }
 
+        # No bloquea: la búsqueda sale en segundo plano y anula la anterior
         result_text.value = "Buscando ofertas..."
+        pager.search(params)
         page.update()
 
-        try:
-            response = requests.post(
-                "http://localhost:5000/search_offers",
-                json=params,
-                timeout=15
-            )
-
-            if response.status_code == 200:
-                offers = response.json().get("offers", [])
-                result_text.value = "\n".join([format_offer(o) for o in offers]) if offers else "⚠️ No se encontraron resultados"
-            else:
-                result_text.value = f"❌ Error del servidor ({response.status_code})"
-
-        except Exception as e:
-            result_text.value = f"🚨 Error de conexión: {str(e)}"
-        
-        page.update()
+    def on_scroll(e):
+        if e.pixels >= e.max_scroll_extent - PREFETCH_OFFERS * OFFER_HEIGHT:
+            pager.load_more()
 
-    # Obtener opciones únicas para los dropdowns
-    ram_options = [ft.dropdown.Option(str(value)) for value in df['RAM'].unique()]
-    ram_type_options = [ft.dropdown.Option(value) for value in df['Tipo RAM'].unique()]
-    storage_options = [ft.dropdown.Option(str(value)) for value in df['Almacenamiento'].unique()]
-    graphics_options = [ft.dropdown.Option(value) for value in df['Graficos'].unique()]
-    screen_options = [ft.dropdown.Option(str(value)) for value in df['Pantalla'].unique()]
-    resolution_options = [ft.dropdown.Option(value) for value in df['Resolucion'].unique()]
-    os_options = [ft.dropdown.Option(value) for value in df['Sistema Operativo'].unique()]
-    battery_options = [ft.dropdown.Option(str(value)) for value in df['Bateria'].unique()]
+    # Obtener opciones únicas para los dropdowns (las calcula el backend)
+    facets, facets_error = load_facets()
+    ram_options = facet_options(facets, "ram")
+    ram_type_options = facet_options(facets, "ramType")
+    storage_options = facet_options(facets, "storage")
+    graphics_options = facet_options(facets, "graphics")
+    screen_options = facet_options(facets, "screen")
+    resolution_options = facet_options(facets, "resolution")
+    os_options = facet_options(facets, "os")
+    battery_options = facet_options(facets, "battery")
 
     # Componentes UI
-    processor = ft.TextField(label="Procesador", expand=True)
-    ram = ft.Dropdown(label="RAM mínima (GB)", options=ram_options, width=150)
-    ram_type = ft.Dropdown(label="Tipo RAM", options=ram_type_options, width=150)
-    storage = ft.Dropdown(label="Almacenamiento (GB)", options=storage_options, width=150)
-    graphics = ft.Dropdown(label="Tarjeta gráfica", options=graphics_options, width=150)
-    screen = ft.Dropdown(label="Tamaño pantalla", options=screen_options, width=150)
-    resolution = ft.Dropdown(label="Resolución", options=resolution_options, width=150)
-    os = ft.Dropdown(label="Sistema operativo", options=os_options, width=150)
-    battery = ft.Dropdown(label="Batería (Wh)", options=battery_options, width=150)
-    price = ft.TextField(label="Precio máximo (€)", width=150)
+    processor = ft.TextField(label="Procesador", expand=True, on_change=search_offers)
+    ram = ft.Dropdown(label="RAM mínima (GB)", options=ram_options, width=150, on_change=search_offers)
+    ram_type = ft.Dropdown(label="Tipo RAM", options=ram_type_options, width=150, on_change=search_offers)
+    storage = ft.Dropdown(label="Almacenamiento (GB)", options=storage_options, width=150, on_change=search_offers)
+    graphics = ft.Dropdown(label="Tarjeta gráfica", options=graphics_options, width=150, on_change=search_offers)
+    screen = ft.Dropdown(label="Tamaño pantalla", options=screen_options, width=150, on_change=search_offers)
+    resolution = ft.Dropdown(label="Resolución", options=resolution_options, width=150, on_change=search_offers)
+    os = ft.Dropdown(label="Sistema operativo", options=os_options, width=150, on_change=search_offers)
+    battery = ft.Dropdown(label="Batería (Wh)", options=battery_options, width=150, on_change=search_offers)
+    price = ft.TextField(label="Precio máximo (€)", width=150, on_change=search_offers)
     
-    result_text = ft.Text(selectable=True, size=14)
+    result_text = ft.Text(facets_error or "", size=14)
+    # Sólo se dibujan las tarjetas visibles; las páginas se cargan al hacer scroll
+    results = ft.ListView(expand=True, spacing=10, item_extent=OFFER_HEIGHT,
+                          on_scroll=on_scroll, on_scroll_interval=100)
 
     page.add(
         ft.Column([
@@ -108,14 +166,15 @@ def main(page: ft.Page):
             ft.Container(
                 content=ft.Column([
                     ft.Text("RESULTADOS", size=20, weight=ft.FontWeight.BOLD),
+                    result_text,
                     ft.Container(
-                        content=result_text,
+                        content=results,
                         padding=10,
                         border_radius=10,
                         bgcolor=ft.colors.GREY_50,
                         expand=True
                     )
-                ]),
+                ], expand=True),
                 expand=True
             )
         ], expand=True)
@@ -0,0 +1,227 @@
+import io
+import os
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+
+from batch_scoring import CONTENT_TYPES, prediction_records, read_offers
+from catalog_artifact import catalog_path
+from facets import FacetCache
+from metrics import (METRICS, PROFILER, PROFILER_TOKEN_HEADER, PROMETHEUS_CONTENT_TYPE, configure_profiler, log,
+                     profiler_denied, setup_logging, stage)
+from offer_search import ScoringError, search
+from offer_store import OfferStore
+from pagination import NDJSON_MIMETYPE, PageRequest, dumps, dumps_line, ndjson_stream
+from price_history import PriceDropLookup, PriceHistory
+from result_cache import ResultCache, etag_matches
+from scoring import ScoreCache
+from shared_catalog import CatalogPublisher, SharedCatalog, has_publisher
+from similar import CatalogChanged, SimilarIndex, parse_similar_args, similar_offers
+
+# Servidor de producción: un proceso por worker (serve.py), todos con el mismo catálogo
+# publicado en memoria compartida. El trabajo de CPU se hace en el threadpool, nunca en el event loop
+app = FastAPI(title="Chollos")
+setup_logging()
+if os.environ.get('CHOLLOS_PROFILE'):
+    PROFILER.start()
+
+try:
+    scores = ScoreCache('model/model_chollo.pkl', 'model/preprocessor.pkl')
+    log.info("✅ Modelo y preprocesador cargados correctamente")
+except Exception as e:
+    log.error("❌ Error cargando modelos: %s", e)
+    raise
+
+catalog = SharedCatalog()
+if not has_publisher(catalog.directory):
+    # Arrancado directamente con uvicorn (sin serve.py), o lo que hay en el directorio compartido es de una
+    # ejecución anterior cuyo publicador ya no existe: este proceso publica el catálogo y lo vigila
+    log.warning("⚠️ No hay nadie publicando el catálogo; se publica desde este worker (usa serve.py con varios workers)")
+    publisher = CatalogPublisher(OfferStore(catalog_path(), on_load=[scores.refresh]), scores, catalog.directory)
+    publisher.refresh()
+    publisher.watch()
+
+# Caché de respuestas de cada worker (no se comparte entre procesos)
+results = ResultCache()
+facet_cache = FacetCache()
+price_drops = PriceDropLookup(PriceHistory())
+# Índice de /similar de este worker: se construye con la primera consulta de cada versión del catálogo
+similar_index = SimilarIndex()
+
+
+class RequestMetrics:
+    # Middleware ASGI: latencia (hasta el último byte) y código de respuesta por endpoint
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            # El router deja en el scope la ruta que ha atendido la petición
+            route = scope.get('route')
+            METRICS.observe_request(getattr(route, 'path', 'other'), status, time.perf_counter() - started)
+
+
+app.add_middleware(RequestMetrics)
+
+
+def _lookup(snapshot, rows):
+    # Las predicciones del catálogo vienen publicadas junto a él
+    return snapshot.lookup(rows)
+
+
+def _search_json(snapshot, filters, page, cached):
+    total, offers = search(snapshot, filters, page, _lookup, price_drops)
+    with stage('serialize') as timer:
+        offers = list(offers)
+        body = dumps({"offers": offers, "total": int(total), "catalog_version": snapshot.version})
+        timer.rows_in = timer.rows_out = len(offers)
+    cached.store(body)
+    return body
+
+
+@app.post('/search_offers')
+async def search_offers(request: Request):
+    try:
+        filters = await request.json()
+    except ValueError:
+        return JSONResponse({"error": "El cuerpo tiene que ser un JSON con los filtros"}, status_code=400)
+    log.debug("🔍 Filtros recibidos: %s", filters)
+    try:
+        page = PageRequest.from_args(request.query_params, request.headers.get('accept', ''))
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    try:
+        snapshot = await run_in_threadpool(catalog.snapshot)
+        cached = results.lookup(f"{snapshot.version}-{snapshot.model_hash}-{price_drops.version}", filters, page,
+                                request.headers.get('if-none-match'))
+        if cached.not_modified:
+            return Response(status_code=304, headers={"ETag": cached.etag})
+        if cached.body is not None:
+            log.debug("⚡ Respuesta desde la caché")
+            return Response(cached.body, media_type='application/json', headers=cached.headers)
+        if page.streaming:
+            total, offers = await run_in_threadpool(search, snapshot, filters, page, _lookup, price_drops)
+            return StreamingResponse(iterate_in_threadpool(ndjson_stream(offers)), media_type=NDJSON_MIMETYPE,
+                                     headers={"X-Total-Count": str(total), "X-Catalog-Version": snapshot.version,
+                                              **cached.headers})
+        body = await run_in_threadpool(_search_json, snapshot, filters, page, cached)
+        return Response(body, media_type='application/json', headers=cached.headers)
+    except ScoringError as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+    except Exception as e:
+        log.exception("🔥 Error crítico: %s", e)
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+@app.get('/facets')
+async def facets(request: Request):
+    # Valores distintos y número de ofertas de cada filtro (los desplegables de app.py)
+    snapshot = await run_in_threadpool(catalog.snapshot)
+    etag, body = await run_in_threadpool(facet_cache.get, snapshot)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get('if-none-match'), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type='application/json', headers=headers)
+
+
+@app.get('/similar')
+async def similar(request: Request):
+    # Los k portátiles más parecidos a la oferta `id` y su precio frente a la mediana de ese vecindario
+    try:
+        row, version, k = parse_similar_args(request.query_params)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    snapshot = await run_in_threadpool(catalog.snapshot)
+    if snapshot.version != version:
+        # Puede que el id venga de otro worker que ya ha abierto la versión nueva: se mira current.json
+        snapshot = await run_in_threadpool(catalog.reload)
+    try:
+        body = await run_in_threadpool(similar_offers, snapshot, similar_index, row, k, _lookup, version)
+    except CatalogChanged as e:
+        return JSONResponse({"error": str(e), "catalog_version": snapshot.version}, status_code=409)
+    except IndexError as e:
+        return JSONResponse({"error": str(e)}, status_code=404)
+    return Response(dumps(body), media_type='application/json')
+
+
+@app.get('/cache_stats')
+async def cache_stats():
+    # Aciertos y fallos de la caché de este worker
+    return {"pid": os.getpid(), **results.stats()}
+
+
+@app.get('/metrics')
+async def prometheus_metrics():
+    # Métricas de este worker (con varios workers, Prometheus ve la de quien atienda cada scrape)
+    gauges = {f"chollos_result_cache_{name}": value for name, value in results.stats().items()}
+    return Response(METRICS.render(gauges), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+@app.get('/profiler')
+async def profiler_stacks():
+    # Pilas muestreadas en formato collapsed (flamegraph.pl, speedscope)
+    return PlainTextResponse(PROFILER.collapsed())
+
+
+@app.post('/profiler')
+async def profiler_toggle(request: Request):
+    # {"enabled": true|false, "interval": 0.005, "reset": true}; sólo en el worker que atiende la petición,
+    # y sólo desde la propia máquina o con CHOLLOS_PROFILER_TOKEN
+    denied = profiler_denied(request.client.host if request.client else None,
+                             request.headers.get(PROFILER_TOKEN_HEADER))
+    if denied:
+        return JSONResponse({"error": denied[1]}, status_code=denied[0])
+    try:
+        options = await request.json()
+    except ValueError:
+        options = {}
+    try:
+        return configure_profiler(options)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+
+@app.post('/predict_batch')
+async def predict_batch(request: Request):
+    # Igual que en backend.py, pero el cuerpo se lee entero antes de puntuarlo
+    mimetype = request.headers.get('content-type', '').split(';')[0].strip().lower()
+    fmt = CONTENT_TYPES.get(mimetype)
+    if fmt is None:
+        return JSONResponse({"error": f"Content-Type no soportado: {mimetype} "
+                                      f"(disponibles: {', '.join(CONTENT_TYPES)})"}, status_code=415)
+    body = await request.body()
+    stream = io.StringIO(body.decode('utf-8')) if fmt == 'json' else io.BytesIO(body)
+    records = prediction_records(read_offers(stream, fmt), scores.predict)
+
+    if request.query_params.get('format') == 'ndjson' or NDJSON_MIMETYPE in request.headers.get('accept', ''):
+        def lines():
+            try:
+                yield from ndjson_stream(records)
+            except Exception as e:
+                log.error("❌ Error en predict_batch: %s", e)
+                yield dumps_line({"error": str(e)})
+        return StreamingResponse(iterate_in_threadpool(lines()), media_type=NDJSON_MIMETYPE)
+
+    try:
+        predictions = await run_in_threadpool(list, records)
+    except Exception as e:
+        log.error("❌ Error en predict_batch: %s", e)
+        return JSONResponse({"error": str(e)}, status_code=400)
+    log.debug("🧮 Ofertas puntuadas: %d", len(predictions))
+    return Response(dumps({"predictions": predictions, "total": len(predictions)}), media_type='application/json')
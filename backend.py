@@ -1,93 +1,191 @@
-from flask import Flask, request, jsonify
-import pandas as pd
-import joblib
-import numpy as np
+import io
+import os
+import time
+
+from flask import Flask, Response, g, request, jsonify, stream_with_context
+
+from batch_scoring import CONTENT_TYPES, prediction_records, read_offers
+from catalog_artifact import catalog_path
+from facets import FacetCache
+from metrics import (METRICS, PROFILER, PROFILER_TOKEN_HEADER, PROMETHEUS_CONTENT_TYPE, configure_profiler, log,
+                     profiler_denied, setup_logging, stage)
+from offer_search import ScoringError, search
+from offer_store import OfferStore
+from pagination import NDJSON_MIMETYPE, PageRequest, dumps, dumps_line, ndjson_stream
+from price_history import PriceDropLookup, PriceHistory
+from result_cache import ResultCache, etag_matches
+from scoring import ScoreCache
+from similar import CatalogChanged, SimilarIndex, parse_similar_args, similar_offers
 
 app = Flask(__name__)
+# Logs con nivel (CHOLLOS_LOG_LEVEL=DEBUG para ver cada petición y etapa, OFF para nada)
+setup_logging()
+if os.environ.get('CHOLLOS_PROFILE'):
+    PROFILER.start()
 
 # Cargar modelo y preprocesador
 try:
-    model = joblib.load('model/model_chollo.pkl')
-    preprocesador = joblib.load('model/preprocessor.pkl')
-    print("✅ Modelo y preprocesador cargados correctamente")
+    scores = ScoreCache('model/model_chollo.pkl', 'model/preprocessor.pkl')
+    log.info("✅ Modelo y preprocesador cargados correctamente")
 except Exception as e:
-    print(f"❌ Error cargando modelos: {str(e)}")
+    log.error("❌ Error cargando modelos: %s", e)
     raise
 
+# Catálogo en memoria (el artefacto Arrow si está publicado, si no chollos.csv): se recarga
+# solo cuando cambia y se puntúa entero con el modelo antes de publicarse
+# (junto con el índice de vecinos de /similar)
+similar_index = SimilarIndex()
+store = OfferStore(catalog_path(), on_load=[scores.refresh, similar_index.refresh])
+store.snapshot()
+
+# Respuestas ya calculadas, por filtros y página; se vacía al cambiar el catálogo o el modelo
+results = ResultCache()
+# Valores de los desplegables, calculados una vez por versión del catálogo
+facet_cache = FacetCache()
+# Bajadas de precio del historial (filtro priceDrop); el catálogo necesita una columna URL
+price_drops = PriceDropLookup(PriceHistory())
+
+@app.before_request
+def start_timer():
+    g.started = time.perf_counter()
+
+@app.after_request
+def observe_request(response):
+    # Latencia por endpoint (en NDJSON, hasta que se empieza a enviar el cuerpo)
+    if 'started' in g:
+        endpoint = request.url_rule.rule if request.url_rule else 'other'
+        METRICS.observe_request(endpoint, response.status_code, time.perf_counter() - g.started)
+    return response
+
 @app.route('/search_offers', methods=['POST'])
 def search_offers():
     try:
-        # 1. Cargar datos y parámetros
-        df = pd.read_csv('chollos.csv')
+        # 1. Cargar datos y parámetros (filtros en el cuerpo; página, orden y formato en la query string)
+        snapshot = store.snapshot()
         filters = request.json
-        print("\n🔍 Filtros recibidos:", filters)
+        log.debug("🔍 Filtros recibidos: %s", filters)
+        try:
+            page = PageRequest.from_args(request.args, request.headers.get('Accept', ''))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         
-        # 2. Aplicar filtros básicos
-        filtered_df = df.copy()
+        # 2. Misma consulta sobre el mismo catálogo y modelo: 304 o la respuesta guardada
+        # El modelo se fija aquí: la clave de la caché es la del modelo con el que search() puntúa de verdad
+        model = scores.pinned()
+        cached = results.lookup(f"{snapshot.version}-{model.model_hash}-{price_drops.version}", filters, page,
+                                request.headers.get('If-None-Match'))
+        if cached.not_modified:
+            return Response(status=304, headers={"ETag": cached.etag})
+        if cached.body is not None:
+            log.debug("⚡ Respuesta desde la caché")
+            return Response(cached.body, mimetype='application/json', headers=cached.headers)
         
-        # Filtro por procesador
-        if filters.get("processor"):
-            filtered_df = filtered_df[
-                filtered_df["Procesador"].str.contains(
-                    filters["processor"], 
-                    case=False, 
-                    na=False
-                )
-            ]
+        # 3. Filtros, IA y página (offer_search.py, compartido con el servidor ASGI)
+        try:
+            total, offers = search(snapshot, filters, page, model, price_drops)
+        except ScoringError as e:
+            return jsonify({"error": str(e)}), 500
         
-        # Filtros numéricos/exactos
-        exact_filters = {
-            "ram": "RAM",
-            "ramType": "Tipo RAM",
-            "storage": "Almacenamiento",
-            "graphics": "Graficos",
-            "screen": "Pantalla",
-            "resolution": "Resolucion",
-            "os": "Sistema Operativo",
-            "battery": "Bateria",
-            "price": "Precio"
-        }
-        
-        for key, col in exact_filters.items():
-            if filters.get(key):
-                if key in ["ram", "storage", "battery", "price"]:
-                    filtered_df = filtered_df[filtered_df[col] <= float(filters[key])]
-                else:
-                    filtered_df = filtered_df[filtered_df[col] == filters[key]]
-        
-        print("📊 Datos después de filtros básicos:", filtered_df.shape[0])
-        
-        # 3. Aplicar IA si hay resultados
-        if not filtered_df.empty:
+        # 4. Formatear respuesta: NDJSON por bloques o un único JSON.
+        # catalog_version acompaña a los "id": /similar lo pide para saber de qué catálogo son
+        if page.streaming:
+            return Response(ndjson_stream(offers), mimetype=NDJSON_MIMETYPE,
+                            headers={"X-Total-Count": str(total), "X-Catalog-Version": snapshot.version,
+                                     **cached.headers})
+        with stage('serialize') as timer:
+            offers = list(offers)
+            body = dumps({
+                "offers": offers,
+                "total": int(total),
+                "catalog_version": snapshot.version
+            })
+            timer.rows_in = timer.rows_out = len(offers)
+        cached.store(body)
+        return Response(body, mimetype='application/json', headers=cached.headers)
+    
+    except Exception as e:
+        log.exception("🔥 Error crítico: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/facets', methods=['GET'])
+def facets():
+    # Valores distintos y número de ofertas de cada filtro (los desplegables de app.py)
+    etag, body = facet_cache.get(store.snapshot())
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get('If-None-Match'), etag):
+        return Response(status=304, headers=headers)
+    return Response(body, mimetype='application/json', headers=headers)
+
+@app.route('/similar', methods=['GET'])
+def similar():
+    # Los k portátiles más parecidos a la oferta `id` y su precio frente a la mediana de ese vecindario.
+    # Si el catálogo ha cambiado desde la búsqueda que dio ese id, 409 con la versión actual
+    try:
+        row, version, k = parse_similar_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    snapshot = store.snapshot()
+    try:
+        body = similar_offers(snapshot, similar_index, row, k, scores.lookup, version)
+    except CatalogChanged as e:
+        return jsonify({"error": str(e), "catalog_version": snapshot.version}), 409
+    except IndexError as e:
+        return jsonify({"error": str(e)}), 404
+    return Response(dumps(body), mimetype='application/json')
+
+@app.route('/cache_stats', methods=['GET'])
+def cache_stats():
+    # Aciertos y fallos de la caché de /search_offers
+    return jsonify(results.stats())
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    # Latencia y filas por etapa y por endpoint, en formato Prometheus
+    gauges = {f"chollos_result_cache_{name}": value for name, value in results.stats().items()}
+    return Response(METRICS.render(gauges), content_type=PROMETHEUS_CONTENT_TYPE)
+
+@app.route('/profiler', methods=['GET', 'POST'])
+def profiler():
+    # POST {"enabled": true|false, "interval": 0.005, "reset": true} enciende o apaga el perfilador
+    # (sólo desde la propia máquina o con CHOLLOS_PROFILER_TOKEN);
+    # GET devuelve las pilas muestreadas en formato collapsed (flamegraph.pl, speedscope)
+    if request.method == 'POST':
+        denied = profiler_denied(request.remote_addr, request.headers.get(PROFILER_TOKEN_HEADER))
+        if denied:
+            return jsonify({"error": denied[1]}), denied[0]
+        try:
+            return jsonify(configure_profiler(request.get_json(silent=True)))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+    return Response(PROFILER.collapsed(), mimetype='text/plain')
+
+@app.route('/predict_batch', methods=['POST'])
+def predict_batch():
+    # Puntuar ofertas arbitrarias: array JSON, CSV o NDJSON, leídas y puntuadas por bloques
+    fmt = CONTENT_TYPES.get(request.mimetype)
+    if fmt is None:
+        return jsonify({"error": f"Content-Type no soportado: {request.mimetype} "
+                                 f"(disponibles: {', '.join(CONTENT_TYPES)})"}), 415
+    stream = io.TextIOWrapper(request.stream, encoding='utf-8') if fmt == 'json' else request.stream
+    records = prediction_records(read_offers(stream, fmt), scores.predict)
+    
+    if request.args.get('format') == 'ndjson' or NDJSON_MIMETYPE in request.headers.get('Accept', ''):
+        # Memoria constante: se lee, puntúa y envía un bloque cada vez
+        def lines():
             try:
-                # Preprocesamiento
-                X_pred = preprocesador.transform(filtered_df)
-                
-                # Predicción
-                probabilidades = model.predict_proba(X_pred)[:, 1]
-                predicciones = model.predict(X_pred)
-                
-                # Añadir resultados
-                filtered_df['Prediccion_IA'] = predicciones.astype(int)
-                filtered_df['Probabilidad_IA'] = np.round(probabilidades * 100, 1)
-                
-                # Filtrar por IA
-                filtered_df = filtered_df[filtered_df['Prediccion_IA'] == 1]
-                print("🎯 Ofertas después de IA:", filtered_df.shape[0])
-                
+                yield from ndjson_stream(records)
             except Exception as e:
-                print(f"❌ Error en IA: {str(e)}")
-                return jsonify({"error": f"Error en IA: {str(e)}"}), 500
-        
-        # 4. Formatear respuesta
-        result_df = filtered_df.replace({np.nan: None})
-        return jsonify({
-            "offers": result_df.to_dict(orient='records')
-        })
+                log.error("❌ Error en predict_batch: %s", e)
+                yield dumps_line({"error": str(e)})
+        return Response(stream_with_context(lines()), mimetype=NDJSON_MIMETYPE)
     
+    try:
+        predictions = list(records)
     except Exception as e:
-        print(f"🔥 Error crítico: {str(e)}")
-        return jsonify({"error": str(e)}), 500
+        log.error("❌ Error en predict_batch: %s", e)
+        return jsonify({"error": str(e)}), 400
+    log.debug("🧮 Ofertas puntuadas: %d", len(predictions))
+    return jsonify({"predictions": predictions, "total": len(predictions)})
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
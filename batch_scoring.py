@@ -0,0 +1,133 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from scoring import FEATURE_COLUMNS, NUMERIC_FEATURES
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:  # opcional: sin orjson se usa el json de la librería estándar
+    _loads = json.loads
+
+# Ofertas por bloque: transform + predict_proba nunca ven más filas que esto a la vez
+BATCH_CHUNK = 10_000
+INPUT_FORMATS = ('json', 'csv', 'ndjson')
+CONTENT_TYPES = {
+    'application/json': 'json',
+    'text/csv': 'csv',
+    'application/x-ndjson': 'ndjson',
+    'application/jsonl': 'ndjson',
+}
+EXTENSIONS = {'.json': 'json', '.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson'}
+JSON_BLOCK = 1 << 16
+
+
+def format_for_path(path):
+    for extension, fmt in EXTENSIONS.items():
+        if path.lower().endswith(extension):
+            return fmt
+    raise ValueError(f"No se reconoce el formato de {path} (extensiones: {', '.join(EXTENSIONS)})")
+
+
+def _iter_json_array(stream, block_size=JSON_BLOCK):
+    # Objetos de un array JSON ([{...}, {...}]) de uno en uno, sin cargar el texto entero
+    decoder = json.JSONDecoder()
+    buffer = stream.read(block_size)
+    if isinstance(buffer, bytes):
+        raise TypeError("_iter_json_array necesita un stream de texto")
+    pos = 0
+    eof = not buffer
+    started = single = False
+    while True:
+        # Saltar espacios y comas, leyendo más si se acaba el bloque
+        while True:
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+            if pos < len(buffer) or eof:
+                break
+            more = stream.read(block_size)
+            eof = not more
+            buffer, pos = buffer[pos:] + more, 0
+        if pos >= len(buffer):
+            raise ValueError("JSON incompleto: falta ']'")
+        if not started:
+            if buffer[pos] == '{':
+                # Una sola oferta sin array
+                single = started = True
+            elif buffer[pos] == '[':
+                started = True
+                pos += 1
+                continue
+            else:
+                raise ValueError("Se esperaba un array JSON de ofertas")
+        if buffer[pos] == ']':
+            return
+        try:
+            record, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise ValueError("JSON mal formado")
+            more = stream.read(block_size)
+            eof = not more
+            buffer, pos = buffer[pos:] + more, 0
+            continue
+        yield record
+        if single:
+            return
+        pos = end
+        if pos > block_size:
+            buffer, pos = buffer[pos:], 0
+
+
+def _iter_ndjson(stream):
+    for line in stream:
+        if line.strip():
+            yield _loads(line)
+
+
+def prepare(df):
+    # Columnas y tipos que espera el preprocesador (las que falten quedan a NaN y las imputa)
+    out = df.reindex(columns=FEATURE_COLUMNS)
+    for col in FEATURE_COLUMNS:
+        values = out[col]
+        if col in NUMERIC_FEATURES:
+            out[col] = pd.to_numeric(values, errors='coerce').astype(np.float64)
+        else:
+            out[col] = values.astype(str).where(values.notna(), np.nan)
+    return out
+
+
+def read_offers(stream, fmt, chunk_size=BATCH_CHUNK):
+    # DataFrames de como mucho chunk_size ofertas, en el orden de entrada
+    if fmt not in INPUT_FORMATS:
+        raise ValueError(f"Formato desconocido: {fmt} (disponibles: {', '.join(INPUT_FORMATS)})")
+    if fmt == 'csv':
+        for chunk in pd.read_csv(stream, chunksize=chunk_size):
+            yield prepare(chunk)
+        return
+    records = _iter_json_array(stream) if fmt == 'json' else _iter_ndjson(stream)
+    batch = []
+    for record in records:
+        if not isinstance(record, dict):
+            raise ValueError("Cada oferta tiene que ser un objeto JSON")
+        batch.append(record)
+        if len(batch) >= chunk_size:
+            yield prepare(pd.DataFrame.from_records(batch, columns=FEATURE_COLUMNS))
+            batch = []
+    if batch:
+        yield prepare(pd.DataFrame.from_records(batch, columns=FEATURE_COLUMNS))
+
+
+def predict_chunks(frames, predict_fn):
+    # (predicción, probabilidad) de cada bloque; predict_fn(df) -> (pred, prob)
+    for df in frames:
+        yield predict_fn(df)
+
+
+def prediction_records(frames, predict_fn):
+    # Un dict por oferta, como el resultado de predecir_chollo (sin los detalles)
+    for pred, prob in predict_chunks(frames, predict_fn):
+        for p, q in zip(pred.tolist(), prob.tolist()):
+            yield {'es_chollo': p == 1, 'probabilidad': q}
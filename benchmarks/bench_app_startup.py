@@ -0,0 +1,70 @@
+import argparse
+import json
+import subprocess
+import sys
+import time
+import urllib.request
+
+import pandas as pd
+
+from bench_serving import FLASK_SERVER, wait_until_up
+from synthetic import ROOT, write_catalog
+
+# Arranque anterior de app.py (sin la ventana de Flet): pandas + CSV entero + unique() por desplegable
+LEGACY_STARTUP = """
+import sys, json
+import pandas as pd
+df = pd.read_csv(sys.argv[1])
+columns = ['RAM', 'Tipo RAM', 'Almacenamiento', 'Graficos', 'Pantalla', 'Resolucion', 'Sistema Operativo', 'Bateria']
+print(json.dumps({col: [str(v) for v in df[col].unique() if v == v] for col in columns}))
+"""
+# Arranque nuevo: requests + GET /facets con la sesión que reutiliza app.py
+FACETS_STARTUP = """
+import sys, json
+import requests
+session = requests.Session()
+facets = session.get(sys.argv[1] + '/facets', timeout=5).json()['facets']
+print(json.dumps({f['column']: [str(v) for v in f['values']] for f in facets.values()}))
+"""
+
+
+def cold_start(code, argument, repeat):
+    # Proceso nuevo cada vez: incluye arrancar Python y los imports, como al abrir app.py
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, '-c', code, argument], capture_output=True, check=True).stdout
+        times.append(time.perf_counter() - start)
+    return min(times), json.loads(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Arranque de app.py: pandas + CSV contra GET /facets")
+    parser.add_argument('--rows', default='0,200000', help="tamaños de catálogo (0 = chollos.csv)")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    for rows in [int(r) for r in args.rows.split(',')]:
+        path = f'{ROOT}/chollos.csv' if rows == 0 else write_catalog(rows, f'/tmp/chollos_{rows}.csv')
+        server = subprocess.Popen([sys.executable, '-c', FLASK_SERVER, path, '5098'], cwd=ROOT,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            url = 'http://127.0.0.1:5098'
+            wait_until_up(url)
+            legacy, expected = cold_start(LEGACY_STARTUP, path, args.repeat)
+            facets, options = cold_start(FACETS_STARTUP, url, args.repeat)
+            # Mismas opciones y en el mismo orden (sin NaN, que antes salía como opción "nan")
+            assert options == expected
+            counts = json.loads(urllib.request.urlopen(url + '/facets').read())
+            df = pd.read_csv(path)
+            for facet in counts['facets'].values():
+                assert facet['counts'] == df[facet['column']].value_counts(sort=False).tolist()
+        finally:
+            server.terminate()
+            server.wait()
+        print(f"{len(df):>7} ofertas: pandas + CSV {legacy * 1000:6.0f} ms, /facets {facets * 1000:6.0f} ms "
+              f"({legacy / facets:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
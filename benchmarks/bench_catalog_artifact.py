@@ -0,0 +1,129 @@
+import argparse
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from synthetic import write_catalog
+
+from catalog_artifact import publish, read_artifact
+from offer_store import _read_catalog
+
+
+def rss_mb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return float('nan')
+
+
+def child(kind, path):
+    # Proceso nuevo: carga el catálogo y mide tiempo y memoria residente (al cargar y tras leer todas las columnas)
+    before = rss_mb()
+    start = time.perf_counter()
+    df = read_artifact(path)[0] if kind == 'arrow' else _read_catalog(path)
+    elapsed = time.perf_counter() - start
+    loaded = rss_mb()
+    for col in df.columns:
+        values = df[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            values.cat.codes.to_numpy().sum()
+        elif values.dtype == object:
+            values.isna().sum()
+        else:
+            values.to_numpy().sum()
+    touched = rss_mb()
+    print(json.dumps({'ms': elapsed * 1000, 'rss_load': loaded - before, 'rss_touched': touched - before}))
+
+
+def measure(kind, path, repeat):
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, __file__, '--child', kind, path], capture_output=True, text=True, check=True)
+        runs.append(json.loads(out.stdout.splitlines()[-1]))
+    return {key: float(np.median([run[key] for run in runs])) for key in runs[0]}
+
+
+def check_same(csv_path, artifact_path):
+    # Mismos valores que el CSV leído por OfferStore (el texto pasa a categoría) y números sin copiar
+    expected = _read_catalog(csv_path)
+    df, manifest = read_artifact(artifact_path)
+    assert manifest['rows'] == len(expected) == len(df)
+    assert list(df.columns) == list(expected.columns)
+    for col in df.columns:
+        a, b = df[col], expected[col]
+        if isinstance(a.dtype, pd.CategoricalDtype):
+            assert a.astype(object).where(a.notna(), None).tolist() == b.astype(object).where(b.notna(), None).tolist(), col
+        else:
+            assert a.dtype == b.dtype and np.array_equal(a.to_numpy(), b.to_numpy(), equal_nan=True), col
+            assert not a.to_numpy().flags.writeable, col
+
+
+def check_optional(directory):
+    # URL y product_id viajan con el catálogo (con huecos) y una columna fuera del esquema se avisa, no se pierde en silencio
+    df = pd.read_csv(write_catalog(1000, os.path.join(directory, 'opcionales.csv')))
+    df['URL'] = [f'https://tienda.example/portatil-{i}/p' if i % 10 else None for i in range(len(df))]
+    df['product_id'] = [f'p{i // 2}' for i in range(len(df))]
+    df['Titulo'] = 'x'
+    with warnings_from('chollos') as warned:
+        artifact = publish(df, os.path.join(directory, 'catalog_opcionales'))
+    assert any('Titulo' in message for message in warned), warned
+    out = read_artifact(artifact)[0]
+    for col in ['URL', 'product_id']:
+        assert out[col].astype(object).where(out[col].notna(), None).tolist() == \
+            df[col].astype(object).where(df[col].notna(), None).tolist(), col
+    assert 'Titulo' not in out
+
+
+@contextmanager
+def warnings_from(name):
+    # Mensajes WARNING del logger name mientras dura el bloque
+    messages = []
+    handler = logging.Handler(logging.WARNING)
+    handler.emit = lambda record: messages.append(record.getMessage())
+    logger = logging.getLogger(name)
+    logger.addHandler(handler)
+    try:
+        yield messages
+    finally:
+        logger.removeHandler(handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Carga del catálogo: chollos.csv frente al artefacto Arrow mapeado")
+    parser.add_argument('--sizes', default='10000,100000,1000000')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--child', nargs=2, metavar=('KIND', 'PATH'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child(*args.child)
+
+    directory = tempfile.mkdtemp(prefix='catalog-artifact-')
+    try:
+        check_optional(directory)
+        print(f"{'filas':>9} {'formato':<7} {'fichero MB':>10} {'carga ms':>9} {'RSS carga MB':>13} {'RSS leído MB':>13}")
+        for n in map(int, args.sizes.split(',')):
+            csv_path = write_catalog(n, os.path.join(directory, f'chollos_{n}.csv'))
+            artifact = publish(pd.read_csv(csv_path), os.path.join(directory, f'catalog_{n}'), source=csv_path)
+            check_same(csv_path, artifact)
+            sizes = {'csv': os.path.getsize(csv_path), 'arrow': os.path.getsize(os.path.join(artifact, 'catalog.arrow'))}
+            results = {kind: measure(kind, path, args.repeat) for kind, path in [('csv', csv_path), ('arrow', artifact)]}
+            for kind, r in results.items():
+                print(f"{n:>9} {kind:<7} {sizes[kind] / 1e6:>10.1f} {r['ms']:>9.1f} {r['rss_load']:>13.1f} "
+                      f"{r['rss_touched']:>13.1f}")
+            print(f"{'':>9} carga {results['csv']['ms'] / results['arrow']['ms']:.0f}x más rápida")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
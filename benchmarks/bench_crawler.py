@@ -0,0 +1,85 @@
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+
+import requests
+
+import pandas as pd
+
+from fixtures import SPECS_PATH, FixtureServer, build_site, render_product
+from webscrapping.crawler import Crawler, crawl_store
+from webscrapping.parsers import parse_laptop_specs, parse_listing_links
+
+
+def sequential_crawl(listing, n_pages):
+    # Camino de los notebooks: una petición detrás de otra, sin reutilizar conexiones
+    links = []
+    for i in range(1, n_pages + 1):
+        r = requests.get(listing.format(page=i))
+        links.extend(parse_listing_links(r.text, r.url))
+    all_laptops_specs = []
+    for link in links:
+        if any(json.loads(specs_str).get("URL") == link for specs_str in all_laptops_specs):
+            continue
+        response = requests.get(link)
+        specs = parse_laptop_specs(response.text, link)
+        if specs is not None:
+            all_laptops_specs.append(json.dumps(specs, indent=4, ensure_ascii=False))
+    return len(all_laptops_specs), n_pages + len(links)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Páginas/s del crawler contra un servidor local de fixtures")
+    parser.add_argument('--products', type=int, default=400)
+    parser.add_argument('--latency', type=float, default=0.02, help="latencia simulada por petición (s)")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16, 32])
+    parser.add_argument('--changed', type=float, default=0.1,
+                        help="fracción de fichas cuyo precio cambia entre dos ejecuciones con caché")
+    args = parser.parse_args()
+
+    pages, n_pages = build_site(args.products)
+    with FixtureServer(pages, latency=args.latency) as server:
+        listing = server.base_url + '/ordenadores/ordenadores-portatiles?page={page}'
+
+        start = time.perf_counter()
+        n_specs, n_requests = sequential_crawl(listing, n_pages)
+        elapsed = time.perf_counter() - start
+        print(f"secuencial      : {n_specs} fichas, {n_requests / elapsed:7.1f} páginas/s ({elapsed:.2f} s)")
+
+        product_urls = [server.base_url + path for path in pages if path.endswith('/p')]
+        for concurrency in args.concurrency:
+            crawler = Crawler(concurrency=concurrency, per_host_rate=0)
+
+            async def fetch_all():
+                async with crawler:
+                    await crawler.fetch_many(product_urls)
+
+            asyncio.run(fetch_all())
+            print(f"descarga x{concurrency:<3}   : {crawler.stats.pages_per_s:7.1f} páginas/s (sin parsear)")
+
+        for concurrency in args.concurrency:
+            specs, stats = asyncio.run(crawl_store('fixtures', pages=n_pages, listing=listing,
+                                                   concurrency=concurrency, per_host_rate=0))
+            print(f"asyncio x{concurrency:<3}    : {len(specs)} fichas, {stats.pages_per_s:7.1f} páginas/s "
+                  f"({stats.elapsed:.2f} s)")
+
+        # Ejecución incremental: primera pasada llena la caché, la segunda sólo ve los cambios
+        with tempfile.TemporaryDirectory() as cache_dir:
+            asyncio.run(crawl_store('fixtures', pages=n_pages, listing=listing, cache_dir=cache_dir,
+                                    per_host_rate=0))
+            rows = pd.read_csv(SPECS_PATH)
+            n_changed = int(args.products * args.changed)
+            for i in range(n_changed):
+                server.update(f'/portatil-{i}/p', render_product(rows.iloc[i % len(rows)], price='1,00'))
+            specs, stats = asyncio.run(crawl_store('fixtures', pages=n_pages, listing=listing, cache_dir=cache_dir,
+                                                   per_host_rate=0))
+            report = stats.as_dict()
+            print(f"refresco        : {len(specs)} fichas parseadas de {args.products} ({n_changed} cambiadas), "
+                  f"acierto de caché {report['cache_hit_rate']:.0%}, {report['bytes_saved'] / 1e6:.1f} MB ahorrados, "
+                  f"{stats.elapsed:.2f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from synthetic import CATALOG_PATH
+
+from entity_resolution import EntityResolver
+
+BRANDS = ['ASUS', 'Lenovo', 'HP', 'Acer', 'MSI', 'Dell', 'Gigabyte', 'Medion']
+SERIES = ['Vivobook', 'Zenbook', 'IdeaPad Slim', 'ThinkPad E', 'Pavilion', 'Victus', 'Aspire', 'Nitro', 'Swift',
+          'Katana', 'Modern', 'Inspiron', 'Vostro', 'G5', 'Aorus', 'Akoya', 'Legion', 'Omen', 'TUF Gaming', 'ROG Strix']
+STORES = ['pcbox', 'appinformatica', 'coolmod']
+
+
+def _codes(rng, n):
+    # Referencias de fabricante tipo "F1504ZA-NJ1074"
+    letters = np.array(list('ABCDEFGHJKLMNPRSTUVXZ'))
+    pick = lambda k: [''.join(row) for row in letters[rng.integers(0, len(letters), (n, k))]]
+    first, second, third = pick(1), pick(2), pick(2)
+    model = rng.integers(1000, 9999, n)
+    variant = rng.integers(1000, 9999, n)
+    return [f"{a}{m}{b}-{c}{v}" for a, m, b, c, v in zip(first, model, second, third, variant)]
+
+
+def make_listings(n_listings, seed=0):
+    # Productos con specs reales remuestreadas, cada uno vendido en 1-3 tiendas con títulos, SO y precios distintos
+    rng = np.random.default_rng(seed)
+    base = pd.read_csv(CATALOG_PATH)
+    n_products = max(1, n_listings // 2)
+    products = base.iloc[rng.integers(0, len(base), n_products)].reset_index(drop=True)
+    products['brand'] = np.array(BRANDS)[rng.integers(0, len(BRANDS), n_products)]
+    products['series'] = np.array(SERIES)[rng.integers(0, len(SERIES), n_products)]
+    products['code'] = _codes(rng, n_products)
+
+    # Tiendas de cada producto: al menos una, sin repetir
+    offered = rng.random((n_products, len(STORES))) < 0.55
+    offered[np.arange(n_products), rng.integers(0, len(STORES), n_products)] = True
+    product, store = np.nonzero(offered)
+    df = products.iloc[product].reset_index(drop=True)
+    df = df.iloc[:n_listings] if len(df) > n_listings else df
+    product, store = product[:len(df)], store[:len(df)]
+    df['store'] = np.array(STORES)[store]
+    df['truth'] = product
+
+    df['Sistema Operativo'] = df['Sistema Operativo'].fillna('')
+    ram = df['RAM'].fillna(8).astype(int).astype(str)
+    ssd = df['Almacenamiento'].fillna(512).astype(int).astype(str)
+    df['RAM'], df['Almacenamiento'] = ram.astype(float), ssd.astype(float)
+    screen = df['Pantalla'].astype(str)
+    titles = np.where(
+        store == 0, 'Portátil ' + df['brand'] + ' ' + df['series'] + ' ' + df['code'] + ' ' + df['Procesador'].astype(str)
+        + '/' + ram + 'GB/' + ssd + 'GB SSD/' + screen + '"',
+        np.where(store == 1, df['brand'].str.upper() + ' ' + df['series'] + ' ' + df['code'] + ' '
+                 + df['Procesador'].astype(str) + ' ' + ram + ' GB ' + ssd + ' GB ' + screen + ' '
+                 + df['Sistema Operativo'].astype(str),
+                 # Coolmod: sólo la primera parte de la referencia y la CPU sin fabricante
+                 df['brand'] + ' ' + df['series'] + ' ' + df['code'].str.split('-').str[0] + ' '
+                 + df['Procesador'].astype(str).str.split().str[-1] + ' ' + ram + 'GB ' + ssd + 'GB'))
+    df['Titulo'] = titles
+    df['url'] = ['https://' + s + '.example/p/' + str(i) for i, s in enumerate(df['store'])]
+    # Ruido entre tiendas: CPU con ®/™, SO escrito de otra forma, batería sin rellenar, precio ±10%
+    coolmod = store == 2
+    df.loc[coolmod, 'Procesador'] = df.loc[coolmod, 'Procesador'].astype(str).str.replace('Intel Core', 'Intel® Core™')
+    windows = df['Sistema Operativo'].str.startswith('Windows') & (rng.random(len(df)) < 0.3)
+    df.loc[windows, 'Sistema Operativo'] = df.loc[windows, 'Sistema Operativo'] + ' 64 bits'
+    df.loc[rng.random(len(df)) < 0.2, 'Bateria'] = np.nan
+    df['Precio'] = np.round(df['Precio'] * rng.uniform(0.9, 1.1, len(df)), 2)
+    return df
+
+
+def pair_scores(truth, predicted):
+    # Precisión y exhaustividad por pares: pares en el mismo producto según la verdad y según la predicción
+    pairs = lambda counts: int((counts * (counts - 1) // 2).sum())
+    both = pairs(pd.Series(0, index=pd.MultiIndex.from_arrays([truth, predicted])).groupby(level=[0, 1]).size())
+    true_pairs = pairs(pd.Series(truth).value_counts())
+    predicted_pairs = pairs(pd.Series(predicted).value_counts())
+    return both / max(predicted_pairs, 1), both / max(true_pairs, 1)
+
+
+def exhaustive(resolver, df):
+    # Todas las parejas de cada bloque, con la misma verificación: lo que LSH debería encontrar
+    blocks = resolver.blocks(df)
+    title_codes, title_sigs = resolver.title_signatures(df)
+    spec_codes, spec_sigs = resolver.spec_signatures(df)
+    pairs = []
+    for rows in pd.Series(np.arange(len(df))).groupby(blocks).indices.values():
+        a, b = np.triu_indices(len(rows), 1)
+        pairs.append(np.stack([rows[a], rows[b]], axis=1))
+    pairs = np.concatenate(pairs)
+    same = ((resolver.similarity(title_codes, title_sigs, pairs) >= resolver.title_threshold)
+            & (resolver.similarity(spec_codes, spec_sigs, pairs) >= resolver.spec_threshold))
+    return pairs, {tuple(pair) for pair in pairs[same]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resolución de entidades: bloqueo + MinHash/LSH frente a n²")
+    parser.add_argument('--sizes', default='10000,100000,1000000')
+    parser.add_argument('--check-rows', type=int, default=5000)
+    args = parser.parse_args()
+
+    # 1. LSH encuentra casi todo lo que encontraría comparar todas las parejas de cada bloque
+    df = make_listings(args.check_rows)
+    resolver = EntityResolver()
+    product_id = resolver.resolve(df).to_numpy()
+    all_pairs, expected = exhaustive(resolver, df)
+    expected = np.array(sorted(expected))
+    recall = (product_id[expected[:, 0]] == product_id[expected[:, 1]]).mean()
+    assert recall >= 0.95, recall
+    print(f"{args.check_rows} fichas: LSH compara {resolver.stats['compared']} de {len(all_pairs)} parejas de bloque "
+          f"y deja en el mismo producto el {recall:.1%} de las coincidencias de la comparación exhaustiva")
+
+    # 2. Calidad frente a la firma de los notebooks y coste según el tamaño del catálogo
+    print(f"{'fichas':>9} {'bloques':>8} {'pares n²':>16} {'pares bloque':>14} {'comparados':>11} {'s':>7} "
+          f"{'P/R LSH':>13} {'P/R firma':>13}")
+    for n in map(int, args.sizes.split(',')):
+        df = make_listings(n)
+        resolver = EntityResolver()
+        start = time.perf_counter()
+        product_id = resolver.resolve(df)
+        elapsed = time.perf_counter() - start
+        stats = resolver.stats
+        precision, recall = pair_scores(df['truth'].to_numpy(), product_id.to_numpy())
+        signature = (df['Procesador'].astype(str) + '_' + df['RAM'].astype(str) + '_'
+                     + df['Almacenamiento'].astype(str) + '_' + df['Precio'].astype(str))
+        sig_precision, sig_recall = pair_scores(df['truth'].to_numpy(), signature.to_numpy())
+        assert precision >= 0.95 and recall >= 0.9, (precision, recall)
+        print(f"{n:>9} {stats['blocks']:>8} {stats['naive_pairs']:>16} {stats['block_pairs']:>14} "
+              f"{stats['compared']:>11} {elapsed:>7.2f} {precision:>6.3f}/{recall:.3f} "
+              f"{sig_precision:>6.3f}/{sig_recall:.3f}")
+
+
+if __name__ == '__main__':
+    main()
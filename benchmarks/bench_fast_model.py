@@ -0,0 +1,75 @@
+import argparse
+import os
+import time
+
+import joblib
+import numpy as np
+
+from synthetic import ROOT, grow_catalog
+from batch_scoring import prepare
+from fast_model import CompiledForest
+from offer_store import restore_precision
+from scoring import FEATURE_COLUMNS
+
+
+def with_gaps(df, seed=0):
+    # Huecos y valores que el one-hot no conoce: imputación y columnas a cero
+    rng = np.random.default_rng(seed)
+    df = df.copy()
+    for col in FEATURE_COLUMNS:
+        df.loc[rng.random(len(df)) < 0.05, col] = np.nan
+    for col in ['Procesador', 'Graficos', 'Sistema Operativo']:
+        df.loc[rng.random(len(df)) < 0.02, col] = 'desconocido'
+    return df
+
+
+def check(model, preprocessor, compiled, df):
+    expected = model.predict_proba(preprocessor.transform(df))
+    proba = compiled.predict_proba(df)
+    diff = np.abs(proba - expected).max(initial=0.0)
+    assert diff <= 1e-9, diff
+    assert np.array_equal(model.classes_[np.argmax(expected, axis=1)], compiled.predict(df)[0])
+    return diff
+
+
+def timing(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return np.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bosque compilado (fast_model) contra sklearn")
+    parser.add_argument('--rows', type=int, default=10_000)
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    model = joblib.load('model/model_chollo.pkl')
+    preprocessor = joblib.load('model/preprocessor.pkl')
+    start = time.perf_counter()
+    compiled = CompiledForest(model, preprocessor)
+    print(f"Compilado en {time.perf_counter() - start:.2f} s: {compiled.n_trees} árboles, "
+          f"{compiled.cumulative.nbytes / 1e6:.1f} MB de máscaras")
+
+    df = restore_precision(grow_catalog(args.rows)[FEATURE_COLUMNS])
+    diffs = [check(model, preprocessor, compiled, df),
+             check(model, preprocessor, compiled, with_gaps(df)),
+             check(model, preprocessor, compiled, prepare(with_gaps(df, seed=1)))]
+    # sklearn no acepta lotes vacíos; el compilado devuelve un array vacío
+    assert compiled.predict_proba(df.iloc[:0]).shape == (0, len(model.classes_))
+    print(f"Diferencia máxima con sklearn: {max(diffs):.1e}")
+
+    print(f"{'filas':>6} {'sklearn':>11} {'compilado':>11} {'x':>6}")
+    for n in (1, 10, 100, 10_000):
+        batch = df.iloc[:n]
+        repeat = 50 if n <= 100 else 5
+        reference = timing(lambda: model.predict_proba(preprocessor.transform(batch)), repeat)
+        fast = timing(lambda: compiled.predict_proba(batch), repeat)
+        print(f"{n:>6} {reference * 1000:>8.2f} ms {fast * 1000:>8.2f} ms {reference / fast:>6.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from synthetic import ROOT
+
+sys.path.insert(0, os.path.join(ROOT, 'chollos'))
+from chollo import label_samples
+
+
+def legacy_label_samples(labeled_data):
+    # Versión anterior de chollos/chollo.py: una fila cada vez
+    for idx, row in labeled_data.iterrows():
+        if 'Apple' in str(row['Procesador']) and row['Precio'] > 1500:
+            labeled_data.at[idx, 'es_chollo'] = 0
+        if row['Precio'] < 500 and row['RAM'] >= 8 and row['Almacenamiento'] >= 512:
+            labeled_data.at[idx, 'es_chollo'] = 1
+        if 'i7' in str(row['Procesador']) and row['Precio'] < 900 and row['RAM'] >= 16:
+            labeled_data.at[idx, 'es_chollo'] = 1
+    return labeled_data
+
+
+def sample_rows(n, seed=0):
+    # Filas que caen en cada regla, en varias a la vez y en ninguna
+    rng = np.random.default_rng(seed)
+    processors = ['Apple M3', 'Intel Core i7-1355U', 'Intel Core i5-1235U', 'AMD Ryzen 7 7730U', np.nan]
+    return pd.DataFrame({
+        'Procesador': rng.choice(np.array(processors, dtype=object), n),
+        'Precio': rng.uniform(200, 2500, n).round(2),
+        'RAM': rng.choice([4.0, 8.0, 16.0, 32.0], n),
+        'Almacenamiento': rng.choice([256.0, 512.0, 1024.0], n),
+        'es_chollo': rng.integers(0, 2, n),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reglas de etiquetado de chollo.py: iterrows contra máscaras")
+    parser.add_argument('--rows', type=int, default=100_000)
+    args = parser.parse_args()
+
+    df = sample_rows(args.rows)
+    start = time.perf_counter()
+    expected = legacy_label_samples(df.copy())
+    legacy = time.perf_counter() - start
+    start = time.perf_counter()
+    result = label_samples(df.copy())
+    vectorized = time.perf_counter() - start
+    pd.testing.assert_frame_equal(result, expected)
+    print(f"{args.rows} filas: iterrows {legacy:.2f} s, máscaras {vectorized * 1000:.1f} ms "
+          f"({legacy / vectorized:.0f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+import argparse
+import os
+import re
+import time
+
+import numpy as np
+
+from synthetic import ROOT, sample_filters, write_catalog
+
+
+def check_exposition(text):
+    # Formato de Prometheus: buckets acumulativos, crecientes y con +Inf igual a _count
+    buckets, counts = {}, {}
+    for line in text.splitlines():
+        if not line or line.startswith('#'):
+            continue
+        series, value = line.rsplit(' ', 1)
+        assert re.fullmatch(r'[a-z_]+(\{[a-z_]+="[^"]*"(,[a-z_]+="[^"]*")*\})?', series), line
+        value = float(value)
+        if '_bucket{' in series:
+            buckets.setdefault(re.sub(r',?le="[^"]*"', '', series.replace('_bucket', '')), []).append(value)
+        elif '_count{' in series:
+            counts[series.replace('_count', '')] = value
+    assert buckets and buckets.keys() == counts.keys()
+    for series, values in buckets.items():
+        assert values == sorted(values) and values[-1] == counts[series], series
+    return counts
+
+
+def check_profiler_access(client):
+    # POST /profiler: sólo desde la propia máquina o, con CHOLLOS_PROFILER_TOKEN, con ese token; GET es libre
+    from metrics import PROFILER, PROFILER_TOKEN_HEADER
+    remote = {'REMOTE_ADDR': '10.0.0.5'}
+    off = {'enabled': False}
+    assert client.post('/profiler', json=off, environ_base=remote).status_code == 403
+    assert client.get('/profiler', environ_base=remote).status_code == 200
+    assert client.post('/profiler', json=off).status_code == 200
+    os.environ['CHOLLOS_PROFILER_TOKEN'] = 'secreto'
+    try:
+        assert client.post('/profiler', json=off).status_code == 403
+        assert client.post('/profiler', json=off, headers={PROFILER_TOKEN_HEADER: 'otro'}).status_code == 403
+        assert client.post('/profiler', json=off, environ_base=remote,
+                           headers={PROFILER_TOKEN_HEADER: 'secreto'}).status_code == 200
+    finally:
+        del os.environ['CHOLLOS_PROFILER_TOKEN']
+    # Cuerpos que no son un objeto o intervalos que no son un número positivo: 400, sin tocar el perfilador
+    for body in ([1, 2], "on", {'enabled': True, 'interval': 'rápido'}, {'enabled': True, 'interval': -1},
+                 {'enabled': True, 'interval': True}):
+        response = client.post('/profiler', json=body)
+        assert response.status_code == 400 and 'error' in response.get_json(), (body, response.status_code)
+    assert not PROFILER.running
+    print("POST /profiler: 400 con cuerpos o intervalos no válidos; 403 desde fuera sin token, 200 desde la máquina o con el token")
+
+
+def run(client, filters):
+    times = []
+    for f in filters:
+        start = time.perf_counter()
+        response = client.post('/search_offers?limit=50&sort=-Probabilidad_IA', json=f)
+        assert response.status_code == 200
+        times.append(time.perf_counter() - start)
+    return np.array(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Coste de las métricas por etapa, de los logs y del perfilador")
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--requests', type=int, default=300)
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    import backend
+    from metrics import METRICS, PROFILER, log, setup_logging, stage
+    from offer_store import OfferStore
+    from result_cache import ResultCache
+
+    path = write_catalog(args.rows, f'/tmp/chollos_{args.rows}.csv')
+    backend.store = OfferStore(path, on_load=[backend.scores.refresh])
+    snapshot = backend.store.snapshot()
+    # Sin caché de respuestas: todas las peticiones pasan por todas las etapas
+    backend.results = ResultCache(max_bytes=0)
+    client = backend.app.test_client()
+    filters = sample_filters(snapshot.df, args.requests)
+    setup_logging('OFF')
+    run(client, filters[:20])
+
+    # 1. Desglose por etapa y validez del texto de /metrics
+    METRICS.reset()
+    off = run(client, filters)
+    counts = check_exposition(client.get('/metrics').get_data(as_text=True))
+    assert counts['chollos_request_seconds{endpoint="/search_offers"}'] == args.requests
+    assert counts['chollos_stage_seconds{stage="filter"}'] == args.requests
+    print(f"{args.rows} filas, {args.requests} búsquedas distintas (top 50), logs apagados: "
+          f"{np.median(off):.2f} ms de mediana")
+    for name, data in sorted(METRICS.snapshot().items(), key=lambda item: -item[1]['total_ms']):
+        print(f"  {name:<12} {data['total_ms'] / data['count']:8.3f} ms/llamada  {data['count']:5d} llamadas  "
+              f"filas {data['rows_in'] or 0:>10} -> {data['rows_out'] or 0}")
+
+    # 2. Coste de un temporizador de etapa vacío
+    n = 200_000
+    start = time.perf_counter()
+    for _ in range(n):
+        with stage('vacia', 1) as timer:
+            timer.rows_out = 1
+    per_stage = (time.perf_counter() - start) / n
+    stages_per_request = sum(d['count'] for name, d in METRICS.snapshot().items() if name != 'vacia') / args.requests
+    print(f"temporizador de etapa: {per_stage * 1e6:.2f} µs; {stages_per_request:.1f} etapas por búsqueda = "
+          f"{per_stage * stages_per_request * 1000 / np.median(off):.2%} de la petición")
+
+    # 3. Logs con una línea por petición y etapa (a /dev/null) frente a apagados
+    setup_logging('DEBUG')
+    with open(os.devnull, 'w') as devnull:
+        stream = log.handlers[0].setStream(devnull)
+        debug = run(client, filters)
+        log.handlers[0].setStream(stream)
+    setup_logging('OFF')
+    print(f"logs DEBUG a /dev/null: {np.median(debug):.2f} ms de mediana ({np.median(debug) / np.median(off) - 1:+.1%})")
+
+    # 4. Perfilador encendido (una muestra cada 5 ms) frente a apagado
+    PROFILER.start()
+    profiled = run(client, filters)
+    PROFILER.stop()
+    assert PROFILER.samples > 0 and 'search (offer_search.py' in PROFILER.collapsed()
+    print(f"perfilador a {PROFILER.interval * 1000:.0f} ms: {np.median(profiled):.2f} ms de mediana "
+          f"({np.median(profiled) / np.median(off) - 1:+.1%}), {PROFILER.samples} muestras")
+
+    check_profiler_access(client)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+import argparse
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+from fixtures import SPECS_PATH, spec_documents
+import normalize
+
+
+# --- Funciones anteriores (notebooks de webscrapping), una ficha cada vez ---
+
+def legacy_simplify_procesador(proc_dict):
+    fabricante = proc_dict.get("Fabricante de procesador", "").strip()
+    familia = proc_dict.get("Familia de procesador", "").strip()
+    modelo = proc_dict.get("Modelo del procesador", "").strip()
+    familia_clean = re.sub(r"[®™]", "", familia).strip()
+    if fabricante and fabricante not in familia_clean:
+        familia_clean = f"{fabricante} {familia_clean}".strip()
+    last_token = familia_clean.split()[-1]
+    if modelo.startswith(last_token):
+        new_model = modelo[len(last_token):]
+        if new_model.startswith("-"):
+            final = f"{familia_clean}{new_model}"
+        else:
+            final = f"{familia_clean}-{modelo}"
+    else:
+        final = f"{familia_clean}-{modelo}"
+    return final
+
+
+def legacy_first_number(value):
+    match = re.search(r"(\d+)", value)
+    return match.group(1) if match else ""
+
+
+def legacy_simplify_specs(specs):
+    memoria = specs.get("Memoria", {})
+    almacenaje = specs.get("Medios de almacenaje", {})
+    exhibicion = specs.get("Exhibición", {})
+    tipo_ram = re.search(r"(DDR\d+)", memoria.get("Tipo de memoria interna", ""), re.IGNORECASE)
+    diag = re.search(r"\(([\d\.]+)\"", exhibicion.get("Diagonal de la pantalla", ""))
+    numbers = re.findall(r"(\d+)", exhibicion.get("Resolución de la pantalla", ""))
+    return {
+        "Procesador": legacy_simplify_procesador(specs.get("Procesador", {})),
+        "RAM": legacy_first_number(memoria.get("Memoria interna", "")),
+        "Tipo RAM": tipo_ram.group(1).upper() if tipo_ram else "",
+        "Almacenamiento": legacy_first_number(almacenaje.get("Capacidad total de SSD", "") or almacenaje.get("SDD, capacidad", "")),
+        "Graficos": specs.get("Gráficos", {}).get("Modelo de adaptador gráfico incorporado", "").strip(),
+        "Pantalla": diag.group(1) if diag else "",
+        "Resolucion": f"{numbers[0]}x{numbers[1]}" if len(numbers) >= 2 else "",
+        "Sistema Operativo": specs.get("Software", {}).get("Sistema operativo instalado", "").strip(),
+        "Bateria": legacy_first_number(specs.get("Batería", {}).get("Capacidad de batería", "")),
+        "Precio": specs.get("Precio", ""),
+    }
+
+
+# --- Funciones anteriores de chollos/chollo.py (DataFrame.apply fila a fila) ---
+
+def legacy_cpu_type(x):
+    return ('Intel' if 'Intel' in str(x) else
+            ('Apple' if 'Apple' in str(x) else
+             ('AMD' if 'AMD' in str(x) else
+              ('Qualcomm' if 'Qualcomm' in str(x) else 'Otro'))))
+
+
+def legacy_extract_cpu_gen(cpu):
+    if not isinstance(cpu, str):
+        return 0
+    if 'Core i' in cpu:
+        for i in range(3, 15):
+            if f'i{i}-' in cpu or f'i{i} ' in cpu:
+                return i
+    elif 'Ultra' in cpu:
+        return 15
+    elif 'M' in cpu:
+        return int(cpu.split('-')[1][1]) if '-M' in cpu else 0
+    return 0
+
+
+def legacy_extract_resolution_pixels(res_str):
+    if not isinstance(res_str, str):
+        return 0
+    try:
+        parts = res_str.split('x')
+        if len(parts) == 2:
+            return int(parts[0]) * int(parts[1])
+        return 0
+    except:
+        return 0
+
+
+def legacy_ram_type_to_num(ram_type):
+    if not isinstance(ram_type, str):
+        return 4
+    try:
+        if 'DDR' in ram_type:
+            return int(ram_type.replace('DDR', ''))
+        return 4
+    except:
+        return 4
+
+
+def legacy_screen_size_to_float(size):
+    if not isinstance(size, (int, float, str)):
+        return 15.6
+    try:
+        if isinstance(size, str):
+            return float(size)
+        return size
+    except:
+        return 15.6
+
+
+def training_frame(n_rows, seed=42):
+    # Tabla simplificada real remuestreada, con algunos valores raros en las columnas de texto
+    base = pd.read_csv(SPECS_PATH)
+    rng = np.random.default_rng(seed)
+    df = base.iloc[rng.integers(0, len(base), n_rows)].reset_index(drop=True)
+    odd = rng.random(n_rows) < 0.02
+    df.loc[odd, 'Procesador'] = rng.choice(
+        ['Intel Core i7 13700H', 'Intel Core i5-', 'Apple M-M2 Max', 'Core i13-x', np.nan], odd.sum())
+    df.loc[odd, 'Resolucion'] = rng.choice(['1920x', ' 2560 x 1600 ', 'axb', '1_920x1080', np.nan], odd.sum())
+    df.loc[odd, 'Tipo RAM'] = rng.choice(['LPDDR5', 'DDR 5', 'SDRAM', np.nan], odd.sum())
+    df['Pantalla texto'] = df['Pantalla'].astype(str)
+    df.loc[odd, 'Pantalla texto'] = rng.choice(['15,6', ' 14 ', 'inf', 'n/a'], odd.sum())
+    return df
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def bench_specs(n_rows):
+    docs = spec_documents(n_rows)
+
+    def legacy():
+        rows = []
+        for doc in docs:
+            try:
+                rows.append(legacy_simplify_specs(doc))
+            except IndexError:
+                # Sin fabricante ni familia: la versión anterior fallaba
+                rows.append(None)
+        return rows
+
+    expected, legacy_s = timed(legacy)
+    result, vector_s = timed(lambda: normalize.simplify_many(docs))
+
+    failed = np.array([row is None for row in expected])
+    assert result.loc[failed, 'Procesador'].isna().all()
+    expected = pd.DataFrame([row for row in expected if row is not None], columns=normalize.FIELDNAMES)
+    assert result[~failed].reset_index(drop=True).equals(expected), "simplify_many no coincide con simplify_specs"
+    print(f"fichas -> tabla ({n_rows} filas, {failed.sum()} sin procesador): "
+          f"simplify_specs {legacy_s:6.2f} s, normalize {vector_s:6.2f} s ({legacy_s / vector_s:5.1f}x)")
+
+
+def bench_training(n_rows):
+    df = training_frame(n_rows)
+    cases = [
+        ('Tipo', 'Procesador', legacy_cpu_type, normalize.cpu_type),
+        ('CPU_Generation', 'Procesador', legacy_extract_cpu_gen, normalize.cpu_generation),
+        ('Resolution_Pixels', 'Resolucion', legacy_extract_resolution_pixels, normalize.resolution_pixels),
+        ('RAM_Type_Num', 'Tipo RAM', legacy_ram_type_to_num, normalize.ram_type_number),
+        ('Screen_Size_Num', 'Pantalla', legacy_screen_size_to_float, normalize.screen_size),
+        ('Screen_Size_Num (texto)', 'Pantalla texto', legacy_screen_size_to_float, normalize.screen_size),
+    ]
+    for name, col, legacy, vectorized in cases:
+        expected, legacy_s = timed(lambda: df[col].apply(legacy))
+        result, vector_s = timed(lambda: vectorized(df[col]))
+        assert result.astype(expected.dtype).equals(expected), f"{name} no coincide"
+        assert result.dtype == expected.dtype or name == 'Tipo', f"{name}: {result.dtype} != {expected.dtype}"
+        print(f"{name:<24} ({n_rows} filas): apply {legacy_s:6.2f} s, normalize {vector_s:6.3f} s "
+              f"({legacy_s / vector_s:6.1f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Normalización vectorizada frente a las funciones fila a fila")
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+    bench_specs(args.rows)
+    bench_training(args.rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+import argparse
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pandas as pd
+import requests
+
+from bench_serving import FLASK_SERVER, wait_until_up
+from synthetic import ROOT, sample_filters, write_catalog
+
+from offer_client import DEBOUNCE_SECONDS, NETWORK_THREADS, NetworkThreads, OfferPager, fetch_similar
+
+
+def legacy_search(session, url, filters):
+    # app.py anterior: todas las ofertas en una respuesta y un único texto con todas
+    offers = session.post(f"{url}/search_offers", json=filters, timeout=60).json()["offers"]
+    return "\n".join(f"🖥️ {o.get('Procesador', 'N/A')} 💰 {o.get('Precio', 'N/A')}€ {'=' * 40}" for o in offers)
+
+
+class Sessions:
+    # Fábrica de sesiones para NetworkThreads: anota el hilo que crea cada una y puede hacer que la
+    # primera petición (de todas) tarde lo suficiente para que llegue otra búsqueda mientras tanto
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.threads = []
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        session = requests.Session()
+        self.threads.append(threading.get_ident())
+        post = session.post
+
+        def slow_post(*args, **kwargs):
+            with self._lock:
+                delay, self.delay = self.delay, 0
+            time.sleep(delay)
+            return post(*args, **kwargs)
+        session.post = slow_post
+        return session
+
+
+class Collector:
+    # Callbacks de OfferPager: guarda las páginas y avisa cuando llega cada una
+
+    def __init__(self):
+        self.pages = []
+        self.errors = []
+        self.arrived = threading.Event()
+
+    def on_page(self, offers, offset, total):
+        self.pages.append((offers, offset, total))
+        self.arrived.set()
+
+    def on_error(self, message):
+        self.errors.append(message)
+        self.arrived.set()
+
+    def wait(self, timeout=60):
+        assert self.arrived.wait(timeout), "no ha llegado ninguna página"
+        self.arrived.clear()
+
+
+def similar(network, url, offer_id, catalog_version):
+    # fetch_similar esperando a que termine: (respuesta, None) o (None, mensaje de error)
+    results, errors = [], []
+    fetch_similar(network, offer_id, catalog_version, results.append, errors.append, url=url).result(120)
+    return (results[0], None) if results else (None, errors[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Paginación en segundo plano, debounce y cancelación de app.py")
+    parser.add_argument('--rows', type=int, default=200_000)
+    args = parser.parse_args()
+
+    path = write_catalog(args.rows, f'/tmp/chollos_{args.rows}.csv')
+    server = subprocess.Popen([sys.executable, '-c', FLASK_SERVER, path, '5097'], cwd=ROOT,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        url = 'http://127.0.0.1:5097'
+        wait_until_up(url)
+        session = requests.Session()
+        filters = {"processor": "i7"}
+        expected = session.post(f"{url}/search_offers", json=filters).json()
+
+        # 1. Las páginas de load_more() juntas son la respuesta completa
+        sessions = Sessions()
+        network = NetworkThreads(sessions)
+        collected = Collector()
+        pager = OfferPager(network, collected.on_page, collected.on_error, url=url, page_size=500)
+        start = time.perf_counter()
+        pager.search(filters)
+        blocked = time.perf_counter() - start
+        collected.wait()
+        first_page = time.perf_counter() - start
+        while pager.load_more():
+            collected.wait()
+        assert not collected.errors and pager.exhausted
+        assert [o for offers, _, _ in collected.pages for o in offers] == expected["offers"]
+        assert [offset for _, offset, _ in collected.pages] == list(range(0, expected["total"], 500))
+        # Una sesión por hilo de red, nunca compartida
+        assert len(sessions.threads) == len(set(sessions.threads)) <= NETWORK_THREADS, sessions.threads
+
+        # 2. Diez búsquedas seguidas (escribiendo en el campo): sólo se envía la última
+        collected = Collector()
+        pager = OfferPager(network, collected.on_page, collected.on_error, url=url)
+        combos = sample_filters(pd.read_csv(path, nrows=1000), 10)
+        for combo in combos:
+            pager.search(combo)
+        collected.wait()
+        time.sleep(pager.debounce * 2)
+        last = session.post(f"{url}/search_offers", json=combos[-1]).json()
+        assert pager.sent == 1 and len(collected.pages) == 1
+        assert collected.pages[0][2] == last["total"] and collected.pages[0][0] == last["offers"][:pager.page_size]
+
+        # 3. Sin debounce, una búsqueda en vuelo que se queda vieja se descarta
+        collected = Collector()
+        pager = OfferPager(NetworkThreads(Sessions(delay=0.5)), collected.on_page, collected.on_error, url=url, debounce=0)
+        pager.search({})
+        time.sleep(0.1)
+        pager.search(filters)
+        collected.wait()
+        time.sleep(1)
+        assert pager.sent == 2 and [total for _, _, total in collected.pages] == [expected["total"]]
+
+        # 4. /similar con el catalog_version de la búsqueda; cuando el catálogo cambia, 409 y mensaje de volver a buscar
+        version = pager.catalog_version
+        offer = collected.pages[0][0][0]
+        body, error = similar(network, url, offer["id"], version)
+        assert error is None and body["offer"]["id"] == offer["id"] and body["catalog_version"] == version
+        mtime = os.stat(path).st_mtime_ns
+        os.utime(path, ns=(mtime, mtime + 10**9))
+        time.sleep(1.5)
+        body, error = similar(network, url, offer["id"], version)
+        assert body is None and "vuelve a buscar" in error, error
+        current = session.post(f"{url}/search_offers?limit=1", json=filters).json()["catalog_version"]
+        assert current != version and similar(network, url, offer["id"], current)[1] is None
+
+        start = time.perf_counter()
+        legacy_search(session, url, {})
+        legacy = time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait()
+    print(f"{args.rows} ofertas: search() vuelve en {blocked * 1000:.2f} ms; primera página de 500 en "
+          f"{first_page * 1000:.0f} ms (incluye {DEBOUNCE_SECONDS * 1000:.0f} ms de debounce); "
+          f"antes, todas las ofertas en un texto: {legacy * 1000:.0f} ms con la interfaz bloqueada")
+
+
+if __name__ == '__main__':
+    main()
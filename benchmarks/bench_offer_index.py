@@ -0,0 +1,71 @@
+import argparse
+import time
+
+import numpy as np
+
+from synthetic import grow_catalog, sample_filters
+from offer_store import CatalogSnapshot, _read_catalog
+
+
+def legacy_filter(df, filters):
+    # Camino anterior de backend.py: una máscara y un DataFrame nuevo por filtro
+    filtered_df = df
+    if filters.get("processor"):
+        filtered_df = filtered_df[
+            filtered_df["Procesador"].str.contains(filters["processor"], case=False, na=False)
+        ]
+    exact_filters = {
+        "ram": "RAM", "ramType": "Tipo RAM", "storage": "Almacenamiento",
+        "graphics": "Graficos", "screen": "Pantalla", "resolution": "Resolucion",
+        "os": "Sistema Operativo", "battery": "Bateria", "price": "Precio"
+    }
+    for key, col in exact_filters.items():
+        if filters.get(key):
+            if key in ["ram", "storage", "battery", "price"]:
+                filtered_df = filtered_df[filtered_df[col] <= float(filters[key])]
+            else:
+                filtered_df = filtered_df[filtered_df[col] == filters[key]]
+    return filtered_df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de los índices de /search_offers")
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+
+    for n_rows in args.rows:
+        path = f'/tmp/chollos_{n_rows}.csv'
+        grow_catalog(n_rows).to_csv(path, index=False)
+        df = _read_catalog(path)
+
+        start = time.perf_counter()
+        snapshot = CatalogSnapshot(df, path, 0, 0)
+        build = time.perf_counter() - start
+
+        queries = sample_filters(df, args.queries)
+        legacy_times, index_times, lookup_times = [], [], []
+        for filters in queries:
+            start = time.perf_counter()
+            expected = legacy_filter(df, filters)
+            legacy_times.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            rows = snapshot.index.query(filters)
+            lookup_times.append(time.perf_counter() - start)
+            result = df if len(rows) == len(df) else df.iloc[rows]
+            index_times.append(time.perf_counter() - start)
+
+            assert np.array_equal(expected.index.to_numpy(), result.index.to_numpy()), filters
+
+        legacy_ms = np.array(legacy_times) * 1000
+        index_ms = np.array(index_times) * 1000
+        lookup_ms = np.array(lookup_times) * 1000
+        print(f"{n_rows:>9} filas | índices construidos en {build * 1000:.0f} ms")
+        print(f"          antes : p50 {np.median(legacy_ms):8.2f} ms  p99 {np.percentile(legacy_ms, 99):8.2f} ms")
+        print(f"          índice: p50 {np.median(index_ms):8.2f} ms  p99 {np.percentile(index_ms, 99):8.2f} ms"
+              f"  (solo búsqueda: p50 {np.median(lookup_ms):.2f} ms  p99 {np.percentile(lookup_ms, 99):.2f} ms)")
+
+
+if __name__ == '__main__':
+    main()
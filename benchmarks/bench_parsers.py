@@ -0,0 +1,50 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from fixtures import build_site
+from webscrapping.parsers import PARSER_BACKENDS, parse_laptop_specs
+
+
+def _parse(item, backend):
+    url, html = item
+    return parse_laptop_specs(html, url, backend)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Páginas/s de cada backend de parseo y nº de núcleos")
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--backends', nargs='+', default=list(PARSER_BACKENDS))
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    args = parser.parse_args()
+
+    site, _ = build_site(args.pages)
+    items = [(path, html) for path, html in site.items() if path.endswith('/p')]
+    print(f"{len(items)} fichas de fixture, {sum(len(h) for _, h in items) / len(items) / 1024:.0f} KB de media, "
+          f"{os.cpu_count()} núcleos")
+
+    reference = [_parse(item, 'html.parser') for item in items]
+    for backend in args.backends:
+        parsed = [_parse(item, backend) for item in items]
+        assert parsed == reference, f"{backend} no da la misma salida que html.parser"
+
+        start = time.perf_counter()
+        for item in items:
+            _parse(item, backend)
+        elapsed = time.perf_counter() - start
+        print(f"{backend:<12} en proceso : {len(items) / elapsed:8.1f} páginas/s")
+
+        for workers in args.workers:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(partial(_parse, backend=backend), items[:workers]))  # arrancar los procesos
+                start = time.perf_counter()
+                list(pool.map(partial(_parse, backend=backend), items, chunksize=4))
+                elapsed = time.perf_counter() - start
+            print(f"{backend:<12} {workers:>2} procesos: {len(items) / elapsed:8.1f} páginas/s")
+
+
+if __name__ == '__main__':
+    main()
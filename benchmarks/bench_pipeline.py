@@ -0,0 +1,182 @@
+import argparse
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import pandas as pd
+
+from fixtures import spec_documents
+from synthetic import ROOT
+
+from offer_store import OfferStore
+from pipeline import MODEL_FILES, SPECS_FILE, Pipeline, Stage, _replace, build_stages, save_specs
+from webscrapping.storage import open_collection
+from scoring import ScoreCache
+
+
+class Dag:
+    # DAG de juguete: dos "tiendas" que tardan lo mismo, una unión y una etapa que falla si se le pide
+    def __init__(self, delay):
+        self.delay = delay
+        self.fail = threading.Event()
+        self.calls = []
+
+    def store(self, params, inputs, out_dir):
+        self.calls.append(params['store'])
+        time.sleep(self.delay)
+        with open(os.path.join(out_dir, 'specs.txt'), 'w') as f:
+            f.write(f"{params['store']}:{params['version']}")
+
+    def join(self, params, inputs, out_dir):
+        self.calls.append('join')
+        with open(os.path.join(out_dir, 'all.txt'), 'w') as f:
+            f.write(','.join(sorted(inputs[name]['hash'] for name in inputs)))
+
+    def fragile(self, params, inputs, out_dir):
+        self.calls.append('fragile')
+        if self.fail.is_set():
+            raise RuntimeError("fallo provocado")
+        open(os.path.join(out_dir, 'ok'), 'w').close()
+
+    def stages(self, versions):
+        stages = [Stage(f'scrape:{store}', self.store, params={'store': store, 'version': version})
+                  for store, version in versions.items()]
+        stages.append(Stage('join', self.join, [stage.name for stage in stages]))
+        stages.append(Stage('fragile', self.fragile, ['join']))
+        return stages
+
+
+def check_runner(work_dir, delay=0.5):
+    dag = Dag(delay)
+    # 1. Las tiendas corren en paralelo
+    start = time.perf_counter()
+    record = Pipeline(dag.stages({'a': 1, 'b': 1}), work_dir).run('1')
+    parallel = time.perf_counter() - start
+    assert record['status'] == 'done' and parallel < 2 * delay, parallel
+    # 2. Misma entrada: todo se salta
+    dag.calls.clear()
+    record = Pipeline(dag.stages({'a': 1, 'b': 1}), work_dir).run('2')
+    assert dag.calls == [] and all(info['status'] == 'skipped' for info in record['stages'].values())
+    # 3. Cambia una tienda y falla la última etapa: se guardan las anteriores y al retomar sólo se repite la que falló
+    dag.fail.set()
+    record = Pipeline(dag.stages({'a': 2, 'b': 1}), work_dir).run('3')
+    assert record['status'] == 'failed' and record['stages']['fragile']['status'] == 'failed'
+    assert sorted(dag.calls) == ['a', 'fragile', 'join'], dag.calls
+    dag.fail.clear()
+    dag.calls.clear()
+    record = Pipeline(dag.stages({'a': 2, 'b': 1}), work_dir).run('3')
+    assert record['status'] == 'done' and record['attempts'] == 2 and dag.calls == ['fragile'], dag.calls
+    return parallel
+
+
+def check_normalize(work_dir, n_docs=300):
+    # scrape -> normalize con fichas de prueba en vez de rastrear: normalize sólo se repite si cambia
+    # lo que exporta (los rastreos o la base de fichas), y sin tiendas el error es claro
+    try:
+        build_stages('vacía', stores=[])
+        raise AssertionError("build_stages sin tiendas tendría que fallar")
+    except ValueError:
+        pass
+    docs = spec_documents(n_docs)
+    crawls = {'tienda_a': docs[:n_docs // 2], 'tienda_b': docs[n_docs // 2:]}
+
+    def fake_scrape(params, inputs, out_dir):
+        save_specs(params, crawls[params['store']], out_dir)
+        return {'store': params['store'], 'specs': len(crawls[params['store']])}
+
+    db_path = os.path.join(work_dir, 'specs.db')
+    os.makedirs(work_dir, exist_ok=True)
+
+    def run(run_id):
+        stages = [stage for stage in build_stages(run_id, stores=list(crawls), db_path=db_path)
+                  if stage.name.startswith('scrape:') or stage.name == 'normalize']
+        for stage in stages:
+            if stage.name.startswith('scrape:'):
+                stage.fn = fake_scrape
+        record = Pipeline(stages, os.path.join(work_dir, 'runs')).run(run_id)
+        assert record['status'] == 'done', record
+        return record['stages']['normalize']
+
+    assert run('1')['status'] == 'done'
+    # Mismos rastreos y misma base: checkpoint
+    assert run('2')['status'] == 'skipped'
+    # La base cambia fuera de la ejecución (otro proceso guarda una ficha): normalize vuelve a exportar
+    changed = dict(docs[0], Precio='1,00')
+    other = open_collection('tienda_c', path=db_path)
+    other.bulk_upsert([dict(changed, URL='https://otra.example/p/1')])
+    other.close()
+    info = run('3')
+    assert info['status'] == 'done'
+    exported = pd.read_csv(os.path.join(work_dir, 'runs', 'checkpoints', 'normalize', info['key'], SPECS_FILE))
+    assert 'https://otra.example/p/1' in set(exported['URL'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pipeline con checkpoints: ejecución completa, repetida y retomada")
+    parser.add_argument('--trials', type=int, default=5)
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    work = tempfile.mkdtemp(prefix='pipeline-')
+    try:
+        parallel = check_runner(os.path.join(work, 'toy'))
+        print(f"DAG de prueba: 2 tiendas de 0.5 s en paralelo en {parallel:.2f} s; "
+              f"repetición sin cambios y reanudación tras un fallo correctas")
+        check_normalize(os.path.join(work, 'normalize'))
+        print("normalize: checkpoint con los mismos rastreos y la misma base; se repite si cambia la base")
+
+        # Pipeline real a partir de la tabla exportada, publicando en directorios temporales
+        source = os.path.join(work, 'specs_simplified_all.csv')
+        shutil.copyfile(os.path.join('webscrapping', 'specs_simplified_all.csv'), source)
+        model_dir = os.path.join(work, 'model')
+        options = dict(input_csv=source, trials=args.trials, jobs=1, storage=f"sqlite:///{work}/optuna.db",
+                       model_dirs=[model_dir], artifact_dir=os.path.join(work, 'catalog'),
+                       catalog_csv=os.path.join(work, 'chollos.csv'))
+        pipeline_dir = os.path.join(work, 'runs')
+        timings = {}
+        for run_id in ['cold', 'warm']:
+            start = time.perf_counter()
+            record = Pipeline(build_stages(run_id, **options), pipeline_dir).run(run_id)
+            timings[run_id] = time.perf_counter() - start
+            assert record['status'] == 'done', record
+        ran = [name for name, info in record['stages'].items() if info['status'] == 'done']
+        assert ran == ['publish'], ran
+
+        # El backend recoge catálogo y modelo nuevos sin reiniciar
+        store = OfferStore(options['artifact_dir'], check_interval=0)
+        scores = ScoreCache(os.path.join(model_dir, 'model_chollo.pkl'), os.path.join(model_dir, 'preprocessor.pkl'),
+                            check_interval=0)
+        before, model_before = store.snapshot().version, scores.model_hash
+        previous = os.path.join(work, 'model-before')
+        shutil.copytree(model_dir, previous)
+        pd.read_csv(source).iloc[:-20].to_csv(source, index=False)
+        time.sleep(0.01)
+        start = time.perf_counter()
+        record = Pipeline(build_stages('changed', **options), pipeline_dir).run('changed')
+        timings['changed'] = time.perf_counter() - start
+        assert all(info['status'] == 'done' for info in record['stages'].values()), record
+        snapshot = store.snapshot()
+        scores.refresh(snapshot)
+        assert snapshot.version != before and scores.model_hash != model_before
+
+        # Publicación a medias (como publish, fichero a fichero): hasta el último .pkl se sirve la pareja anterior
+        model_after = scores.model_hash
+        for i, name in enumerate(MODEL_FILES):
+            time.sleep(0.01)
+            _replace(os.path.join(previous, name), os.path.join(model_dir, name))
+            scores.refresh(snapshot)
+            expected = model_before if i == len(MODEL_FILES) - 1 else model_after
+            assert scores.model_hash == expected, (name, scores.model_hash, expected)
+
+        print(f"pipeline real ({args.trials} pruebas de Optuna): primera ejecución {timings['cold']:.1f} s, "
+              f"repetida sin cambios {timings['warm']:.2f} s (sólo publish), con datos nuevos {timings['changed']:.1f} s")
+        for name, info in record['stages'].items():
+            print(f"  {name:<8} {info['seconds']:.2f} s")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
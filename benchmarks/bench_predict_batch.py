@@ -0,0 +1,92 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import joblib
+import numpy as np
+
+from synthetic import ROOT, grow_catalog
+from scoring import FEATURE_COLUMNS, predict
+
+
+def write_inputs(n_rows, directory='/tmp'):
+    # El mismo lote de ofertas en los tres formatos de entrada
+    df = grow_catalog(n_rows)[FEATURE_COLUMNS]
+    paths = {}
+    paths['csv'] = os.path.join(directory, f'ofertas_{n_rows}.csv')
+    df.to_csv(paths['csv'], index=False)
+    paths['ndjson'] = os.path.join(directory, f'ofertas_{n_rows}.ndjson')
+    df.to_json(paths['ndjson'], orient='records', lines=True, force_ascii=False)
+    paths['json'] = os.path.join(directory, f'ofertas_{n_rows}.json')
+    df.to_json(paths['json'], orient='records', force_ascii=False)
+    return df, paths
+
+
+# VmHWM es el pico de memoria del propio proceso (ru_maxrss también cuenta el del proceso que lo lanza)
+RUN_CLI = """
+import runpy, sys
+sys.argv = ['predict_batch.py'] + sys.argv[1:]
+runpy.run_path('predict_batch.py', run_name='__main__')
+print([l.split()[1] for l in open('/proc/self/status') if l.startswith('VmHWM')][0])
+"""
+
+
+def run_cli(path, out):
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', RUN_CLI, path, '--out', out], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    return time.perf_counter() - start, int(result.stdout.split()[-1]) / 1024
+
+
+def check_endpoint(df):
+    # /predict_batch con los tres formatos, en JSON y en NDJSON, contra una predicción directa
+    os.chdir(ROOT)
+    import backend
+    client = backend.app.test_client()
+    _, expected = backend.scores.predict(df)
+    bodies = {
+        'application/json': df.to_json(orient='records'),
+        'text/csv': df.to_csv(index=False),
+        'application/x-ndjson': df.to_json(orient='records', lines=True),
+    }
+    for content_type, body in bodies.items():
+        response = client.post('/predict_batch', data=body, content_type=content_type)
+        prob = [p['probabilidad'] for p in response.get_json()['predictions']]
+        assert np.allclose(prob, expected, rtol=0, atol=1e-12), content_type
+        response = client.post('/predict_batch?format=ndjson', data=body, content_type=content_type)
+        prob = [json.loads(line)['probabilidad'] for line in response.get_data().splitlines()]
+        assert np.allclose(prob, expected, rtol=0, atol=1e-12), content_type
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Filas/s de predict_batch.py por formato de entrada")
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 1_000_000])
+    parser.add_argument('--formats', nargs='+', default=['csv', 'ndjson', 'json'])
+    args = parser.parse_args()
+
+    model = joblib.load(os.path.join(ROOT, 'model/model_chollo.pkl'))
+    preprocessor = joblib.load(os.path.join(ROOT, 'model/preprocessor.pkl'))
+    for n_rows in args.rows:
+        df, paths = write_inputs(n_rows)
+        if n_rows <= 10_000:
+            check_endpoint(df.head(2000))
+            _, expected = predict(model, preprocessor, df)
+        for fmt in args.formats:
+            out = f'/tmp/predicciones_{n_rows}_{fmt}.ndjson'
+            elapsed, peak_mb = run_cli(paths[fmt], out)
+            with open(out, 'rb') as f:
+                lines = sum(1 for _ in f)
+            assert lines == n_rows
+            if n_rows <= 10_000:
+                with open(out, 'rb') as f:
+                    prob = [json.loads(line)['probabilidad'] for line in f]
+                assert np.allclose(prob, expected, rtol=0, atol=1e-12), fmt
+            print(f"{n_rows:>9} filas {fmt:<7}: {elapsed:7.1f} s, {n_rows / elapsed:9.0f} filas/s, "
+                  f"pico RSS {peak_mb:6.0f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+import argparse
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+from fixtures import spec_documents
+from synthetic import ROOT, grow_catalog
+
+from normalize import parse_price
+
+from offer_search import search
+from offer_store import OfferStore
+from pagination import PageRequest
+from price_history import WINDOW_DAYS, PriceDropLookup, PriceHistory
+
+
+def simulate(history, n_urls, days, seed=0):
+    # Un rastreo diario: paseo aleatorio de precios, productos que entran y salen y bajadas al final
+    rng = np.random.default_rng(seed)
+    urls = np.array([f'https://tienda.example/portatil-{i}/p' for i in range(n_urls)], dtype=object)
+    prices = rng.uniform(300, 2500, n_urls).round(2)
+    start = datetime(2024, 1, 1, 6, tzinfo=timezone.utc)
+    append_times = []
+    for day in range(days):
+        prices = (prices * rng.normal(1, 0.01, n_urls)).round(2)
+        if day == days - 1:
+            # Última semana: un 5% de los productos baja entre un 5 y un 40%
+            dropped = rng.random(n_urls) < 0.05
+            prices[dropped] = (prices[dropped] * rng.uniform(0.6, 0.95, dropped.sum())).round(2)
+        seen = rng.random(n_urls) < 0.9
+        begin = time.perf_counter()
+        history.append(urls[seen], prices[seen], start + timedelta(days=day), store='tienda')
+        append_times.append(time.perf_counter() - begin)
+    return urls, append_times
+
+
+def expected_drops(history, min_drop):
+    # Fuerza bruta: todo el historial en memoria, mediana de la ventana de cada URL en su último rastreo
+    full = history.read()
+    last_seen = full.groupby('url')['crawled_at'].transform('max')
+    window = full[full['crawled_at'] >= last_seen - timedelta(days=WINDOW_DAYS)]
+    last = full[full['crawled_at'] == last_seen].set_index('url')['price']
+    median = window.groupby('url')['price'].median()
+    drop = (median - last.reindex(median.index)) / median * 100
+    return drop[drop >= min_drop], len(full)
+
+
+def _crawl_store(directory, store, n_urls, crawls, start):
+    # Un proceso de rastreo (como una etapa scrape:<tienda> del pipeline) con su propio PriceHistory
+    history = PriceHistory(directory)
+    urls = [f"https://{store}.example/p/{i}" for i in range(n_urls)]
+    for crawl in range(crawls):
+        history.append(urls, np.full(n_urls, 1000.0 - crawl), start + timedelta(hours=crawl), store=store)
+
+
+def check_concurrent_stores(directory, n_stores=4, n_urls=2000, crawls=5):
+    # Varias tiendas a la vez, cada una con sus horas: no se pierden filas de los agregados de ninguna
+    # y una tienda con rastreos más antiguos que los de otra no choca con el orden cronológico
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    stores = [f"tienda{i}" for i in range(n_stores)]
+    processes = [multiprocessing.Process(target=_crawl_store, args=(directory, store, n_urls, crawls,
+                                                                    now - timedelta(days=i)))
+                 for i, store in enumerate(stores)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert all(process.exitcode == 0 for process in processes), [process.exitcode for process in processes]
+    aggregates = PriceHistory(directory).aggregates()
+    assert len(aggregates) == n_stores * n_urls, len(aggregates)
+    assert (aggregates.groupby('store').size() == n_urls).all()
+    assert (aggregates['last_price'] == 1000.0 - (crawls - 1)).all()
+    return n_stores
+
+
+def check_exported_catalog(directory, n_docs=2000, min_drop=10.0):
+    # De punta a punta: fichas guardadas en SQLite -> tabla exportada -> chollo.py -> artefacto publicado,
+    # y /search_offers del backend con priceDrop sobre el historial de esos mismos rastreos
+    from chollos.chollo import train as label_offers
+    from webscrapping.storage import SQLiteCollection
+
+    os.makedirs(directory, exist_ok=True)
+    docs = list({doc['URL']: doc for doc in spec_documents(n_docs, distinct=n_docs)}.values())
+    collection = SQLiteCollection('tienda', path=os.path.join(directory, 'specs.db'))
+    collection.bulk_upsert(docs)
+    specs = os.path.join(directory, 'specs_simplified_all.csv')
+    collection.export_training_table(specs, all_stores=True)
+    collection.close()
+    artifact = os.path.join(directory, 'catalog')
+    label_offers(specs, os.path.join(directory, 'chollos.csv'), os.path.join(directory, 'importance.csv'),
+                 artifact_dir=artifact)
+
+    # Hace una semana todo costaba un 25% más; hoy, el precio de la ficha (como lo registra el crawler)
+    history = PriceHistory(os.path.join(directory, 'historial'))
+    now = datetime.now(timezone.utc)
+    prices = parse_price(pd.Series([doc['Precio'] for doc in docs]))
+    history.append([doc['URL'] for doc in docs], prices * 1.25, now - timedelta(days=7), store='tienda')
+    history.record_crawl('tienda', docs, crawled_at=now)
+
+    os.chdir(ROOT)
+    import backend
+    backend.store = OfferStore(artifact, on_load=[backend.scores.refresh])
+    backend.price_drops = PriceDropLookup(history)
+    client = backend.app.test_client()
+    everything = client.post('/search_offers', json={}).get_json()
+    dropped = client.post('/search_offers', json={'priceDrop': min_drop}).get_json()
+    assert 'URL' in backend.store.snapshot().df
+    assert dropped['total'] > 0 and dropped['total'] == everything['total'], (dropped['total'], everything['total'])
+    drops = history.price_drops(min_drop)
+    assert all(offer['URL'] in drops.index for offer in dropped['offers'])
+    return len(docs), dropped['total']
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Historial de precios en Parquet: añadir rastreos y buscar bajadas")
+    parser.add_argument('--urls', type=int, default=50_000)
+    parser.add_argument('--days', type=int, default=60)
+    parser.add_argument('--min-drop', type=float, default=10.0)
+    parser.add_argument('--exported-docs', type=int, default=2000)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='price-history-')
+    try:
+        history = PriceHistory(directory)
+        urls, append_times = simulate(history, args.urls, args.days)
+
+        expected, n_rows = expected_drops(history, args.min_drop)
+        start = time.perf_counter()
+        drops = PriceHistory(directory).price_drops(args.min_drop)
+        cold = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(20):
+            history.price_drops(args.min_drop)
+        warm = (time.perf_counter() - start) / 20
+        assert set(drops.index) == set(expected.index)
+        assert np.allclose(drops['drop_pct'].to_numpy(), expected.reindex(drops.index).to_numpy())
+
+        # Filtro priceDrop del backend sobre un catálogo con URL
+        catalog = grow_catalog(len(urls))
+        catalog['URL'] = urls
+        path = f'{directory}/catalogo.csv'
+        catalog.to_csv(path, index=False)
+        snapshot = OfferStore(path).snapshot()
+        lookup = PriceDropLookup(history)
+        everything = lambda snapshot, rows: (np.ones(len(rows), dtype=np.int8), np.full(len(rows), 0.5))
+        start = time.perf_counter()
+        total, offers = search(snapshot, {'priceDrop': str(args.min_drop)}, PageRequest(), everything, lookup)
+        first = time.perf_counter() - start
+        assert sorted(o['URL'] for o in offers) == sorted(expected.index)
+        start = time.perf_counter()
+        search(snapshot, {'priceDrop': args.min_drop, 'ram': '16'}, PageRequest(limit=50), everything, lookup)
+        filtered = time.perf_counter() - start
+
+        n_stores = check_concurrent_stores(os.path.join(directory, 'tiendas'))
+        n_docs, served = check_exported_catalog(os.path.join(directory, 'exportado'), args.exported_docs,
+                                                args.min_drop)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    print(f"{n_rows} filas de historial ({args.urls} URLs x {args.days} rastreos): añadir un rastreo "
+          f"{np.median(append_times) * 1000:.0f} ms (mediana)")
+    print(f"bajadas >= {args.min_drop:.0f}% frente a la mediana de {WINDOW_DAYS} días: {len(drops)} productos, "
+          f"{cold * 1000:.1f} ms en frío, {warm * 1000:.2f} ms con los agregados en memoria")
+    print(f"/search_offers con priceDrop: {first * 1000:.1f} ms la primera vez, {filtered * 1000:.1f} ms después")
+    print(f"{n_stores} tiendas rastreando a la vez en procesos distintos: agregados completos")
+    print(f"catálogo exportado de {n_docs} fichas (SQLite -> chollo.py -> artefacto): priceDrop >= {args.min_drop:.0f}% "
+          f"devuelve {served} chollos en /search_offers, todos con bajada en el historial")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from synthetic import ROOT, sample_filters, write_catalog
+
+QUERY = '/search_offers?sort=-Probabilidad_IA&limit=50'
+
+
+def respell(filters):
+    # La misma consulta escrita de otra forma: números como número, procesador en mayúsculas,
+    # filtros vacíos de más y las claves al revés. Tiene que caer en la misma entrada
+    variant = {'os': '', 'graphics': None} if not {'os', 'graphics'} & set(filters) else {}
+    for key, value in reversed(list(filters.items())):
+        if key in ('ram', 'storage', 'battery', 'price'):
+            value = float(value)
+            value = int(value) if value.is_integer() else value
+        elif key == 'processor':
+            value = value.upper()
+        variant[key] = value
+    return variant
+
+
+def timed(client, workload, headers=None):
+    start = time.perf_counter()
+    bodies = [client.post(QUERY, json=filters, headers=headers).get_data() for filters in workload]
+    return (time.perf_counter() - start) / len(workload), bodies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Caché de respuestas de /search_offers: aciertos, ETag e invalidación")
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--distinct', type=int, default=40, help="combinaciones de filtros distintas")
+    parser.add_argument('--requests', type=int, default=1000)
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    import backend
+    from offer_store import OfferStore
+    from result_cache import ResultCache, canonical_filters
+
+    path = write_catalog(args.rows, f'/tmp/chollos_cache_{args.rows}.csv')
+    backend.store = OfferStore(path, check_interval=0, on_load=[backend.scores.refresh])
+    backend.store.snapshot()
+    client = backend.app.test_client()
+    combos = sample_filters(pd.read_csv(path), args.distinct)
+    # Unas pocas combinaciones se repiten mucho (Zipf), como los desplegables de app.py
+    rng = np.random.default_rng(0)
+    ranks = np.minimum(rng.zipf(1.3, args.requests), args.distinct) - 1
+    workload = [combos[r] if i % 2 else respell(combos[r]) for i, r in enumerate(ranks)]
+
+    # 1. Sin caché (límite de memoria 0: nunca guarda nada)
+    backend.results = ResultCache(max_bytes=0)
+    uncached, expected = timed(client, workload)
+
+    # 2. Con caché: mismos bytes que sin ella, también para las variantes
+    backend.results = ResultCache()
+    cached, bodies = timed(client, workload)
+    assert bodies == expected
+    stats = backend.results.stats()
+    assert stats['misses'] == len({canonical_filters(f) for f in workload}), stats
+    print(f"{args.rows} ofertas, {args.requests} peticiones, {args.distinct} combinaciones: "
+          f"sin caché {uncached * 1000:.2f} ms/petición, con caché {cached * 1000:.2f} ms/petición "
+          f"({uncached / cached:.1f}x), aciertos {stats['hit_rate']:.0%}, {stats['bytes'] / 2 ** 20:.1f} MB")
+
+    # 3. If-None-Match con el ETag recibido -> 304 sin cuerpo; otro ETag -> 200
+    response = client.post(QUERY, json=combos[0])
+    etag = response.headers['ETag']
+    assert response.headers['X-Cache'] == 'HIT'
+    repeated = client.post(QUERY, json=respell(combos[0]), headers={'If-None-Match': etag})
+    assert repeated.status_code == 304 and repeated.get_data() == b'' and repeated.headers['ETag'] == etag
+    assert client.post(QUERY, json=combos[0], headers={'If-None-Match': '"otro"'}).status_code == 200
+    revalidate, _ = timed(client, [combos[0]] * args.requests, headers={'If-None-Match': etag})
+
+    # 4. Catálogo nuevo: la caché se vacía y el ETag anterior deja de valer
+    os.utime(path, ns=(time.time_ns(), time.time_ns()))
+    response = client.post(QUERY, json=combos[0], headers={'If-None-Match': etag})
+    assert response.status_code == 200 and response.headers['X-Cache'] == 'MISS'
+    assert response.headers['ETag'] != etag
+    assert backend.results.stats()['invalidations'] == 1
+
+    # 5. Límite de memoria: se expulsan las menos usadas y nunca se pasa del límite
+    backend.results = ResultCache(max_bytes=max(map(len, expected)) * 3)
+    timed(client, workload)
+    stats = backend.results.stats()
+    assert stats['bytes'] <= stats['max_bytes'] and stats['evictions'] > 0, stats
+
+    # 6. Caducidad: con ttl 0 todo lo guardado ha caducado en la siguiente petición
+    backend.results = ResultCache(ttl=0)
+    timed(client, [combos[0]] * 3)
+    assert backend.results.stats()['expired'] == 2
+
+    # 7. El modelo cambia justo después de calcular la clave: la respuesta se puntúa con el modelo de la clave
+    scores, bundle = backend.scores, backend.scores._bundle
+    generations, used = [], []
+    results_lookup, scores_lookup = backend.results.lookup, scores.lookup
+
+    def lookup_then_reload(generation, *args, **kwargs):
+        generations.append(generation)
+        scores._bundle = bundle[:2] + ('modelo-recargado',) + bundle[3:]
+        return results_lookup(generation, *args, **kwargs)
+
+    def recording_lookup(snapshot, rows, pinned=None):
+        used.append((pinned or scores._bundle)[2])
+        return scores_lookup(snapshot, rows, pinned)
+    backend.results.lookup, scores.lookup = lookup_then_reload, recording_lookup
+    try:
+        assert client.post(QUERY, json={}).status_code == 200
+    finally:
+        backend.results.lookup, scores.lookup, scores._bundle = results_lookup, scores_lookup, bundle
+    assert used and all(f"-{model_hash}-" in generations[0] for model_hash in used), (generations, used)
+    print(f"304 con If-None-Match: {revalidate * 1000:.2f} ms/petición; ETag, invalidación, límite y ttl OK")
+
+
+if __name__ == '__main__':
+    main()
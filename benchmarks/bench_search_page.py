@@ -0,0 +1,82 @@
+import argparse
+import json
+import os
+import time
+import tracemalloc
+
+import numpy as np
+
+from synthetic import ROOT, write_catalog
+from pagination import top_k
+
+
+def check_top_k(seed=0):
+    # top_k tiene que dar lo mismo que un argsort estable completo (empates y NaN incluidos)
+    rng = np.random.default_rng(seed)
+    for _ in range(200):
+        n = int(rng.integers(1, 500))
+        keys = rng.integers(0, 20, n).astype(np.float64)
+        keys[rng.random(n) < 0.1] = np.nan
+        k = int(rng.integers(0, n + 2))
+        assert np.array_equal(top_k(keys, k), np.argsort(keys, kind='stable')[:k])
+
+
+def measure(client, filters, query):
+    tracemalloc.start()
+    start = time.perf_counter()
+    response = client.post(f'/search_offers?{query}', json=filters)
+    size = sum(len(chunk) for chunk in response.response)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return size, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Paginación, top-k y NDJSON en /search_offers")
+    parser.add_argument('--rows', type=int, default=200_000)
+    args = parser.parse_args()
+
+    check_top_k()
+
+    os.chdir(ROOT)
+    import backend
+    from offer_store import OfferStore
+    from result_cache import ResultCache
+
+    # Se mide la búsqueda, no la caché de respuestas: con max_bytes=0 no guarda nada
+    backend.results = ResultCache(max_bytes=0)
+
+    path = write_catalog(args.rows, f'/tmp/chollos_{args.rows}.csv')
+    start = time.perf_counter()
+    backend.store = OfferStore(path, on_load=[backend.scores.refresh])
+    backend.store.snapshot()
+    print(f"{args.rows} filas cargadas y puntuadas en {time.perf_counter() - start:.1f} s")
+    client = backend.app.test_client()
+    filters = {}
+
+    full = client.post('/search_offers', json=filters).get_json()
+    offers = full['offers']
+    assert full['total'] == len(offers)
+    # Las páginas tienen que coincidir con ordenar la respuesta completa (orden estable)
+    for sort, key, reverse in [('-Probabilidad_IA', 'Probabilidad_IA', True), ('Precio', 'Precio', False)]:
+        ordered = sorted(offers, key=lambda o: (o[key] is None, (-1 if reverse else 1) * (o[key] or 0)))
+        for offset, limit in [(0, 50), (100, 25), (len(offers) - 10, 50)]:
+            page = client.post(f'/search_offers?sort={sort}&offset={offset}&limit={limit}', json=filters).get_json()
+            assert page['offers'] == ordered[offset:offset + limit], (sort, offset, limit)
+    lines = client.post('/search_offers?format=ndjson', json=filters).get_data().splitlines()
+    assert [json.loads(line) for line in lines] == offers
+
+    print(f"{len(offers)} ofertas tras la IA")
+    for name, query in [('JSON completo', ''),
+                        ('JSON top 50 por -Probabilidad_IA', 'sort=-Probabilidad_IA&limit=50'),
+                        ('JSON top 50 por Precio, offset 1000', 'sort=Precio&offset=1000&limit=50'),
+                        ('NDJSON completo', 'format=ndjson'),
+                        ('NDJSON ordenado por Precio', 'format=ndjson&sort=Precio')]:
+        size, elapsed, peak = measure(client, filters, query)
+        print(f"{name:<38}: {elapsed * 1000:8.1f} ms, {size / 1e6:7.2f} MB, "
+              f"pico de memoria {peak / 1e6:7.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
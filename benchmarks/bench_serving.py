@@ -0,0 +1,151 @@
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+import aiohttp
+import numpy as np
+import pandas as pd
+
+from synthetic import ROOT, sample_filters, write_catalog
+
+# Servidor actual: el servidor de desarrollo de Flask (con hilos, como app.run(debug=True) sin el reloader)
+FLASK_SERVER = """
+import sys
+from offer_store import OfferStore
+import backend
+backend.store = OfferStore(sys.argv[1], on_load=[backend.scores.refresh])
+backend.store.snapshot()
+backend.app.run(host='127.0.0.1', port=int(sys.argv[2]), threaded=True)
+"""
+QUERY = '/search_offers?sort=-Probabilidad_IA&limit=50'
+
+
+def wait_until_up(url, timeout=120):
+    # Espera a que el servidor responda y devuelve el total de chollos sin filtros
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            request = urllib.request.Request(url + QUERY, data=b'{}', headers={'Content-Type': 'application/json'})
+            return json.loads(urllib.request.urlopen(request, timeout=5).read())['total']
+        except OSError:
+            time.sleep(0.5)
+    raise RuntimeError(f"{url} no responde")
+
+
+def catalog_version(url):
+    # Versión del catálogo que sirve url (la que pide /similar junto al id de la oferta)
+    request = urllib.request.Request(url + QUERY, data=b'{}', headers={'Content-Type': 'application/json'})
+    return json.loads(urllib.request.urlopen(request, timeout=30).read())['catalog_version']
+
+
+async def closed_loop(url, filters, concurrency, duration):
+    # concurrency clientes que envían una petición en cuanto reciben la respuesta anterior
+    latencies = []
+    deadline = time.perf_counter() + duration
+
+    async def client(session, offset):
+        i = offset
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            async with session.post(url + QUERY, json=filters[i % len(filters)]) as response:
+                await response.read()
+                assert response.status == 200, response.status
+            latencies.append(time.perf_counter() - start)
+            i += concurrency
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        start = time.perf_counter()
+        await asyncio.gather(*(client(session, k) for k in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return len(latencies) / elapsed, np.percentile(latencies, 50) * 1000, np.percentile(latencies, 99) * 1000
+
+
+def sweep(name, url, filters, levels, duration, p99_ms):
+    best = None
+    for concurrency in levels:
+        throughput, p50, p99 = asyncio.run(closed_loop(url, filters, concurrency, duration))
+        print(f"{name:<22} c={concurrency:<3} {throughput:8.1f} req/s  p50 {p50:7.1f} ms  p99 {p99:7.1f} ms")
+        if p99 <= p99_ms and (best is None or throughput > best):
+            best = throughput
+    return best
+
+
+def check_publisher(path, directory):
+    # serve.py publica cada versión del catálogo puntuándola una sola vez, con el hash del modelo que la puntuó
+    from offer_store import OfferStore
+    from scoring import ScoreCache
+    from shared_catalog import CURRENT, CatalogPublisher, SharedSnapshot, has_publisher
+
+    scores = ScoreCache('model/model_chollo.pkl', 'model/preprocessor.pkl')
+    scored = []
+    predict = scores.predict
+    scores.predict = lambda df, bundle=None: scored.append(len(df)) or predict(df, bundle)
+    # Sin on_load: el catálogo llega al publicador sin puntuar, como cuando acaba de cambiar el modelo
+    publisher = CatalogPublisher(OfferStore(path), scores, directory)
+    publisher.refresh()
+    publisher.refresh()
+    # Margen para que cuente también cualquier puntuación en segundo plano
+    time.sleep(1)
+    snapshot = publisher.store.snapshot()
+    published = SharedSnapshot(os.path.join(directory, f"{snapshot.version}-{scores.model_hash}"))
+    assert sum(scored) == len(snapshot), (sum(scored), len(snapshot))
+    assert published.model_hash == scores.model_hash
+    assert np.array_equal(published.prob, scores.refresh(snapshot).prob)
+
+    # Un current.json de una ejecución anterior (su publicador ya no existe) no cuenta: asgi.py publica él mismo
+    assert has_publisher(directory)
+    finished = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'], capture_output=True, text=True)
+    with open(os.path.join(directory, CURRENT), 'w', encoding='utf-8') as f:
+        json.dump({'version': f"{snapshot.version}-{scores.model_hash}", 'publisher': int(finished.stdout)}, f)
+    assert not has_publisher(directory)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Flask de desarrollo contra FastAPI con varios workers (req/s a p99 fijo)")
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--levels', default='1,2,4,8,16')
+    parser.add_argument('--p99-ms', type=float, default=250.0)
+    args = parser.parse_args()
+
+    path = write_catalog(args.rows, f'/tmp/chollos_{args.rows}.csv')
+    filters = sample_filters(pd.read_csv(path), 500)
+    levels = [int(level) for level in args.levels.split(',')]
+    shared_dir = tempfile.mkdtemp(prefix='chollos-bench-')
+    servers = [
+        ('Flask (dev server)', 5099, [sys.executable, '-c', FLASK_SERVER, path, '5099']),
+        (f'FastAPI x{args.workers} workers', 8099,
+         [sys.executable, 'serve.py', '--catalog', path, '--port', '8099', '--host', '127.0.0.1',
+          '--workers', str(args.workers), '--shared-dir', shared_dir]),
+    ]
+    os.chdir(ROOT)
+    check_publisher(path, tempfile.mkdtemp(prefix='chollos-publisher-'))
+    print(f"{args.rows} ofertas, {os.cpu_count()} núcleos, {len(filters)} combinaciones de filtros, página de 50")
+    results = {}
+    totals = set()
+    for name, port, command in servers:
+        process = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            url = f'http://127.0.0.1:{port}'
+            totals.add(wait_until_up(url))
+            # Los dos servidores tienen que estar sirviendo el mismo catálogo
+            assert len(totals) == 1, totals
+            results[name] = sweep(name, url, filters, levels, args.duration, args.p99_ms)
+        finally:
+            process.terminate()
+            process.wait()
+    print(f"\nMáximo req/s con p99 <= {args.p99_ms:.0f} ms:")
+    for name, best in results.items():
+        print(f"  {name:<22} {'—' if best is None else f'{best:.1f} req/s'}")
+
+
+if __name__ == '__main__':
+    main()
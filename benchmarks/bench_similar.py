@@ -0,0 +1,102 @@
+import argparse
+import time
+
+import numpy as np
+
+from synthetic import grow_catalog
+
+from offer_store import CatalogSnapshot
+from similar import SimilarIndex, fill_missing, partition_keys, similar_offers, similarity_features
+
+
+def snapshot_of(df, version):
+    # Snapshot como los de OfferStore, con los tipos que tiene el catálogo en memoria
+    return CatalogSnapshot(df, 'sintético', version, len(df))
+
+
+def brute_force(X, codes, row, k):
+    # Distancias a todas las ofertas de la misma partición, estandarizadas igual que el índice
+    rows = np.flatnonzero(codes == codes[row])
+    block = fill_missing(X[rows])
+    scale = block.std(axis=0)
+    scale[scale == 0] = 1.0
+    distances = np.sqrt((((block - block[rows == row]) / scale) ** 2).sum(axis=1))
+    distances = distances[rows != row]
+    return np.sort(distances)[:k]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="/similar: KDTree por partición frente a recorrer el catálogo")
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--k', type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    df = grow_catalog(args.rows)
+    # Más variedad que las 247 filas reales remuestreadas: batería y pantalla con algo de ruido
+    df['Bateria'] = (df['Bateria'] * rng.uniform(0.9, 1.1, len(df))).round(0)
+    df['Pantalla'] = (df['Pantalla'] + rng.choice([-0.1, 0.0, 0.1], len(df))).round(1)
+    for col in ['RAM', 'Almacenamiento', 'Pantalla', 'Bateria', 'Precio']:
+        df[col] = df[col].astype(np.float32)
+    for col in ['Procesador', 'Graficos', 'Sistema Operativo']:
+        df[col] = df[col].astype('category')
+    snapshot = snapshot_of(df, 1)
+
+    index = SimilarIndex()
+    start = time.perf_counter()
+    index.refresh(snapshot)
+    build = time.perf_counter() - start
+
+    # Vecinos correctos: mismas distancias que la fuerza bruta (con empates pueden ser otras filas)
+    X = similarity_features(df)
+    codes, _ = partition_keys(df)
+    checked = rng.integers(0, len(df), 50)
+    start = time.perf_counter()
+    for row in checked:
+        _, rows, distances = index.neighbours(snapshot, int(row), args.k)
+        expected = brute_force(X, codes, int(row), args.k)
+        assert np.allclose(distances, expected), row
+        assert (codes[rows] == codes[row]).all() and row not in rows
+    brute = (time.perf_counter() - start) / len(checked)
+
+    lookup = lambda snapshot, rows: (np.ones(len(rows), dtype=np.int8), np.full(len(rows), 0.5))
+    ids = rng.integers(0, len(df), args.queries)
+    timings = {'vecinos': [], 'respuesta completa': []}
+    for row in ids:
+        start = time.perf_counter()
+        index.neighbours(snapshot, int(row), args.k)
+        timings['vecinos'].append(time.perf_counter() - start)
+        start = time.perf_counter()
+        body = similar_offers(snapshot, index, int(row), args.k, lookup)
+        timings['respuesta completa'].append(time.perf_counter() - start)
+    prices = [o['Precio'] for o in body['similar'] if o['Precio'] is not None]
+    assert body['median_price'] == (round(float(np.median(prices)), 2) if prices else None)
+
+    # Catálogo nuevo: sólo cambian precios (ningún árbol se reconstruye) o la RAM de una partición
+    df2 = df.copy()
+    df2['Precio'] = (df2['Precio'] * 0.97).astype(np.float32)
+    before = index.rebuilt
+    start = time.perf_counter()
+    index.refresh(snapshot_of(df2, 2))
+    prices_only = time.perf_counter() - start
+    assert index.rebuilt == before
+    df3 = df2.copy()
+    changed = codes == codes[0]
+    df3.loc[changed, 'RAM'] = (df3.loc[changed, 'RAM'] * 2).astype(np.float32)
+    start = time.perf_counter()
+    index.refresh(snapshot_of(df3, 3))
+    one_partition = time.perf_counter() - start
+    assert index.rebuilt == before + 1
+
+    print(f"{len(df)} ofertas, {codes.max() + 1} particiones; índice construido en {build:.2f} s")
+    for name, values in timings.items():
+        values = np.array(values) * 1000
+        print(f"k={args.k} {name:<20}: p50 {np.percentile(values, 50):.3f} ms  p99 {np.percentile(values, 99):.3f} ms")
+    print(f"fuerza bruta sobre la partición: {brute * 1000:.1f} ms por consulta")
+    print(f"catálogo nuevo sólo con precios: {prices_only:.2f} s (0 árboles); "
+          f"con una partición cambiada ({changed.sum()} filas): {one_partition:.2f} s (1 árbol)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+import argparse
+import asyncio
+import json
+import shutil
+import tempfile
+
+import aiohttp
+from aiohttp import web
+
+from fixtures import build_site
+from webscrapping.spec_extraction import (PRODUCT_FIELDS, LLMCache, OllamaExtractor, SpecExtractor,
+                                          estimate_tokens, spec_rows, table_fields)
+
+# Etiqueta que la tabla no reconoce pero un LLM sí: esas fichas necesitan el LLM para el almacenamiento
+UNKNOWN_STORAGE_LABEL = "Almacenamiento total"
+
+
+class StubLLM:
+    """Servidor local con la API /api/chat de Ollama, en lugar del modelo real.
+
+    Contesta leyendo la tabla (entiende también UNKNOWN_STORAGE_LABEL), tarda
+    `latency` segundos por llamada, atiende una llamada a la vez como un Ollama
+    con un solo modelo cargado y cuenta los tokens como chars/4.
+    """
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = 0
+        self._busy = asyncio.Lock()
+
+    async def chat(self, request):
+        payload = await request.json()
+        system, user = (message["content"] for message in payload["messages"])
+        fields = list(json.loads(system[system.rindex("{"):]))
+        rows, _ = spec_rows(f'<table>{user}</table>')
+        if UNKNOWN_STORAGE_LABEL in rows:
+            rows.setdefault("Capacidad total de almacenaje", rows[UNKNOWN_STORAGE_LABEL])
+        known = table_fields(rows)
+        content = json.dumps({field: known.get(field, "") for field in fields}, ensure_ascii=False)
+        async with self._busy:
+            self.calls += 1
+            await asyncio.sleep(self.latency)
+        return web.json_response({
+            "model": payload["model"],
+            "message": {"role": "assistant", "content": content},
+            "done": True,
+            "prompt_eval_count": estimate_tokens(system + user),
+            "eval_count": estimate_tokens(content),
+        })
+
+
+def product_pages(n):
+    # Fichas del fixture; una de cada cinco con la etiqueta de almacenamiento desconocida
+    site, _ = build_site(n)
+    pages = [(path, html) for path, html in site.items() if path.endswith('/p')]
+    return [(path, html.replace("Capacidad total de SSD", UNKNOWN_STORAGE_LABEL) if i % 5 == 0 else html)
+            for i, (path, html) in enumerate(pages)]
+
+
+async def run(extractor, pages, concurrency):
+    # Mismo reparto que test.py: como mucho `concurrency` fichas a la vez
+    semaphore = asyncio.Semaphore(concurrency)
+    async with aiohttp.ClientSession() as session:
+        async def one(path, html):
+            async with semaphore:
+                return await extractor.extract(session, path, html)
+        products = await asyncio.gather(*(one(path, html) for path, html in pages))
+    extractor.stats.stop()
+    return products
+
+
+class BrokenLLM:
+    # Extractor con un error de programación (no de red): no debe quedar oculto como un fallo del LLM
+    model = 'roto'
+
+    async def extract(self, session, table_html, fields):
+        raise KeyError('message')
+
+
+async def check_llm_errors(pages, concurrency):
+    # Un Ollama que falla cuenta en errors y deja la ficha con la tabla; un fallo del código se propaga
+    app = web.Application()
+    app.router.add_post('/api/chat', lambda request: web.Response(status=500))
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+    try:
+        failing = SpecExtractor(OllamaExtractor(url, concurrency=concurrency))
+        products = await run(failing, pages, concurrency)
+        stats = failing.stats
+        # Dos fichas iguales a la vez comparten la llamada (y el error): cache_hits
+        assert stats.errors > 0 and stats.errors + stats.cache_hits == stats.pages - stats.table_only
+        assert stats.llm_calls == 0 and len(products) == len(pages)
+    finally:
+        await runner.cleanup()
+    try:
+        await run(SpecExtractor(BrokenLLM()), pages, concurrency)
+    except KeyError:
+        pass
+    else:
+        raise AssertionError("el KeyError del extractor se ha tragado como un fallo del LLM")
+    return failing.stats.errors
+
+
+async def main_async(args):
+    stub = StubLLM(args.llm_latency)
+    app = web.Application()
+    app.router.add_post('/api/chat', stub.chat)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+    cache_dir = tempfile.mkdtemp(prefix='llm-cache-')
+    try:
+        pages = product_pages(args.pages)
+
+        # Antes: cada ficha entera al LLM
+        baseline = SpecExtractor(OllamaExtractor(url, concurrency=args.concurrency), use_table=False)
+        expected = await run(baseline, pages, args.concurrency)
+
+        # Ahora: tabla primero, LLM para lo que falte y caché por contenido
+        extractor = SpecExtractor(OllamaExtractor(url, concurrency=args.concurrency), LLMCache(cache_dir))
+        products = await run(extractor, pages, args.concurrency)
+        assert products == expected
+        assert all(all(p[field] for field in PRODUCT_FIELDS) for p in products)
+
+        # Segunda pasada con la caché caliente: ninguna llamada al LLM
+        calls = stub.calls
+        warm = SpecExtractor(OllamaExtractor(url, concurrency=args.concurrency), LLMCache(cache_dir))
+        assert await run(warm, pages, args.concurrency) == expected
+        assert stub.calls == calls and warm.stats.llm_calls == 0
+        errors = await check_llm_errors(pages, args.concurrency)
+    finally:
+        await runner.cleanup()
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    for name, stats in [('todo al LLM', baseline.stats), ('tabla + LLM', extractor.stats),
+                        ('caché caliente', warm.stats)]:
+        used = stats.prompt_tokens + stats.completion_tokens
+        print(f"{name:<15} {stats.pages_per_s:8.1f} páginas/s  llamadas {stats.llm_calls:4d}  "
+              f"caché {stats.cache_hits:4d}  tokens {used:8d}")
+    saved = extractor.stats.tokens_saved
+    print(f"{len(pages)} fichas, {args.llm_latency * 1000:.0f} ms por llamada al LLM: "
+          f"{saved} tokens ahorrados de {extractor.stats.baseline_tokens} estimados "
+          f"({saved / extractor.stats.baseline_tokens:.0%})")
+    print(f"Ollama caído: {errors} fichas registradas en errors y servidas con la tabla")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extracción de specs: tabla determinista + LLM sólo para lo que falta")
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--llm-latency', type=float, default=0.05)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == '__main__':
+    main()
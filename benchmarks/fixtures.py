@@ -0,0 +1,194 @@
+import hashlib
+import html
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+
+from synthetic import ROOT
+
+SPECS_PATH = os.path.join(ROOT, 'webscrapping', 'specs_simplified_all.csv')
+LINK_CLASS = ('vtex-product-summary-2-x-clearLink vtex-product-summary-2-x-clearLink--main-product-summary '
+              'h-100 flex flex-column')
+# Las fichas reales de VTEX pesan cientos de KB: se rellena con secciones y un bloque de estado
+FILLER_ROWS = 120
+STATE_BYTES = 150_000
+
+
+def _row_sections(row):
+    # Reconstruye las secciones de la ficha de PCBox a partir de una fila simplificada
+    procesador = str(row['Procesador'])
+    fabricante = procesador.split()[0]
+    familia, _, modelo = procesador.partition('-')
+    return {
+        'Procesador': {
+            'Fabricante de procesador': fabricante,
+            'Familia de procesador': familia.replace('Core', 'Core™'),
+            'Modelo del procesador': modelo or familia.split()[-1],
+        },
+        'Memoria': {
+            'Memoria interna': f"{row['RAM']} GB",
+            'Tipo de memoria interna': f"{row['Tipo RAM']}-SDRAM",
+        },
+        'Medios de almacenaje': {'Capacidad total de SSD': f"{row['Almacenamiento']} GB"},
+        'Gráficos': {'Modelo de adaptador gráfico incorporado': str(row['Graficos'])},
+        'Exhibición': {
+            'Diagonal de la pantalla': f"39,6 cm ({row['Pantalla']}\")",
+            'Resolución de la pantalla': str(row['Resolucion']).replace('x', ' x ') + ' Pixeles',
+        },
+        'Software': {'Sistema operativo instalado': str(row['Sistema Operativo'])},
+        'Batería': {'Capacidad de batería': f"{row['Bateria']} Wh"},
+        'Otras características': {f"Característica {i}": f"Valor {i}" for i in range(FILLER_ROWS)},
+    }
+
+
+def spec_documents(n_docs, distinct=5000, seed=42):
+    # Fichas como las del scraper: un conjunto de fichas distintas (con variantes y casos raros) repetidas
+    specs = pd.read_csv(SPECS_PATH)
+    rng = random.Random(seed)
+    pool = []
+    for i in range(distinct):
+        row = specs.iloc[rng.randrange(len(specs))]
+        doc = {section: dict(values) for section, values in _row_sections(row).items()
+               if section != 'Otras características'}
+        doc['URL'] = f'https://tienda.example/portatil-{i}/p'
+        doc['Precio'] = str(row['Precio'])
+        procesador = doc['Procesador']
+        variant = rng.random()
+        if variant < 0.1:
+            procesador['Familia de procesador'] = procesador['Familia de procesador'].replace('Intel', 'Intel®')
+        elif variant < 0.2:
+            procesador['Fabricante de procesador'] = ''
+        elif variant < 0.25:
+            # El modelo repite el último token de la familia: "Ryzen 7" + "7-8845HS"
+            token = procesador['Familia de procesador'].split()[-1]
+            procesador['Modelo del procesador'] = f"{token}-{procesador['Modelo del procesador']}"
+        elif variant < 0.27:
+            procesador['Fabricante de procesador'] = procesador['Familia de procesador'] = ''
+        if rng.random() < 0.1:
+            doc['Memoria']['Tipo de memoria interna'] = rng.choice(['LPDDR5x', 'ddr4', 'SDRAM', ''])
+        if rng.random() < 0.1:
+            doc['Medios de almacenaje'] = {'SDD, capacidad': doc['Medios de almacenaje']['Capacidad total de SSD']}
+        if rng.random() < 0.05:
+            doc['Exhibición']['Resolución de la pantalla'] = rng.choice(['Full HD', '', '2880 x 1800 (3K)'])
+        if rng.random() < 0.05:
+            doc['Exhibición']['Diagonal de la pantalla'] = '39,6 cm'
+        if rng.random() < 0.05:
+            del doc[rng.choice(['Memoria', 'Batería', 'Software', 'Gráficos'])]
+        pool.append(doc)
+    return [pool[rng.randrange(distinct)] for _ in range(n_docs)]
+
+
+def render_product(row, price=None):
+    rows = []
+    for section, values in _row_sections(row).items():
+        rows.append('<tr class="vtex-table-description-row"><td colspan="2">'
+                    f'<div class="vtex-table-description-title">{html.escape(section)}</div></td></tr>')
+        for key, value in values.items():
+            rows.append('<tr class="vtex-table-description-row vtex-table-description-content">'
+                        f'<td class="vtex-table-description-key">{html.escape(key)}</td>'
+                        f'<td class="vtex-table-description-value">{html.escape(value)}</td></tr>')
+    price = row['Precio'] if price is None else price
+    return (
+        '<html><head><title>Portátil</title></head><body>'
+        '<h1 class="vtex-store-components-3-x-productNameContainer vtex-store-components-3-x-productNameContainer--quickview mv0 t-heading-4">'
+        f'{html.escape(str(row["Procesador"]))}</h1>'
+        f'<span class="ticnova-commons-components-0-x-ProductInfo c-action-primary ml2">Marca</span>'
+        f'<div class="ticnova-commons-components-0-x-price">{price}\xa0€</div>'
+        f'<table class="vtex-table-description-extended_carac">{"".join(rows)}</table>'
+        f'<script>window.__STATE__ = "{"x" * STATE_BYTES}"</script>'
+        '</body></html>'
+    )
+
+
+def render_listing(links):
+    anchors = ''.join(f'<a class="{LINK_CLASS}" href="{href}">producto</a>' for href in links)
+    return f'<html><body><section>{anchors}</section></body></html>'
+
+
+def build_site(n_products=400, per_page=20):
+    # Diccionario ruta -> HTML con un listado paginado y sus fichas
+    specs = pd.read_csv(SPECS_PATH)
+    pages = {}
+    product_paths = []
+    for i in range(n_products):
+        path = f'/portatil-{i}/p'
+        pages[path] = render_product(specs.iloc[i % len(specs)])
+        product_paths.append(path)
+    n_pages = (n_products + per_page - 1) // per_page
+    for page in range(1, n_pages + 1):
+        chunk = product_paths[(page - 1) * per_page:page * per_page]
+        pages[f'/ordenadores/ordenadores-portatiles?page={page}'] = render_listing(chunk)
+    return pages, n_pages
+
+
+class FixtureServer:
+    """Servidor HTTP local con keep-alive que sirve las páginas guardadas.
+
+    Emite ETag y Last-Modified y responde 304 a las peticiones condicionales,
+    y puede añadir una latencia fija por petición para simular la red.
+    """
+
+    def __init__(self, pages, latency=0.0):
+        self.pages = {path: body.encode('utf-8') for path, body in pages.items()}
+        self.latency = latency
+        self.requests = 0
+        self.last_modified = time.strftime('%a, %d %b %Y %H:%M:%S GMT', time.gmtime())
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def update(self, path, body):
+        self.pages[path] = body.encode('utf-8')
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address
+        return f'http://{host}:{port}'
+
+    def _handler(self):
+        fixture = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                fixture.requests += 1
+                if fixture.latency:
+                    time.sleep(fixture.latency)
+                body = fixture.pages.get(self.path)
+                if body is None:
+                    self.send_response(404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                etag = '"' + hashlib.md5(body).hexdigest() + '"'
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('ETag', etag)
+                self.send_header('Last-Modified', fixture.last_modified)
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,278 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import aiohttp
+import numpy as np
+import pandas as pd
+
+from synthetic import CATALOG_PATH, ROOT, realistic_filters, write_catalog
+
+from bench_serving import FLASK_SERVER, catalog_version, wait_until_up
+from offer_client import PAGE_SIZE, SIMILAR_K
+
+# Mezcla de peticiones de una sesión de app.py: buscar, pedir más páginas, abrir "parecidos" y cargar los desplegables
+DEFAULT_MIX = 'search=70,page=15,similar=10,facets=5'
+PERCENTILES = (50, 95, 99)
+# En lazo abierto, una petición que sale más tarde que esto respecto a su hora cuenta como retrasada
+LATE_MS = 10.0
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name not in ('search', 'page', 'similar', 'facets'):
+            raise ValueError(f"Tipo de petición desconocido en --mix: {name}")
+        mix[name] = float(weight)
+    return mix
+
+
+def build_plan(filters, total, version, mix, n, seed=0):
+    # Lista de peticiones (endpoint, método, ruta, cuerpo) que los clientes recorren en orden;
+    # version: el catalog_version del servidor, que /similar pide junto al id
+    rng = np.random.default_rng(seed)
+    kinds = rng.choice(list(mix), size=n, p=np.array(list(mix.values())) / sum(mix.values()))
+    plan = []
+    for kind in kinds:
+        if kind in ('search', 'page'):
+            # Las páginas siguientes son cada vez menos probables (geométrica desde la segunda)
+            offset = 0 if kind == 'search' else PAGE_SIZE * int(rng.geometric(0.5))
+            plan.append(('/search_offers', 'POST', f'/search_offers?limit={PAGE_SIZE}&offset={offset}',
+                         filters[rng.integers(len(filters))]))
+        elif kind == 'similar':
+            plan.append(('/similar', 'GET', f'/similar?id={rng.integers(total)}&version={version}&k={SIMILAR_K}', None))
+        else:
+            plan.append(('/facets', 'GET', '/facets', None))
+    return plan
+
+
+class Recorder:
+    # Latencias y errores por endpoint de una ejecución
+
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.statuses = {}
+        self.late = 0
+
+    def add(self, endpoint, status, seconds):
+        self.latencies.setdefault(endpoint, []).append(seconds)
+        key = str(status)
+        self.statuses.setdefault(endpoint, {}).setdefault(key, 0)
+        self.statuses[endpoint][key] += 1
+        if not isinstance(status, int) or status >= 400:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def summary(self, elapsed):
+        def stats(values, errors):
+            ms = np.asarray(values) * 1000
+            out = {'requests': len(ms), 'errors': errors, 'throughput_rps': round(len(ms) / elapsed, 2),
+                   'mean_ms': round(float(ms.mean()), 3), 'max_ms': round(float(ms.max()), 3)}
+            for p in PERCENTILES:
+                out[f'p{p}_ms'] = round(float(np.percentile(ms, p)), 3)
+            return out
+
+        endpoints = {endpoint: dict(stats(values, self.errors.get(endpoint, 0)), status=self.statuses[endpoint])
+                     for endpoint, values in sorted(self.latencies.items())}
+        every = [v for values in self.latencies.values() for v in values]
+        total = stats(every, sum(self.errors.values())) if every else {'requests': 0}
+        return {'seconds': round(elapsed, 3), 'late': self.late, 'endpoints': endpoints, 'total': total}
+
+
+async def send(session, url, request, recorder, scheduled):
+    # La latencia se cuenta desde la hora prevista: en lazo abierto incluye la cola si el servidor no da abasto
+    endpoint, method, path, body = request
+    try:
+        async with session.request(method, url + path, json=body) as response:
+            await response.read()
+            status = response.status
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        status = type(e).__name__
+    recorder.add(endpoint, status, time.perf_counter() - scheduled)
+
+
+async def closed_loop(url, plan, concurrency, duration, think=0.0, max_connections=None):
+    # concurrency usuarios: cada uno envía la siguiente petición cuando recibe la respuesta (y piensa think s)
+    recorder = Recorder()
+    connector = aiohttp.TCPConnector(limit=max_connections or concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        start = time.perf_counter()
+        deadline = start + duration
+
+        async def user(offset):
+            i = offset
+            while time.perf_counter() < deadline:
+                await send(session, url, plan[i % len(plan)], recorder, time.perf_counter())
+                i += concurrency
+                if think:
+                    await asyncio.sleep(think)
+
+        await asyncio.gather(*(user(k) for k in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return recorder.summary(elapsed)
+
+
+async def open_loop(url, plan, rate, duration, max_connections=256, seed=0):
+    # Llegadas de Poisson a rate peticiones/s, respondan o no las anteriores (hasta max_connections a la vez)
+    recorder = Recorder()
+    rng = np.random.default_rng(seed)
+    connector = aiohttp.TCPConnector(limit=max_connections)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        start = time.perf_counter()
+        tasks = []
+        at = 0.0
+        i = 0
+        while True:
+            at += rng.exponential(1.0 / rate)
+            if at >= duration:
+                break
+            scheduled = start + at
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            elif -delay * 1000 > LATE_MS:
+                recorder.late += 1
+            tasks.append(asyncio.create_task(send(session, url, plan[i % len(plan)], recorder, scheduled)))
+            i += 1
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+    return recorder.summary(elapsed)
+
+
+def start_server(kind, path, port, workers):
+    # Servidor local con el catálogo sintético, como en bench_serving.py
+    if kind == 'flask':
+        command = [sys.executable, '-c', FLASK_SERVER, path, str(port)]
+    else:
+        command = [sys.executable, 'serve.py', '--catalog', path, '--port', str(port), '--host', '127.0.0.1',
+                   '--workers', str(workers), '--shared-dir', tempfile.mkdtemp(prefix='chollos-loadtest-')]
+    env = dict(os.environ, CHOLLOS_LOG_LEVEL='WARNING')
+    return subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    mix = parse_mix(args.mix)
+    filters = realistic_filters(pd.read_csv(CATALOG_PATH), args.filters, seed=args.seed)
+    process = None
+    url = args.url
+    if url is None:
+        path = write_catalog(args.rows, os.path.join(tempfile.gettempdir(), f'chollos_{args.rows}.csv'))
+        process = start_server(args.server, path, args.port, args.workers)
+        url = f'http://127.0.0.1:{args.port}'
+    try:
+        total = wait_until_up(url)
+        plan = build_plan(filters, total, catalog_version(url), mix, args.plan_size, seed=args.seed)
+        # Calentamiento (índice de /similar, cachés): no cuenta
+        asyncio.run(closed_loop(url, plan, 2, args.warmup))
+        runs = []
+        for level in args.levels.split(','):
+            if args.mode == 'closed':
+                result = asyncio.run(closed_loop(url, plan, int(level), args.duration, args.think_ms / 1000))
+            else:
+                result = asyncio.run(open_loop(url, plan, float(level), args.duration, args.max_connections,
+                                               seed=args.seed))
+            runs.append(dict(result, mode=args.mode, level=float(level) if args.mode == 'open' else int(level)))
+            print_run(runs[-1])
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+    return {
+        'meta': {
+            'server': args.server if args.url is None else 'external', 'url': url,
+            'rows': args.rows if args.url is None else None, 'offers': total, 'workers': args.workers if args.url is None and args.server == 'fastapi' else None,
+            'mode': args.mode, 'duration': args.duration, 'think_ms': args.think_ms, 'mix': mix,
+            'distinct_filters': len({json.dumps(f, sort_keys=True) for f in filters}), 'seed': args.seed,
+            'commit': git_commit(), 'python': platform.python_version(), 'cpus': os.cpu_count(),
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        },
+        'runs': runs,
+    }
+
+
+def print_run(result):
+    unit = 'req/s objetivo' if result['mode'] == 'open' else 'usuarios'
+    late = f", {result['late']} llegadas retrasadas" if result['mode'] == 'open' else ''
+    print(f"{result['mode']} {result['level']} {unit}: {result['total']['throughput_rps']:.1f} req/s{late}")
+    for endpoint, s in list(result['endpoints'].items()) + [('total', result['total'])]:
+        print(f"  {endpoint:<15} {s['requests']:>7} pet. {s['errors']:>5} err. {s['throughput_rps']:>8.1f} req/s  "
+              + '  '.join(f"p{p} {s[f'p{p}_ms']:8.2f} ms" for p in PERCENTILES))
+
+
+def compare(old_path, new_path, tolerance):
+    # Diferencias entre dos informes, por ejecución (modo + nivel) y endpoint; True si alguna empeora más que tolerance
+    with open(old_path, encoding='utf-8') as f:
+        old = {(r['mode'], r['level']): r for r in json.load(f)['runs']}
+    with open(new_path, encoding='utf-8') as f:
+        new = {(r['mode'], r['level']): r for r in json.load(f)['runs']}
+    worse = False
+    for key in sorted(old.keys() & new.keys()):
+        print(f"{key[0]} {key[1]}:")
+        a_runs, b_runs = old[key], new[key]
+        names = sorted(a_runs['endpoints'].keys() & b_runs['endpoints'].keys()) + ['total']
+        for name in names:
+            a = a_runs['total'] if name == 'total' else a_runs['endpoints'][name]
+            b = b_runs['total'] if name == 'total' else b_runs['endpoints'][name]
+            changes = []
+            for metric in ['throughput_rps'] + [f'p{p}_ms' for p in PERCENTILES]:
+                change = b[metric] / a[metric] - 1 if a[metric] else 0.0
+                # Menos req/s o más latencia es peor
+                regression = -change if metric == 'throughput_rps' else change
+                worse |= regression > tolerance
+                changes.append(f"{metric.replace('_ms', '').replace('throughput_rps', 'req/s')} {change:+7.1%}"
+                               + (' ⚠️' if regression > tolerance else ''))
+            print(f"  {name:<15} " + '  '.join(changes))
+    missing = sorted(old.keys() ^ new.keys())
+    if missing:
+        print(f"Ejecuciones sólo en uno de los informes: {missing}")
+    return worse
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de la API de ofertas con una mezcla realista de filtros")
+    parser.add_argument('--url', default=None, help="servidor ya arrancado (si no, se arranca uno con --server)")
+    parser.add_argument('--server', choices=['flask', 'fastapi'], default='flask')
+    parser.add_argument('--rows', type=int, default=100_000, help="tamaño del catálogo sintético (10k-1M)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="workers de FastAPI")
+    parser.add_argument('--port', type=int, default=5098)
+    parser.add_argument('--mode', choices=['closed', 'open'], default='closed')
+    parser.add_argument('--levels', default='1,4,16', help="usuarios (lazo cerrado) o req/s (lazo abierto), por comas")
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--warmup', type=float, default=3.0)
+    parser.add_argument('--think-ms', type=float, default=0.0, help="pausa de cada usuario entre peticiones")
+    parser.add_argument('--max-connections', type=int, default=256, help="conexiones simultáneas en lazo abierto")
+    parser.add_argument('--mix', default=DEFAULT_MIX)
+    parser.add_argument('--filters', type=int, default=2000, help="búsquedas generadas (las populares se repiten)")
+    parser.add_argument('--plan-size', type=int, default=20_000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default='loadtest.json', help="informe JSON")
+    parser.add_argument('--compare', nargs=2, metavar=('ANTES', 'DESPUES'), help="comparar dos informes y salir")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="empeoramiento que cuenta como regresión")
+    args = parser.parse_args()
+
+    if args.compare:
+        return 1 if compare(*args.compare, args.tolerance) else 0
+    report = run(args)
+    with open(args.out, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"📝 Informe en {args.out}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
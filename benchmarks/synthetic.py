@@ -0,0 +1,89 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+CATALOG_PATH = os.path.join(ROOT, 'chollos.csv')
+
+
+def grow_catalog(n_rows, seed=42, source=CATALOG_PATH):
+    # Catálogo sintético: filas reales remuestreadas con el precio perturbado ±15%
+    base = pd.read_csv(source)
+    rng = np.random.default_rng(seed)
+    df = base.iloc[rng.integers(0, len(base), n_rows)].reset_index(drop=True)
+    noise = rng.uniform(0.85, 1.15, n_rows)
+    df['Precio'] = np.round(df['Precio'].to_numpy() * noise, 2)
+    return df
+
+
+def write_catalog(n_rows, path, seed=42):
+    df = grow_catalog(n_rows, seed=seed)
+    df.to_csv(path, index=False)
+    return path
+
+
+def sample_filters(df, n, seed=0):
+    # Combinaciones de filtros como las que envía app.py, sacadas de los valores reales
+    rng = np.random.default_rng(seed)
+    choices = {
+        'processor': ['i5', 'i7', 'Ryzen 7', 'Ultra', 'M3', 'core i', 'Snapdragon'],
+        'ram': [str(v) for v in df['RAM'].dropna().unique()],
+        'ramType': list(df['Tipo RAM'].dropna().unique()),
+        'storage': [str(v) for v in df['Almacenamiento'].dropna().unique()],
+        'graphics': list(df['Graficos'].dropna().unique()),
+        'screen': [float(v) for v in df['Pantalla'].dropna().unique()],
+        'resolution': list(df['Resolucion'].dropna().unique()),
+        'os': list(df['Sistema Operativo'].dropna().unique()),
+        'battery': [str(v) for v in df['Bateria'].dropna().unique()],
+        'price': ['500', '700', '900', '1200', '1500', '2000'],
+    }
+    keys = list(choices)
+    result = []
+    for _ in range(n):
+        filters = {}
+        for key in rng.choice(keys, size=rng.integers(0, 4), replace=False):
+            options = choices[key]
+            filters[str(key)] = options[rng.integers(0, len(options))]
+        result.append(filters)
+    return result
+
+
+# Filtros por búsqueda (0 = sin filtros) y cuánto se usa cada desplegable de app.py
+FILTER_COUNTS = {0: 0.25, 1: 0.35, 2: 0.25, 3: 0.1, 4: 0.05}
+FILTER_POPULARITY = {'price': 0.25, 'processor': 0.2, 'ram': 0.15, 'storage': 0.1, 'graphics': 0.08, 'screen': 0.07,
+                     'os': 0.05, 'ramType': 0.04, 'resolution': 0.03, 'battery': 0.03}
+
+
+def realistic_filters(df, n, seed=0):
+    # Como sample_filters, pero con la mezcla de una sesión real: pocas búsquedas con muchos filtros,
+    # los desplegables más usados más a menudo y cada valor con la frecuencia que tiene en el catálogo
+    rng = np.random.default_rng(seed)
+    columns = {'ram': 'RAM', 'ramType': 'Tipo RAM', 'storage': 'Almacenamiento', 'graphics': 'Graficos',
+               'screen': 'Pantalla', 'resolution': 'Resolucion', 'os': 'Sistema Operativo', 'battery': 'Bateria'}
+    choices = {}
+    for key, col in columns.items():
+        counts = df[col].dropna().value_counts()
+        values = [float(v) if key == 'screen' else str(v) if key in ('ram', 'storage', 'battery') else v
+                  for v in counts.index]
+        choices[key] = (values, (counts / counts.sum()).to_numpy())
+    processors = ['i5', 'i7', 'Ryzen 7', 'Ultra', 'M3', 'core i', 'Snapdragon']
+    hits = np.array([df['Procesador'].astype(str).str.contains(p, regex=False).sum() + 1 for p in processors])
+    choices['processor'] = (processors, hits / hits.sum())
+    prices = ['500', '700', '900', '1200', '1500', '2000']
+    choices['price'] = (prices, np.array([0.1, 0.2, 0.25, 0.25, 0.12, 0.08]))
+    keys = list(FILTER_POPULARITY)
+    popularity = np.array(list(FILTER_POPULARITY.values()))
+    sizes = rng.choice(list(FILTER_COUNTS), size=n, p=list(FILTER_COUNTS.values()))
+    result = []
+    for size in sizes:
+        filters = {}
+        for key in rng.choice(keys, size=size, replace=False, p=popularity / popularity.sum()):
+            values, weights = choices[str(key)]
+            filters[str(key)] = values[rng.choice(len(values), p=weights)]
+        result.append(filters)
+    return result
@@ -0,0 +1,195 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from metrics import log
+from normalize import parse_price
+
+# Artefacto del catálogo para servir: Arrow IPC sin comprimir (se mapea en memoria sin copiar)
+# en ARTIFACT_DIR/<versión>/, con current.json apuntando a la última versión publicada
+ARTIFACT_DIR = 'catalog'
+CURRENT = 'current.json'
+MANIFEST = 'manifest.json'
+DATA_FILE = 'catalog.arrow'
+CSV_PATH = 'chollos.csv'
+# Versiones que se conservan: la nueva y la que aún pueda tener abierta un proceso que no ha recargado
+KEEP_VERSIONS = 2
+
+_TEXT = pa.dictionary(pa.int32(), pa.string())
+# Columnas que pueden faltar (catálogos anteriores, tablas sin URL): se guardan como nulls y al leer
+# el artefacto sólo aparecen si tienen algún valor. URL es la clave del historial de precios
+# y product_id el producto de entity_resolution.py
+OPTIONAL_COLUMNS = ['URL', 'product_id']
+# Esquema fijo: los textos como diccionario (códigos + valores distintos), los números en float32
+# como los tiene OfferStore en memoria y sin nulls (NaN), para poder verlos como arrays de numpy
+SCHEMA = pa.schema([
+    ('Procesador', _TEXT),
+    ('RAM', pa.float32()),
+    ('Tipo RAM', _TEXT),
+    ('Almacenamiento', pa.float32()),
+    ('Graficos', _TEXT),
+    ('Pantalla', pa.float32()),
+    ('Resolucion', _TEXT),
+    ('Sistema Operativo', _TEXT),
+    ('Bateria', pa.float32()),
+    ('Precio', pa.float32()),
+    ('Chollo', pa.int64()),
+    ('Probabilidad_Chollo', pa.float32()),
+    ('URL', _TEXT),
+    ('product_id', _TEXT),
+])
+SCHEMA_HASH = hashlib.sha256(SCHEMA.serialize().to_pybytes()).hexdigest()[:16]
+
+
+def _write_json(path, data):
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def _column(values, field):
+    if pa.types.is_dictionary(field.type):
+        categorical = values if isinstance(values.dtype, pd.CategoricalDtype) else values.astype('category')
+        categories = [str(v) for v in categorical.cat.categories]
+        codes = categorical.cat.codes.to_numpy().astype(np.int32)
+        indices = pa.array(codes, pa.int32(), mask=codes < 0)
+        return pa.DictionaryArray.from_arrays(indices, pa.array(categories, pa.string()))
+    if field.name == 'Precio' and values.dtype == object:
+        # Las tablas del scraping traen el precio como texto ("1.299,00")
+        values = parse_price(values)
+    if pa.types.is_integer(field.type):
+        return pa.array(values.to_numpy(dtype=np.int64), field.type)
+    return pa.array(pd.to_numeric(values).to_numpy(dtype=np.float32), field.type)
+
+
+def to_table(df):
+    # DataFrame del catálogo -> tabla con el esquema fijo; las columnas opcionales que falten quedan en null
+    missing = [field.name for field in SCHEMA if field.name not in df and field.name not in OPTIONAL_COLUMNS]
+    if missing:
+        raise ValueError(f"Faltan columnas del esquema del catálogo: {', '.join(missing)}")
+    unknown = [col for col in df.columns if col not in SCHEMA.names]
+    if unknown:
+        log.warning("⚠️ Columnas que no están en el esquema del catálogo y no se publican: %s", ', '.join(unknown))
+    arrays = [_column(df[field.name], field) if field.name in df else pa.nulls(len(df), field.type)
+              for field in SCHEMA]
+    return pa.Table.from_arrays(arrays, schema=SCHEMA)
+
+
+def publish(df, directory=ARTIFACT_DIR, model_hash=None, source=None):
+    # Escribe una versión nueva (fichero Arrow + manifest) y la publica cambiando current.json
+    os.makedirs(directory, exist_ok=True)
+    table = to_table(df)
+    tmp = tempfile.mkdtemp(prefix='.publish-', dir=directory)
+    try:
+        path = os.path.join(tmp, DATA_FILE)
+        # Un único record batch: cada columna es un solo buffer contiguo dentro del fichero
+        with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, SCHEMA) as writer:
+            writer.write_table(table, max_chunksize=max(len(table), 1))
+        # Versión = contenido + modelo con el que se calcularon Chollo y Probabilidad_Chollo
+        digest = hashlib.sha256(f"{model_hash}\n".encode('utf-8'))
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        version = digest.hexdigest()[:16]
+        _write_json(os.path.join(tmp, MANIFEST), {
+            'version': version,
+            'rows': table.num_rows,
+            'schema_hash': SCHEMA_HASH,
+            'model_hash': model_hash,
+            'source': source,
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'file': DATA_FILE,
+            'bytes': os.path.getsize(path),
+        })
+        final = os.path.join(directory, version)
+        if os.path.exists(os.path.join(final, MANIFEST)):
+            # Misma versión ya publicada
+            shutil.rmtree(tmp)
+        else:
+            os.replace(tmp, final)
+    except Exception:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    _write_json(os.path.join(directory, CURRENT), {'version': version})
+    _prune(directory, keep=version)
+    return final
+
+
+def _prune(directory, keep):
+    # Borrar versiones viejas; quien aún las tenga mapeadas sigue leyéndolas sin problema
+    versions = [entry for entry in os.scandir(directory)
+                if entry.is_dir() and entry.name != keep and os.path.exists(os.path.join(entry.path, MANIFEST))]
+    versions.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in versions[KEEP_VERSIONS - 1:]:
+        shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def current_version(directory=ARTIFACT_DIR):
+    with open(os.path.join(directory, CURRENT), encoding='utf-8') as f:
+        return os.path.join(directory, json.load(f)['version'])
+
+
+def read_manifest(path):
+    with open(os.path.join(path, MANIFEST), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def read_artifact(path):
+    # (DataFrame, manifest) de una versión o del directorio del artefacto (la versión actual).
+    # Los números son vistas de sólo lectura sobre el fichero mapeado; los códigos del texto se copian
+    # al entero más pequeño que use pandas (1 byte por fila con menos de 127 valores distintos)
+    if os.path.exists(os.path.join(path, CURRENT)):
+        path = current_version(path)
+    manifest = read_manifest(path)
+    if manifest['schema_hash'] != SCHEMA_HASH:
+        raise ValueError(f"El artefacto {path} tiene otro esquema ({manifest['schema_hash']}, se esperaba {SCHEMA_HASH})")
+    table = pa.ipc.open_file(pa.memory_map(os.path.join(path, manifest['file']), 'r')).read_all()
+    if not table.schema.equals(SCHEMA) or table.num_rows != manifest['rows']:
+        raise ValueError(f"El artefacto {path} no coincide con su manifest")
+    data = {}
+    for field, column in zip(table.schema, table.columns):
+        if field.name in OPTIONAL_COLUMNS and column.null_count == len(column):
+            # Columna opcional vacía: el catálogo queda igual que el CSV del que salió
+            continue
+        array = column.chunk(0) if column.num_chunks == 1 else column.combine_chunks()
+        if pa.types.is_dictionary(field.type):
+            indices = array.indices
+            codes = (indices.fill_null(-1) if indices.null_count else indices).to_numpy(zero_copy_only=False)
+            data[field.name] = pd.Categorical.from_codes(codes, categories=array.dictionary.to_pandas())
+        else:
+            data[field.name] = array.to_numpy(zero_copy_only=True)
+    return pd.DataFrame(data, copy=False), manifest
+
+
+def catalog_path():
+    # Lo que sirve el backend: CHOLLOS_CATALOG, el artefacto si está publicado o, si no, chollos.csv
+    path = os.environ.get('CHOLLOS_CATALOG')
+    if path:
+        return path
+    if os.path.exists(os.path.join(ARTIFACT_DIR, CURRENT)):
+        return ARTIFACT_DIR
+    return CSV_PATH
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Publica el catálogo como artefacto Arrow versionado")
+    parser.add_argument('csv', nargs='?', default=CSV_PATH)
+    parser.add_argument('--dir', default=ARTIFACT_DIR)
+    parser.add_argument('--model-hash', help="versión del modelo con la que se calcularon las columnas del catálogo")
+    args = parser.parse_args()
+    path = publish(pd.read_csv(args.csv), args.dir, args.model_hash, source=args.csv)
+    manifest = read_manifest(path)
+    print(f"📦 {manifest['rows']} ofertas publicadas en {path} ({manifest['bytes'] / 1e6:.1f} MB)")
+
+
+if __name__ == '__main__':
+    main()
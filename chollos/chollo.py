@@ -1,254 +1,317 @@
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
 import numpy as np
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import classification_report, accuracy_score
-import matplotlib.pyplot as plt
-import seaborn as sns
-
-# Load the CSV data
-file_path = 'specs_simplified_all.csv'
-df_original = pd.read_csv(file_path, sep=',')
-
-# Create a working copy to preserve the original structure
-df = df_original.copy()
-
-# Data preprocessing
-df['Precio'] = df['Precio'].str.replace('.', '').str.replace(',', '.').astype(float)
-
-# Handle missing values
-df['RAM'] = df['RAM'].fillna(8)
-df['Almacenamiento'] = df['Almacenamiento'].fillna(512)
-df['Bateria'] = df['Bateria'].fillna(df['Bateria'].median())
-
-# Create a column for "Tipo" (CPU type) based on Procesador
-df['Tipo'] = df['Procesador'].apply(lambda x: 'Intel' if 'Intel' in str(x) else 
-                                        ('Apple' if 'Apple' in str(x) else 
-                                         ('AMD' if 'AMD' in str(x) else 
-                                          ('Qualcomm' if 'Qualcomm' in str(x) else 'Otro'))))
-
-# Extract more features
-def extract_cpu_gen(cpu):
-    if not isinstance(cpu, str):
-        return 0
-    if 'Core i' in cpu:
-        for i in range(3, 15):  # Intel generations 3-14
-            if f'i{i}-' in cpu or f'i{i} ' in cpu:
-                return i
-    elif 'Ultra' in cpu:
-        return 15  # Ultra is newest
-    elif 'M' in cpu:
-        return int(cpu.split('-')[1][1]) if '-M' in cpu else 0
-    return 0
-
-# Apply the function to create a new column
-df['CPU_Generation'] = df['Procesador'].apply(extract_cpu_gen)
-
-# Create a quality score based on specs
-df['Quality_Score'] = (
-    df['RAM'] * 0.3 +
-    df['Almacenamiento'] * 0.2 +
-    df['Bateria'] * 0.1 +
-    df['CPU_Generation'] * 50
-)
-
-# Calculate a value score (quality per price)
-df['Value_Score'] = df['Quality_Score'] / df['Precio']
-
-# Manually labeled examples (based on good value for the specs)
-# Higher value score could indicate a better deal
-high_value_threshold = df['Value_Score'].quantile(0.75)
-low_value_threshold = df['Value_Score'].quantile(0.25)
-
-# Create a subset of labeled data for training
-labeled_data = pd.DataFrame()
-
-# Labeling high value scores as "chollo" (1) and low value scores as "no chollo" (0)
-high_value_sample = df[df['Value_Score'] > high_value_threshold].sample(min(30, len(df[df['Value_Score'] > high_value_threshold])))
-low_value_sample = df[df['Value_Score'] < low_value_threshold].sample(min(30, len(df[df['Value_Score'] < low_value_threshold])))
-
-high_value_sample['es_chollo'] = 1  # Chollo
-low_value_sample['es_chollo'] = 0   # No chollo
-
-# Combine the labeled samples
-labeled_data = pd.concat([high_value_sample, low_value_sample])
-
-# Some manual corrections based on domain knowledge
-# For example, very cheap laptops with decent specs or high-end laptops at good prices
-for idx, row in labeled_data.iterrows():
+
+# Normalización compartida con los notebooks de scraping y el backend (normalize.py en la raíz)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from normalize import cpu_generation, cpu_type, parse_price, ram_type_number, resolution_pixels, screen_size
+from scoring import file_hash
+from catalog_artifact import ARTIFACT_DIR, publish as publish_artifact
+
+RESULTS_PATH = 'chollos.csv'
+IMPORTANCE_PATH = 'feature_importance.csv'
+# Hash de los datos con los que se dibujaron las figuras: si no cambia, no se vuelven a dibujar
+PLOTS_STAMP = 'plots.json'
+
+
+def label_samples(labeled_data):
+    # Some manual corrections based on domain knowledge, applied in the same order as before:
+    # a row that matches several rules keeps the label of the last one
+    procesador = labeled_data['Procesador'].astype(str)
+    precio, ram = labeled_data['Precio'], labeled_data['RAM']
+
     # Adjust expensive Apple devices (they're typically not considered "chollos" unless significantly discounted)
-    if 'Apple' in str(row['Procesador']) and row['Precio'] > 1500:
-        labeled_data.at[idx, 'es_chollo'] = 0
-    
+    labeled_data.loc[procesador.str.contains('Apple', regex=False) & (precio > 1500), 'es_chollo'] = 0
+
     # Budget laptops with good specs are often good deals
-    if row['Precio'] < 500 and row['RAM'] >= 8 and row['Almacenamiento'] >= 512:
-        labeled_data.at[idx, 'es_chollo'] = 1
-    
+    labeled_data.loc[(precio < 500) & (ram >= 8) & (labeled_data['Almacenamiento'] >= 512), 'es_chollo'] = 1
+
     # Laptops with high-end CPUs at moderate prices are good deals
-    if 'i7' in str(row['Procesador']) and row['Precio'] < 900 and row['RAM'] >= 16:
-        labeled_data.at[idx, 'es_chollo'] = 1
-
-# Process categorical columns and prepare features for the model
-# Function to convert screen resolution to numeric pixels
-def extract_resolution_pixels(res_str):
-    if not isinstance(res_str, str):
-        return 0
-    try:
-        parts = res_str.split('x')
-        if len(parts) == 2:
-            return int(parts[0]) * int(parts[1])
-        return 0
-    except:
-        return 0
-
-# Create more advanced features
-labeled_data['Resolution_Pixels'] = labeled_data['Resolucion'].apply(extract_resolution_pixels)
-df['Resolution_Pixels'] = df['Resolucion'].apply(extract_resolution_pixels)
-
-# Convert 'Tipo RAM' to a numeric value (DDR generation)
-def ram_type_to_num(ram_type):
-    if not isinstance(ram_type, str):
-        return 4  # Default to DDR4 if missing
-    try:
-        if 'DDR' in ram_type:
-            return int(ram_type.replace('DDR', ''))
-        return 4  # Default to DDR4 if not specified
-    except:
-        return 4
-
-labeled_data['RAM_Type_Num'] = labeled_data['Tipo RAM'].apply(ram_type_to_num)
-df['RAM_Type_Num'] = df['Tipo RAM'].apply(ram_type_to_num)
-
-# Screen size to float
-def screen_size_to_float(size):
-    if not isinstance(size, (int, float, str)):
-        return 15.6  # Default value
+    labeled_data.loc[procesador.str.contains('i7', regex=False) & (precio < 900) & (ram >= 16), 'es_chollo'] = 1
+    return labeled_data
+
+
+def train(file_path='specs_simplified_all.csv', results_path=RESULTS_PATH, importance_path=IMPORTANCE_PATH,
+          artifact_dir=ARTIFACT_DIR):
+    # Devuelve el hash del modelo de etiquetado; artifact_dir=None no publica el catálogo (lo hace quien llama)
+    # Load the CSV data
+    df_original = pd.read_csv(file_path, sep=',')
+
+    # Create a working copy to preserve the original structure
+    df = df_original.copy()
+
+    # Data preprocessing
+    df['Precio'] = parse_price(df['Precio'])
+
+    # Handle missing values
+    df['RAM'] = df['RAM'].fillna(8)
+    df['Almacenamiento'] = df['Almacenamiento'].fillna(512)
+    df['Bateria'] = df['Bateria'].fillna(df['Bateria'].median())
+
+    # Create a column for "Tipo" (CPU type) based on Procesador
+    df['Tipo'] = cpu_type(df['Procesador'])
+
+    # Extract more features (Intel generations 3-14, Ultra is newest, Apple M-series)
+    df['CPU_Generation'] = cpu_generation(df['Procesador'])
+
+    # Create a quality score based on specs
+    df['Quality_Score'] = (
+        df['RAM'] * 0.3 +
+        df['Almacenamiento'] * 0.2 +
+        df['Bateria'] * 0.1 +
+        df['CPU_Generation'] * 50
+    )
+
+    # Calculate a value score (quality per price)
+    df['Value_Score'] = df['Quality_Score'] / df['Precio']
+
+    # Manually labeled examples (based on good value for the specs)
+    # Higher value score could indicate a better deal
+    high_value_threshold = df['Value_Score'].quantile(0.75)
+    low_value_threshold = df['Value_Score'].quantile(0.25)
+
+    # Labeling high value scores as "chollo" (1) and low value scores as "no chollo" (0)
+    high_value_sample = df[df['Value_Score'] > high_value_threshold].sample(min(30, len(df[df['Value_Score'] > high_value_threshold])))
+    low_value_sample = df[df['Value_Score'] < low_value_threshold].sample(min(30, len(df[df['Value_Score'] < low_value_threshold])))
+
+    high_value_sample['es_chollo'] = 1  # Chollo
+    low_value_sample['es_chollo'] = 0   # No chollo
+
+    # Combine the labeled samples
+    labeled_data = label_samples(pd.concat([high_value_sample, low_value_sample]))
+
+    # Process categorical columns and prepare features for the model
+    # Screen resolution to numeric pixels
+    labeled_data['Resolution_Pixels'] = resolution_pixels(labeled_data['Resolucion'])
+    df['Resolution_Pixels'] = resolution_pixels(df['Resolucion'])
+
+    # Convert 'Tipo RAM' to a numeric value (DDR generation, DDR4 if missing)
+    labeled_data['RAM_Type_Num'] = ram_type_number(labeled_data['Tipo RAM'])
+    df['RAM_Type_Num'] = ram_type_number(df['Tipo RAM'])
+
+    # Screen size to float (15.6 if it can't be read)
+    labeled_data['Screen_Size_Num'] = screen_size(labeled_data['Pantalla'])
+    df['Screen_Size_Num'] = screen_size(df['Pantalla'])
+
+    # Prepare a more comprehensive feature list
+    numerical_features = [
+        'RAM', 'Almacenamiento', 'Bateria', 'Precio',
+        'CPU_Generation', 'Quality_Score', 'Value_Score',
+        'Resolution_Pixels', 'RAM_Type_Num', 'Screen_Size_Num'
+    ]
+
+    # Check which features exist in our dataset
+    valid_features = [col for col in numerical_features if col in labeled_data.columns]
+
+    # Convert categorical data to one-hot encoding for training
+    categorical_columns = ['Tipo', 'Sistema Operativo', 'Graficos']
+    labeled_data_encoded = pd.get_dummies(labeled_data, columns=categorical_columns, dummy_na=True)
+    df_encoded = pd.get_dummies(df, columns=categorical_columns, dummy_na=True)
+
+    # Identify all dummy columns created
+    dummy_features = [col for col in labeled_data_encoded.columns
+                      if any(col.startswith(cat + '_') for cat in categorical_columns)]
+
+    # Combine numerical and dummy features
+    all_features = valid_features + dummy_features
+    all_features = [col for col in all_features if col in labeled_data_encoded.columns and col != 'es_chollo']
+
+    # Split the labeled data into training and testing sets
+    X = labeled_data_encoded[all_features]
+    y = labeled_data_encoded['es_chollo']
+
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+
+    # Scale the features
+    scaler = StandardScaler()
+    X_train_scaled = scaler.fit_transform(X_train)
+    X_test_scaled = scaler.transform(X_test)
+
+    # Train a Random Forest model
+    model = RandomForestClassifier(n_estimators=100, random_state=42)
+    model.fit(X_train_scaled, y_train)
+
+    # Evaluate the model
+    y_pred = model.predict(X_test_scaled)
+    print("Model Accuracy:", accuracy_score(y_test, y_pred))
+    print("\nClassification Report:")
+    print(classification_report(y_test, y_pred))
+
+    # Get feature importance
+    feature_importance = pd.DataFrame({
+        'Feature': all_features,
+        'Importance': model.feature_importances_
+    })
+    feature_importance = feature_importance.sort_values('Importance', ascending=False)
+    print("\nFeature Importance:")
+    print(feature_importance.head(10))  # Show top 10 most important features
+
+    # Ensure all columns in X are present in the full dataset for prediction
+    for col in X.columns:
+        if col not in df_encoded.columns:
+            df_encoded[col] = 0
+
+    # Get the same columns as the training set
+    X_full = df_encoded[all_features]
+
+    # Scale the features
+    X_full_scaled = scaler.transform(X_full)
+
+    # Predict on the full dataset
+    chollo_predictions = model.predict(X_full_scaled)
+    chollo_probabilities = model.predict_proba(X_full_scaled)[:, 1]
+
+    # Add predictions to the original dataframe
+    df_original['Precio'] = df['Precio']  # Use the processed price values
+    df_original['Chollo'] = chollo_predictions
+    df_original['Probabilidad_Chollo'] = chollo_probabilities
+
+    # Save the complete dataset with the "Chollo" column
+    df_original.to_csv(results_path, index=False)
+    # Artefacto columnar que sirve el backend (mismo contenido, versionado y mapeable en memoria)
+    model_hash = hashlib.sha256(pickle.dumps((scaler, model))).hexdigest()[:16]
+    if artifact_dir:
+        artifact = publish_artifact(df_original, artifact_dir, model_hash, source=results_path)
+        print(f"Catálogo publicado en '{artifact}'")
+    # The plotting step reads the importances from disk, so it can run later or on its own
+    feature_importance.to_csv(importance_path, index=False)
+
+    # Show the top 10 "chollos" with highest probability
+    print("\nTop 10 'Chollos' encontrados:")
+    top_chollos = df_original[df_original['Chollo'] == 1].sort_values('Probabilidad_Chollo', ascending=False).head(10)
+    print(top_chollos[['Procesador', 'RAM', 'Almacenamiento', 'Precio', 'Chollo', 'Probabilidad_Chollo']])
+
+    print(f"\nAnálisis completo. Resultados guardados en '{results_path}'")
+    print("Este archivo contiene todas las columnas originales más las columnas 'Chollo' y 'Probabilidad_Chollo'")
+    return model_hash
+
+
+# Figures: each one is drawn in its own process from the files written by train()
+# (plot(path, results_path, importance_path), with the same paths that were passed to train())
+
+def plot_feature_importance(path, results_path, importance_path):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    feature_importance = pd.read_csv(importance_path)
+    plt.figure(figsize=(10, 6))
+    top_features = feature_importance.head(10)
+    sns.barplot(x='Importance', y='Feature', data=top_features)
+    plt.title('Top 10 Feature Importance for "Chollo" Classification')
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close()
+
+
+def plot_price_distribution(path, results_path, importance_path):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    df_original = pd.read_csv(results_path)
+    # Visualize price distribution by chollo classification
+    plt.figure(figsize=(10, 6))
+    sns.histplot(data=df_original, x='Precio', hue='Chollo', bins=30, kde=True)
+    plt.title('Distribución de Precios por Clasificación de Chollo')
+    plt.xlabel('Precio (€)')
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close()
+
+
+def plot_ram_vs_price(path, results_path, importance_path):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    df_original = pd.read_csv(results_path)
+    # Visualize the relationship between RAM and Price, colored by chollo classification
+    plt.figure(figsize=(10, 6))
+    sns.scatterplot(data=df_original, x='RAM', y='Precio', hue='Chollo', alpha=0.7)
+    plt.title('RAM vs Precio por Clasificación de Chollo')
+    plt.xlabel('RAM (GB)')
+    plt.ylabel('Precio (€)')
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close()
+
+
+def plot_storage_vs_price(path, results_path, importance_path):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    df_original = pd.read_csv(results_path)
+    # Visualize the relationship between Storage and Price, colored by chollo classification
+    plt.figure(figsize=(10, 6))
+    sns.scatterplot(data=df_original, x='Almacenamiento', y='Precio', hue='Chollo', alpha=0.7)
+    plt.title('Almacenamiento vs Precio por Clasificación de Chollo')
+    plt.xlabel('Almacenamiento (GB)')
+    plt.ylabel('Precio (€)')
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close()
+
+
+PLOTS = {
+    'feature_importance.png': plot_feature_importance,
+    'price_distribution.png': plot_price_distribution,
+    'ram_vs_price.png': plot_ram_vs_price,
+    'storage_vs_price.png': plot_storage_vs_price,
+}
+
+
+def render_plots(results_path=RESULTS_PATH, importance_path=IMPORTANCE_PATH, force=False, workers=None):
+    # Dibuja las figuras en paralelo junto a results_path; no hace nada si los datos no han cambiado desde la última vez
+    out_dir = os.path.dirname(results_path)
+    paths = {os.path.join(out_dir, name): plot for name, plot in PLOTS.items()}
+    stamp = os.path.join(out_dir, PLOTS_STAMP)
+    data_hash = file_hash(results_path, importance_path)
     try:
-        if isinstance(size, str):
-            return float(size)
-        return size
-    except:
-        return 15.6
-
-labeled_data['Screen_Size_Num'] = labeled_data['Pantalla'].apply(screen_size_to_float)
-df['Screen_Size_Num'] = df['Pantalla'].apply(screen_size_to_float)
-
-# Prepare a more comprehensive feature list
-numerical_features = [
-    'RAM', 'Almacenamiento', 'Bateria', 'Precio', 
-    'CPU_Generation', 'Quality_Score', 'Value_Score',
-    'Resolution_Pixels', 'RAM_Type_Num', 'Screen_Size_Num'
-]
-
-# Check which features exist in our dataset
-valid_features = [col for col in numerical_features if col in labeled_data.columns]
-
-# Convert categorical data to one-hot encoding for training
-categorical_columns = ['Tipo', 'Sistema Operativo', 'Graficos']
-labeled_data_encoded = pd.get_dummies(labeled_data, columns=categorical_columns, dummy_na=True)
-df_encoded = pd.get_dummies(df, columns=categorical_columns, dummy_na=True)
-
-# Identify all dummy columns created
-dummy_features = [col for col in labeled_data_encoded.columns 
-                  if any(col.startswith(cat + '_') for cat in categorical_columns)]
-
-# Combine numerical and dummy features
-all_features = valid_features + dummy_features
-all_features = [col for col in all_features if col in labeled_data_encoded.columns and col != 'es_chollo']
-
-# Split the labeled data into training and testing sets
-X = labeled_data_encoded[all_features]
-y = labeled_data_encoded['es_chollo']
-
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-# Scale the features
-scaler = StandardScaler()
-X_train_scaled = scaler.fit_transform(X_train)
-X_test_scaled = scaler.transform(X_test)
-
-# Train a Random Forest model
-model = RandomForestClassifier(n_estimators=100, random_state=42)
-model.fit(X_train_scaled, y_train)
-
-# Evaluate the model
-y_pred = model.predict(X_test_scaled)
-print("Model Accuracy:", accuracy_score(y_test, y_pred))
-print("\nClassification Report:")
-print(classification_report(y_test, y_pred))
-
-# Get feature importance
-feature_importance = pd.DataFrame({
-    'Feature': all_features,
-    'Importance': model.feature_importances_
-})
-feature_importance = feature_importance.sort_values('Importance', ascending=False)
-print("\nFeature Importance:")
-print(feature_importance.head(10))  # Show top 10 most important features
-
-# Plot feature importance
-plt.figure(figsize=(10, 6))
-top_features = feature_importance.head(10)
-sns.barplot(x='Importance', y='Feature', data=top_features)
-plt.title('Top 10 Feature Importance for "Chollo" Classification')
-plt.tight_layout()
-plt.savefig('feature_importance.png')
-
-# Ensure all columns in X are present in the full dataset for prediction
-for col in X.columns:
-    if col not in df_encoded.columns:
-        df_encoded[col] = 0
-
-# Get the same columns as the training set
-X_full = df_encoded[all_features]
-
-# Scale the features
-X_full_scaled = scaler.transform(X_full)
-
-# Predict on the full dataset
-chollo_predictions = model.predict(X_full_scaled)
-chollo_probabilities = model.predict_proba(X_full_scaled)[:, 1]
-
-# Add predictions to the original dataframe
-df_original['Precio'] = df['Precio']  # Use the processed price values
-df_original['Chollo'] = chollo_predictions
-df_original['Probabilidad_Chollo'] = chollo_probabilities
-
-# Save the complete dataset with the "Chollo" column
-df_original.to_csv('chollos.csv', index=False)
-
-# Show the top 10 "chollos" with highest probability
-print("\nTop 10 'Chollos' encontrados:")
-top_chollos = df_original[df_original['Chollo'] == 1].sort_values('Probabilidad_Chollo', ascending=False).head(10)
-print(top_chollos[['Procesador', 'RAM', 'Almacenamiento', 'Precio', 'Chollo', 'Probabilidad_Chollo']])
-
-# Visualize price distribution by chollo classification
-plt.figure(figsize=(10, 6))
-sns.histplot(data=df_original, x='Precio', hue='Chollo', bins=30, kde=True)
-plt.title('Distribución de Precios por Clasificación de Chollo')
-plt.xlabel('Precio (€)')
-plt.tight_layout()
-plt.savefig('price_distribution.png')
-
-# Visualize the relationship between RAM and Price, colored by chollo classification
-plt.figure(figsize=(10, 6))
-sns.scatterplot(data=df_original, x='RAM', y='Precio', hue='Chollo', alpha=0.7)
-plt.title('RAM vs Precio por Clasificación de Chollo')
-plt.xlabel('RAM (GB)')
-plt.ylabel('Precio (€)')
-plt.tight_layout()
-plt.savefig('ram_vs_price.png')
-
-# Visualize the relationship between Storage and Price, colored by chollo classification
-plt.figure(figsize=(10, 6))
-sns.scatterplot(data=df_original, x='Almacenamiento', y='Precio', hue='Chollo', alpha=0.7)
-plt.title('Almacenamiento vs Precio por Clasificación de Chollo')
-plt.xlabel('Almacenamiento (GB)')
-plt.ylabel('Precio (€)')
-plt.tight_layout()
-plt.savefig('storage_vs_price.png')
-
-print("\nAnálisis completo. Resultados guardados en 'chollos.csv'")
-print("Este archivo contiene todas las columnas originales más las columnas 'Chollo' y 'Probabilidad_Chollo'")
-print("Visualizaciones guardadas como 'feature_importance.png', 'price_distribution.png', 'ram_vs_price.png', y 'storage_vs_price.png'")
+        with open(stamp, encoding='utf-8') as f:
+            previous = json.load(f).get('data_hash')
+    except (OSError, ValueError):
+        previous = None
+    if not force and previous == data_hash and all(os.path.exists(path) for path in paths):
+        print("Visualizaciones al día (los datos no han cambiado), no se vuelven a dibujar")
+        return False
+    with ProcessPoolExecutor(max_workers=workers or min(len(PLOTS), os.cpu_count() or 1)) as pool:
+        for future in [pool.submit(plot, path, results_path, importance_path) for path, plot in paths.items()]:
+            future.result()
+    with open(stamp, 'w', encoding='utf-8') as f:
+        json.dump({'data_hash': data_hash}, f)
+    print(f"Visualizaciones guardadas como {', '.join(repr(path) for path in paths)}")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Etiqueta chollos, entrena el modelo y dibuja las visualizaciones")
+    parser.add_argument('--data', default='specs_simplified_all.csv')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--no-plots', action='store_true', help="sólo entrenar y guardar chollos.csv (sin figuras)")
+    mode.add_argument('--plots-only', action='store_true', help="sólo dibujar las figuras a partir de chollos.csv")
+    parser.add_argument('--results', default=RESULTS_PATH, help="tabla etiquetada (las figuras se guardan a su lado)")
+    parser.add_argument('--importance', default=IMPORTANCE_PATH)
+    parser.add_argument('--force-plots', action='store_true', help="dibujar aunque los datos no hayan cambiado")
+    args = parser.parse_args()
+
+    if not args.plots_only:
+        train(args.data, args.results, args.importance)
+    if not args.no_plots:
+        render_plots(args.results, args.importance, force=args.force_plots)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,266 @@
+import hashlib
+import re
+import time
+import unicodedata
+import zlib
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+# MinHash del título con NUM_PERM permutaciones partidas en BANDS bandas: dos fichas del mismo bloque son
+# candidatas si coinciden en alguna banda entera (con 16 x 4, casi seguro por encima de ~0.6 de Jaccard
+# y poco probable por debajo de 0.3)
+NUM_PERM = 64
+BANDS = 16
+# Jaccard estimado de los títulos y de las specs a partir del que dos candidatas son el mismo producto.
+# Se separan porque las specs de dos portátiles distintos del mismo bloque suelen coincidir casi enteras
+TITLE_THRESHOLD = 0.55
+SPEC_THRESHOLD = 0.6
+# Primo de las permutaciones (a * x + b) % PRIME: a < 2**31 para que a * x no desborde en uint64
+PRIME = np.uint64(4294967291)
+SEED = 1
+# Filas por trozo al calcular firmas y comparar pares (acota la memoria)
+CHUNK = 50_000
+# Palabras de los títulos que no distinguen un portátil de otro
+STOPWORDS = {'portatil', 'laptop', 'ordenador', 'de', 'con', 'y', 'el', 'la', 'en', 'para', 'ssd', 'ram',
+             'pulgadas', 'cm'}
+# Specs que se comparan además del título, con el prefijo de sus tokens
+SPEC_TOKENS = {'Procesador': 'cpu', 'Tipo RAM': 'ddr', 'Graficos': 'gpu', 'Pantalla': 'pant', 'Resolucion': 'res',
+               'Sistema Operativo': 'so', 'Bateria': 'bat'}
+# Specs cuyas palabras se quitan del título: ya se comparan (o bloquean) por su lado y en el título
+# sólo harían parecidos a dos portátiles distintos con la misma configuración
+TITLE_SPEC_COLUMNS = list(SPEC_TOKENS) + ['RAM', 'Almacenamiento']
+
+_WORD = re.compile(r"[a-z0-9]+(?:\.\d+)?")
+# Referencia de fabricante: letras y cifras mezcladas, 5 caracteres o más
+_REFERENCE = re.compile(r"(?=.*[a-z])(?=.*\d)[a-z0-9]{5,}")
+# "16 GB" -> "16gb", como "16GB"
+_UNIT = re.compile(r"(\d)\s+(gb|tb|ghz|hz|wh|mah)\b")
+_ALNUM = re.compile(r"[a-z0-9]+")
+# Mezcla de 64 bits para agrupar bandas (constantes de splitmix64)
+_MIX = (np.uint64(0x9E3779B97F4A7C15), np.uint64(0xBF58476D1CE4E5B9))
+
+
+def _plain(text):
+    # Minúsculas y sin tildes ni ®/™: "Portátil ASUS® Vivobook" -> "portatil asus vivobook"
+    text = unicodedata.normalize('NFKD', str(text)).encode('ascii', 'ignore').decode('ascii')
+    return text.lower().replace(',', '.')
+
+
+def text_tokens(text):
+    # Palabras y códigos ("f1504za", "16gb"), sin las palabras vacías
+    if text is None or (isinstance(text, float) and np.isnan(text)):
+        return []
+    return [token for token in _WORD.findall(_UNIT.sub(r"\1\2", _plain(text))) if token not in STOPWORDS]
+
+
+def spec_words(values):
+    # Palabras de las specs tal y como pueden salir en un título ("16" -> "16", "16gb"; "1" -> "1tb")
+    words = set()
+    for value in values:
+        for token in text_tokens(value):
+            words.add(token)
+            if token.endswith('.0'):
+                token = token[:-2]
+                words.add(token)
+            if token.isdigit():
+                words.update((f"{token}gb", f"{token}tb"))
+    return words
+
+
+def title_tokens(tokens, specs):
+    # Tokens del título que no repiten palabras de sus specs; las referencias ("f1504za") cuentan doble,
+    # que son lo que distingue dos portátiles de la misma marca y serie
+    tokens = tokens - specs
+    return sorted(tokens | {f"{token}#" for token in tokens if _REFERENCE.fullmatch(token)})
+
+
+def cpu_key(procesador):
+    # Modelo de CPU normalizado para el bloqueo: el token más largo con cifras
+    # ("Intel® Core™ i5-1135G7" -> "1135g7", "AMD Ryzen 7 8845HS" -> "8845hs", "Apple M3 Pro" -> "m3")
+    tokens = [token for token in _ALNUM.findall(_plain(procesador)) if any(c.isdigit() for c in token)]
+    return max(tokens, key=len) if tokens else ''
+
+
+def _by_value(col, fn):
+    # Como en normalize.py: se calcula sobre los valores distintos y se expande
+    codes, uniques = pd.factorize(col, use_na_sentinel=False)
+    return [fn(value) for value in uniques], codes
+
+
+def _storage_gb(col):
+    # Almacenamiento en GB: en las fichas "1" o "2" son TB
+    values = pd.to_numeric(col, errors='coerce')
+    return values.where(values >= 16, values * 1000)
+
+
+class MinHasher:
+    # Firmas MinHash de conjuntos de tokens; min(firma(A), firma(B)) es la firma de A ∪ B
+
+    def __init__(self, num_perm=NUM_PERM, seed=SEED):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.a = rng.integers(1, 1 << 31, num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, 1 << 31, num_perm, dtype=np.uint64)
+        self._hashes = {}
+
+    def _token_hash(self, token):
+        value = self._hashes.get(token)
+        if value is None:
+            value = self._hashes[token] = zlib.crc32(token.encode('utf-8'))
+        return value
+
+    def signatures(self, token_sets):
+        # (conjuntos, num_perm) en uint32; un conjunto vacío tiene la firma máxima
+        out = np.full((len(token_sets), self.num_perm), np.iinfo(np.uint32).max, dtype=np.uint32)
+        for start in range(0, len(token_sets), CHUNK):
+            chunk = token_sets[start:start + CHUNK]
+            lengths = np.fromiter((len(tokens) for tokens in chunk), dtype=np.int64, count=len(chunk))
+            if not lengths.sum():
+                continue
+            flat = np.fromiter((self._token_hash(token) for tokens in chunk for token in tokens), dtype=np.uint64,
+                               count=int(lengths.sum()))
+            hashed = ((flat[:, np.newaxis] * self.a + self.b) % PRIME).astype(np.uint32)
+            rows = np.flatnonzero(lengths)
+            starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))[rows]
+            out[start + rows] = np.minimum.reduceat(hashed, starts, axis=0)
+        return out
+
+
+class EntityResolver:
+    """Resolución de entidades entre tiendas: qué fichas son el mismo portátil.
+
+    Las fichas se bloquean por modelo de CPU normalizado + RAM + almacenamiento
+    y, dentro de cada bloque, LSH sobre firmas MinHash de los títulos propone
+    candidatas. Sólo se comparan las candidatas (cada una con el representante
+    de su cubeta), así que el coste crece casi lineal con el catálogo en vez de
+    con n². Las parejas cuyos títulos y specs se parecen lo bastante se unen en
+    componentes conexas y cada componente recibe un id de producto estable.
+    """
+
+    def __init__(self, title_threshold=TITLE_THRESHOLD, spec_threshold=SPEC_THRESHOLD, num_perm=NUM_PERM,
+                 bands=BANDS, seed=SEED):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) tiene que ser múltiplo de bands ({bands})")
+        self.title_threshold = title_threshold
+        self.spec_threshold = spec_threshold
+        self.bands = bands
+        self.hasher = MinHasher(num_perm, seed)
+        self.stats = {}
+
+    def blocks(self, df):
+        # Código de bloque por fila: (modelo de CPU, RAM, almacenamiento en GB)
+        keys, codes = _by_value(df['Procesador'], cpu_key)
+        cpu = np.asarray(keys, dtype=object)[codes]
+        ram = pd.to_numeric(df['RAM'], errors='coerce').to_numpy()
+        storage = _storage_gb(df['Almacenamiento']).to_numpy()
+        keys = pd.DataFrame({'cpu': cpu, 'ram': ram, 'storage': storage})
+        return keys.groupby(list(keys), dropna=False, sort=False).ngroup().to_numpy()
+
+    def title_signatures(self, df):
+        # (código por fila, firma por título + specs distintos); la marca cuenta como parte del título
+        titles = df['Titulo'].fillna('').astype(str)
+        if 'Marca' in df:
+            titles = df['Marca'].fillna('').astype(str) + ' ' + titles
+        # Tokens por título distinto y palabras por valor distinto de cada spec; luego por combinación
+        tokens, title_codes = _by_value(titles, lambda text: set(text_tokens(text)))
+        words, columns = [], {}
+        for col in TITLE_SPEC_COLUMNS:
+            values, columns[col] = _by_value(df[col].fillna('').astype(str), lambda value: spec_words([value]))
+            words.append(values)
+        specs = pd.DataFrame(columns)
+        spec_codes = specs.groupby(TITLE_SPEC_COLUMNS, sort=False).ngroup().to_numpy()
+        first = np.unique(spec_codes, return_index=True)[1]
+        spec_sets = [set().union(*(w[c] for w, c in zip(words, row))) for row in specs.to_numpy()[first]]
+        codes, combos = pd.MultiIndex.from_arrays([title_codes, spec_codes]).factorize()
+        token_sets = [title_tokens(tokens[title], spec_sets[spec]) for title, spec in combos]
+        return codes, self.hasher.signatures(token_sets)
+
+    def spec_signatures(self, df):
+        # (código por fila, firma por combinación distinta de specs)
+        specs = pd.MultiIndex.from_frame(df[list(SPEC_TOKENS)].fillna('').astype(str))
+        codes, values = specs.factorize()
+        token_sets = [sorted({f"{prefix}:{token}" for prefix, value in zip(SPEC_TOKENS.values(), row)
+                              for token in text_tokens(value)}) for row in values]
+        return codes, self.hasher.signatures(token_sets)
+
+    def candidates(self, blocks, codes, sigs):
+        # Pares (representante, miembro) de cada cubeta de LSH, sin repetir entre bandas
+        if not len(blocks):
+            return np.empty((0, 2), dtype=np.int64)
+        rows_per_band = sigs.shape[1] // self.bands
+        block_key = blocks.astype(np.uint64) * _MIX[0]
+        pairs = []
+        for band in range(self.bands):
+            # Clave de la banda por título distinto, luego por fila junto con su bloque
+            band_key = np.zeros(len(sigs), dtype=np.uint64)
+            for col in range(band * rows_per_band, (band + 1) * rows_per_band):
+                band_key = (band_key ^ sigs[:, col].astype(np.uint64)) * _MIX[1]
+            key = (block_key ^ band_key[codes]) * _MIX[1]
+            order = np.argsort(key, kind='stable')
+            sorted_key = key[order]
+            first = np.concatenate(([True], sorted_key[1:] != sorted_key[:-1]))
+            # Cada fila se compara sólo con la primera de su cubeta (cubetas de tamaño 1: ninguna comparación)
+            representative = order[np.flatnonzero(first)[np.cumsum(first) - 1]]
+            member = ~first
+            pairs.append(np.stack([representative[member], order[member]], axis=1))
+        pairs = np.concatenate(pairs)
+        # Mismo bloque comprobado explícitamente: la mezcla de la clave podría colisionar
+        pairs = pairs[blocks[pairs[:, 0]] == blocks[pairs[:, 1]]]
+        return np.unique(np.sort(pairs, axis=1), axis=0)
+
+    @staticmethod
+    def similarity(codes, sigs, pairs):
+        # Jaccard estimado: fracción de posiciones de la firma en las que coinciden
+        out = np.empty(len(pairs), dtype=np.float64)
+        for start in range(0, len(pairs), CHUNK):
+            chunk = codes[pairs[start:start + CHUNK]]
+            out[start:start + CHUNK] = (sigs[chunk[:, 0]] == sigs[chunk[:, 1]]).mean(axis=1)
+        return out
+
+    def resolve(self, df):
+        # df con Titulo (y Marca), url, store y las columnas de FIELDNAMES -> Series con el id de producto.
+        # Deja en self.stats cuántos pares se han comparado frente a los n² de comparar todo con todo
+        start = time.perf_counter()
+        n = len(df)
+        blocks = self.blocks(df)
+        title_codes, title_sigs = self.title_signatures(df)
+        spec_codes, spec_sigs = self.spec_signatures(df)
+        pairs = self.candidates(blocks, title_codes, title_sigs)
+        same = ((self.similarity(title_codes, title_sigs, pairs) >= self.title_threshold)
+                & (self.similarity(spec_codes, spec_sigs, pairs) >= self.spec_threshold))
+        matched = pairs[same]
+        graph = coo_matrix((np.ones(len(matched), dtype=np.int8), (matched[:, 0], matched[:, 1])), shape=(n, n))
+        _, labels = connected_components(graph, directed=False)
+
+        # Id estable: hash de la URL más pequeña del producto (no depende del orden de las filas)
+        url_codes, urls = pd.factorize(df['url'].astype(str), sort=True)
+        canonical = np.full(labels.max() + 1 if n else 0, n, dtype=np.int64)
+        np.minimum.at(canonical, labels, url_codes)
+        ids = np.array(['p' + hashlib.sha1(url.encode('utf-8')).hexdigest()[:12] for url in urls[canonical]], dtype=object)
+        product_id = pd.Series(ids[labels], index=df.index, name='product_id')
+
+        sizes = np.bincount(blocks) if n else np.zeros(0, dtype=np.int64)
+        stores = pd.Series(df['store'].to_numpy()).groupby(labels).nunique() if n else pd.Series(dtype=np.int64)
+        self.stats = {
+            'rows': n,
+            'blocks': int(len(sizes)),
+            'largest_block': int(sizes.max()) if n else 0,
+            'naive_pairs': n * (n - 1) // 2,
+            'block_pairs': int((sizes * (sizes - 1) // 2).sum()),
+            'compared': int(len(pairs)),
+            'matched': int(len(matched)),
+            'products': int(labels.max() + 1) if n else 0,
+            'cross_store_products': int((stores > 1).sum()),
+            'seconds': round(time.perf_counter() - start, 3),
+        }
+        return product_id
+
+
+def report(stats):
+    naive = stats['naive_pairs'] or 1
+    return (f"🔗 {stats['rows']} fichas -> {stats['products']} productos ({stats['cross_store_products']} en varias "
+            f"tiendas); {stats['compared']} pares comparados frente a {stats['naive_pairs']} de todos contra todos "
+            f"({stats['compared'] / naive:.2e}) y {stats['block_pairs']} dentro de los bloques; {stats['seconds']:.2f} s")
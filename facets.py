@@ -0,0 +1,60 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from offer_store import restore_precision
+from pagination import dumps
+
+# Desplegables de app.py: filtro de /search_offers -> columna del catálogo
+FACET_FILTERS = {
+    "ram": "RAM",
+    "ramType": "Tipo RAM",
+    "storage": "Almacenamiento",
+    "graphics": "Graficos",
+    "screen": "Pantalla",
+    "resolution": "Resolucion",
+    "os": "Sistema Operativo",
+    "battery": "Bateria",
+}
+
+
+def compute_facets(df):
+    # Valores distintos de cada columna en orden de aparición (como df[col].unique(), sin NaN)
+    # y cuántas ofertas tienen cada uno
+    columns = [col for col in FACET_FILTERS.values() if col in df]
+    df = restore_precision(df[columns])
+    facets = {}
+    for key, col in FACET_FILTERS.items():
+        if col not in df:
+            continue
+        codes, uniques = pd.factorize(df[col], use_na_sentinel=True)
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        facets[key] = {
+            "column": col,
+            "values": list(uniques.tolist()),
+            "counts": counts.tolist(),
+            "missing": int((codes < 0).sum()),
+        }
+    return facets
+
+
+class FacetCache:
+    # JSON de /facets ya serializado para la última versión del catálogo
+
+    def __init__(self):
+        self._version = None
+        self._body = None
+        self._lock = threading.Lock()
+
+    def get(self, snapshot):
+        # Devuelve (etag, cuerpo); sólo se calcula una vez por versión del catálogo
+        with self._lock:
+            if snapshot.version != self._version:
+                self._body = dumps({
+                    "version": snapshot.version,
+                    "total": len(snapshot),
+                    "facets": compute_facets(snapshot.df),
+                })
+                self._version = snapshot.version
+            return f'"{self._version}"', self._body
@@ -0,0 +1,259 @@
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+
+def _steps(transformer):
+    return [step for _, step in transformer.steps] if isinstance(transformer, Pipeline) else [transformer]
+
+
+class _NumericBlock:
+    # SimpleImputer + StandardScaler: mediana para los NaN y (x - media) / escala, en float64 como sklearn
+
+    def __init__(self, columns, start, steps):
+        self.columns = list(columns)
+        self.start = start
+        self.fill = None
+        self.mean = np.zeros(len(self.columns))
+        self.scale = np.ones(len(self.columns))
+        for step in steps:
+            if isinstance(step, SimpleImputer) and self.fill is None:
+                if not pd.isna(step.missing_values) or np.isnan(step.statistics_.astype(np.float64)).any():
+                    raise ValueError("Imputador numérico no soportado")
+                self.fill = step.statistics_.astype(np.float64)
+            elif isinstance(step, StandardScaler):
+                if step.with_mean:
+                    self.mean = step.mean_
+                if step.with_std:
+                    self.scale = step.scale_
+            else:
+                raise ValueError(f"Paso numérico no soportado: {type(step).__name__}")
+
+    def write(self, df, X):
+        values = df[self.columns].to_numpy(dtype=np.float64, na_value=np.nan)
+        if np.isinf(values).any():
+            # Igual que sklearn: el imputador rechaza los infinitos
+            raise ValueError("Hay valores infinitos en " + ', '.join(self.columns))
+        if self.fill is not None:
+            values = np.where(np.isnan(values), self.fill, values)
+        X[:, self.start:self.start + len(self.columns)] = (values - self.mean) / self.scale
+
+
+class _OneHotBlock:
+    # SimpleImputer (most_frequent) + OneHotEncoder: cada valor conocido -> columna de salida; desconocido -> ceros
+
+    def __init__(self, columns, start, steps):
+        self.columns = list(columns)
+        self.fill = [None] * len(self.columns)
+        self.categories = None
+        for step in steps:
+            if isinstance(step, SimpleImputer) and self.categories is None:
+                if not pd.isna(step.missing_values):
+                    raise ValueError("Imputador categórico no soportado")
+                self.fill = list(step.statistics_)
+            elif isinstance(step, OneHotEncoder):
+                if step.drop is not None or getattr(step, '_infrequent_enabled', False) or step.handle_unknown != 'ignore':
+                    raise ValueError("OneHotEncoder no soportado (drop, infrecuentes o handle_unknown='error')")
+                self.categories = step.categories_
+            else:
+                raise ValueError(f"Paso categórico no soportado: {type(step).__name__}")
+        if self.categories is None:
+            raise ValueError("Falta el OneHotEncoder")
+        # Índice valor -> posición de cada columna, con la tabla hash construida una sola vez
+        self.lookups = [pd.Index(categories) for categories in self.categories]
+        self.offsets = start + np.concatenate(([0], np.cumsum([len(c) for c in self.categories])))[:-1]
+
+    def write(self, df, X):
+        rows = np.arange(len(df))
+        for col, fill, lookup, offset in zip(self.columns, self.fill, self.lookups, self.offsets):
+            values = df[col].to_numpy(dtype=object)
+            if fill is not None:
+                values = np.where(pd.isna(values), fill, values)
+            codes = lookup.get_indexer(values)
+            known = codes >= 0
+            X[rows[known], offset + codes[known]] = 1.0
+
+
+def _leaf_ranges(tree):
+    # [inicio, fin) de las hojas (numeradas de izquierda a derecha) que cuelgan de cada nodo
+    left, right = tree.children_left, tree.children_right
+    start = np.zeros(tree.node_count, dtype=np.intp)
+    stop = np.zeros(tree.node_count, dtype=np.intp)
+    leaves = []
+    stack = [(0, False)]
+    while stack:
+        node, visited = stack.pop()
+        if left[node] == -1:
+            start[node] = len(leaves)
+            leaves.append(node)
+            stop[node] = len(leaves)
+        elif visited:
+            start[node] = start[left[node]]
+            stop[node] = stop[right[node]]
+        else:
+            stack += [(node, True), (right[node], False), (left[node], False)]
+    return start, stop, np.array(leaves, dtype=np.intp)
+
+
+def _words(bits, n_words):
+    return [(bits >> (64 * w)) & 0xFFFFFFFFFFFFFFFF for w in range(n_words)]
+
+
+def _complex(real, imag):
+    # real + imag·j sin multiplicar (1j * inf daría NaN en la parte real)
+    real, imag = np.broadcast_arrays(real, imag)
+    out = np.empty(real.shape, dtype=np.complex128)
+    out.real = real
+    out.imag = imag
+    return out
+
+
+class CompiledForest:
+    """RandomForest + ColumnTransformer de sklearn convertidos a arrays de NumPy.
+
+    El preprocesador se reduce a medianas, medias, escalas y una tabla valor ->
+    columna del one-hot. Cada árbol es una máscara de bits con sus hojas: cada
+    nodo cuya condición falla (x > umbral) apaga las hojas de su rama izquierda y
+    la hoja de salida es el primer bit que queda encendido (QuickScorer).
+    """
+
+    # Filas por bloque al recorrer el bosque (acota la memoria de las máscaras intermedias)
+    chunk_size = 1024
+
+    def __init__(self, model, preprocessor):
+        if not isinstance(model, (RandomForestClassifier, ExtraTreesClassifier)) or model.n_outputs_ != 1:
+            raise ValueError(f"Modelo no soportado: {type(model).__name__}")
+        if not isinstance(preprocessor, ColumnTransformer):
+            raise ValueError(f"Preprocesador no soportado: {type(preprocessor).__name__}")
+        self.classes_ = model.classes_
+        self.n_features = model.n_features_in_
+        self._compile_preprocessor(preprocessor)
+        self._compile_forest(model)
+
+    @classmethod
+    def load(cls, model_path, preprocessor_path):
+        return cls(joblib.load(model_path), joblib.load(preprocessor_path))
+
+    def _compile_preprocessor(self, preprocessor):
+        self.blocks = []
+        width = 0
+        for name, transformer, columns in preprocessor.transformers_:
+            if transformer == 'drop' or len(columns) == 0:
+                continue
+            steps = _steps(transformer)
+            start = preprocessor.output_indices_[name].start
+            if any(isinstance(step, OneHotEncoder) for step in steps):
+                block = _OneHotBlock(columns, start, steps)
+            else:
+                block = _NumericBlock(columns, start, steps)
+            self.blocks.append(block)
+            width = max(width, preprocessor.output_indices_[name].stop)
+        if width != self.n_features:
+            raise ValueError(f"El preprocesador da {width} columnas y el modelo espera {self.n_features}")
+
+    def _compile_forest(self, model):
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        n_trees = len(trees)
+        n_leaves = max(int((tree.children_left == -1).sum()) for tree in trees)
+        self.n_words = (n_leaves + 63) // 64
+        # Probabilidad de cada hoja (árbol, posición de izquierda a derecha), normalizada
+        # igual que DecisionTreeClassifier.predict_proba
+        self.leaf_values = np.zeros((n_trees, 64 * self.n_words, len(self.classes_)))
+        features, thresholds, tree_ids, masks = [], [], [], []
+        full = (1 << (64 * self.n_words)) - 1
+        for t, tree in enumerate(trees):
+            start, stop, leaves = _leaf_ranges(tree)
+            proba = tree.value[leaves, 0, :len(self.classes_)].astype(np.float64)
+            normalizer = proba.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            self.leaf_values[t, :len(leaves)] = proba / normalizer
+            for node in np.flatnonzero(tree.children_left != -1):
+                left = tree.children_left[node]
+                lo, hi = int(start[left]), int(stop[left])
+                features.append(tree.feature[node])
+                thresholds.append(tree.threshold[node])
+                tree_ids.append(t)
+                masks.append(_words(full ^ (((1 << (hi - lo)) - 1) << lo), self.n_words))
+        features = np.array(features, dtype=np.intp)
+        thresholds = np.array(thresholds, dtype=np.float64)
+        tree_ids = np.array(tree_ids, dtype=np.intp)
+        masks = np.array(masks, dtype=np.uint64).reshape(-1, self.n_words)
+
+        # Por feature, nodos ordenados por umbral precedidos de un centinela (-inf). La fila j de
+        # self.cumulative es el AND de las máscaras de los nodos de esa feature hasta j: si k umbrales
+        # quedan por debajo de x, basta una fila para apagar todo lo que apagan esos k nodos
+        keys, tables = [], []
+        self.sentinel = np.zeros(self.n_features, dtype=np.intp)
+        size = 0
+        for f in range(self.n_features):
+            nodes = np.flatnonzero(features == f)
+            nodes = nodes[np.argsort(thresholds[nodes], kind='stable')]
+            table = np.full((len(nodes) + 1, n_trees, self.n_words), np.iinfo(np.uint64).max, dtype=np.uint64)
+            table[np.arange(1, len(nodes) + 1), tree_ids[nodes]] = masks[nodes]
+            tables.append(np.bitwise_and.accumulate(table, axis=0))
+            keys.append(_complex(f, np.concatenate(([-np.inf], thresholds[nodes]))))
+            self.sentinel[f] = size
+            size += len(nodes) + 1
+        # Claves complejas (feature, umbral): numpy las ordena y busca en orden lexicográfico
+        self.keys = np.concatenate(keys)
+        self.cumulative = np.concatenate(tables)
+        self.zero_index = np.searchsorted(self.keys, _complex(np.arange(self.n_features), 0.0)) - 1
+        self.n_trees = n_trees
+
+    def transform(self, df):
+        # Matriz densa en float32, el mismo tipo al que sklearn convierte X antes de recorrer los árboles
+        X = np.zeros((len(df), self.n_features), dtype=np.float64)
+        for block in self.blocks:
+            block.write(df, X)
+        return X.astype(np.float32)
+
+    def _exit_leaves(self, X):
+        # Posición de la hoja de salida de cada fila en cada árbol: (filas, árboles)
+        n = len(X)
+        # Casi todo X es cero (one-hot): la posición del 0 en cada feature se busca una sola vez
+        idx = np.repeat(self.zero_index[np.newaxis, :], n, axis=0)
+        rows, cols = np.nonzero(X)
+        idx[rows, cols] = np.searchsorted(self.keys, _complex(cols, X[rows, cols])) - 1
+        # Sólo cuentan las features con algún umbral por debajo de x (en el one-hot, las columnas a 1)
+        rows, cols = np.nonzero(idx != self.sentinel)
+        masks = np.full((n, self.n_trees, self.n_words), np.iinfo(np.uint64).max, dtype=np.uint64)
+        entries = idx[rows, cols]
+        # Las entradas vienen por filas: la j-ésima de cada fila se aplica a la vez en todas las filas
+        counts = np.bincount(rows, minlength=n)
+        first = np.cumsum(counts) - counts
+        for j in range(counts.max(initial=0)):
+            has = np.flatnonzero(counts > j)
+            masks[has] &= self.cumulative[entries[first[has] + j]]
+        # Primer bit encendido: primera palabra distinta de cero y su bit más bajo
+        if self.n_words == 1:
+            word, value = 0, masks[..., 0]
+        else:
+            word = np.argmax(masks != 0, axis=2)
+            value = np.take_along_axis(masks, word[..., np.newaxis], axis=2)[..., 0]
+        lowest = value & (~value + np.uint64(1))
+        return word * 64 + np.frexp(lowest.astype(np.float64))[1] - 1
+
+    def predict_proba(self, df):
+        return self.proba(self.transform(df))
+
+    def proba(self, X):
+        # Probabilidades a partir de la matriz ya transformada
+        proba = np.empty((len(X), len(self.classes_)))
+        offsets = np.arange(self.n_trees)[:, np.newaxis] * self.leaf_values.shape[1]
+        for start in range(0, len(X), self.chunk_size):
+            leaves = offsets + self._exit_leaves(X[start:start + self.chunk_size]).T
+            for c in range(len(self.classes_)):
+                # Suma árbol a árbol, en el mismo orden que RandomForestClassifier (sum() reordena las sumas)
+                values = self.leaf_values[..., c].ravel()[leaves]
+                proba[start:start + self.chunk_size, c] = np.add.accumulate(values, axis=0)[-1]
+        return proba / self.n_trees
+
+    def predict(self, df):
+        proba = self.predict_proba(df)
+        pred = self.classes_[np.argmax(proba, axis=1)]
+        return pred.astype(np.int8), proba[:, 1]
@@ -0,0 +1,277 @@
+import bisect
+import hmac
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+# Límites (segundos) de los histogramas de latencia: de 0,1 ms a 10 s
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Nivel de log de los servidores: DEBUG (una línea por petición y etapa), INFO, WARNING, ERROR u OFF
+LOG_LEVEL = 'INFO'
+# Cada cuánto toma una muestra el perfilador (segundos)
+PROFILE_INTERVAL = 0.005
+# POST /profiler: sin CHOLLOS_PROFILER_TOKEN sólo se acepta desde la propia máquina;
+# con él, desde cualquier sitio pero con ese valor en la cabecera PROFILER_TOKEN_HEADER
+PROFILER_TOKEN_HEADER = 'X-Profiler-Token'
+LOCAL_CLIENTS = ('127.0.0.1', '::1')
+
+log = logging.getLogger('chollos')
+
+
+def setup_logging(level=None):
+    # Un único handler a stderr; CHOLLOS_LOG_LEVEL=OFF lo silencia todo
+    level = (level or os.environ.get('CHOLLOS_LOG_LEVEL') or LOG_LEVEL).upper()
+    if not log.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s [%(process)d] %(message)s'))
+        log.addHandler(handler)
+        log.propagate = False
+    log.disabled = level == 'OFF'
+    if not log.disabled:
+        log.setLevel(level)
+    return log
+
+
+def _labels(**labels):
+    return ','.join(f'{name}="{value}"' for name, value in labels.items())
+
+
+class Histogram:
+    # Histograma acumulativo al estilo Prometheus (buckets "le", suma y número de observaciones)
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name, **labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{_labels(**labels, le=bound)}}} {cumulative}'
+        yield f'{name}_sum{{{_labels(**labels)}}} {self.sum:.9g}'
+        yield f'{name}_count{{{_labels(**labels)}}} {self.count}'
+
+
+class StageTimer:
+    # Lo que ve el código dentro de `with stage(...)`: filas que entran y que salen de la etapa
+    __slots__ = ('rows_in', 'rows_out')
+
+    def __init__(self, rows_in=None, rows_out=None):
+        self.rows_in = rows_in
+        self.rows_out = rows_out
+
+
+class Metrics:
+    """Métricas del proceso: latencia por etapa y por endpoint, en formato Prometheus.
+
+    Cada etapa (carga del catálogo, filtros, transform, modelo, serialización...)
+    guarda un histograma de duración y el total de filas que entran y salen.
+    Cada proceso tiene su propio registro: con varios workers, cada uno
+    expone lo suyo en /metrics.
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._rows_in = Counter()
+        self._rows_out = Counter()
+        self._requests = {}
+        self._responses = Counter()
+
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        timer = StageTimer(rows_in)
+        start = time.perf_counter()
+        try:
+            yield timer
+        finally:
+            self.observe(name, time.perf_counter() - start, timer.rows_in, timer.rows_out)
+
+    def observe(self, name, seconds, rows_in=None, rows_out=None):
+        with self._lock:
+            histogram = self._stages.get(name)
+            if histogram is None:
+                histogram = self._stages[name] = Histogram(self.buckets)
+            histogram.observe(seconds)
+            if rows_in is not None:
+                self._rows_in[name] += rows_in
+            if rows_out is not None:
+                self._rows_out[name] += rows_out
+        log.debug("⏱️ %s: %.2f ms (%s -> %s filas)", name, seconds * 1000, rows_in, rows_out)
+
+    def observe_request(self, endpoint, status, seconds):
+        with self._lock:
+            histogram = self._requests.get(endpoint)
+            if histogram is None:
+                histogram = self._requests[endpoint] = Histogram(self.buckets)
+            histogram.observe(seconds)
+            self._responses[(endpoint, int(status))] += 1
+
+    def snapshot(self):
+        # Resumen por etapa (para benchmarks y depuración): llamadas, ms totales y filas
+        with self._lock:
+            return {name: {'count': h.count, 'total_ms': h.sum * 1000,
+                           'rows_in': self._rows_in.get(name), 'rows_out': self._rows_out.get(name)}
+                    for name, h in self._stages.items()}
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self._rows_in.clear()
+            self._rows_out.clear()
+            self._requests.clear()
+            self._responses.clear()
+
+    def render(self, gauges=None):
+        # Texto de exposición de Prometheus. gauges: {nombre: valor} que se añaden tal cual (cachés, etc.)
+        out = []
+        with self._lock:
+            out.append('# HELP chollos_stage_seconds Duración de cada etapa del backend')
+            out.append('# TYPE chollos_stage_seconds histogram')
+            for name in sorted(self._stages):
+                out.extend(self._stages[name].lines('chollos_stage_seconds', stage=name))
+            for metric, rows, help_text in (('chollos_stage_rows_in_total', self._rows_in, 'Filas que entran'),
+                                            ('chollos_stage_rows_out_total', self._rows_out, 'Filas que salen')):
+                out.append(f'# HELP {metric} {help_text} en cada etapa')
+                out.append(f'# TYPE {metric} counter')
+                out.extend(f'{metric}{{{_labels(stage=name)}}} {rows[name]}' for name in sorted(rows))
+            out.append('# HELP chollos_request_seconds Duración de cada petición por endpoint')
+            out.append('# TYPE chollos_request_seconds histogram')
+            for endpoint in sorted(self._requests):
+                out.extend(self._requests[endpoint].lines('chollos_request_seconds', endpoint=endpoint))
+            out.append('# HELP chollos_requests_total Peticiones por endpoint y código de respuesta')
+            out.append('# TYPE chollos_requests_total counter')
+            out.extend(f'chollos_requests_total{{{_labels(endpoint=endpoint, status=status)}}} {count}'
+                       for (endpoint, status), count in sorted(self._responses.items()))
+        for name, value in (gauges or {}).items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            out.append(f'# TYPE {name} gauge')
+            out.append(f'{name} {value}')
+        return '\n'.join(out) + '\n'
+
+
+class SamplingProfiler:
+    """Perfilador por muestreo que se enciende y apaga en caliente.
+
+    Un hilo mira cada `interval` segundos la pila de todos los demás hilos
+    (sys._current_frames) y cuenta cuántas veces aparece cada una. El
+    resultado va en formato "collapsed" (pila;separada;por;puntos_y_coma N),
+    el que leen flamegraph.pl y speedscope. Apagado no cuesta nada.
+    """
+
+    def __init__(self, interval=PROFILE_INTERVAL, max_depth=64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = 0
+        self._stacks = Counter()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval=None):
+        with self._lock:
+            if interval:
+                self.interval = float(interval)
+            if self.running:
+                return
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._run, args=(self._stop,), name='sampling-profiler',
+                                            daemon=True)
+            self._thread.start()
+        log.info("🔬 Perfilador activado (una muestra cada %.1f ms)", self.interval * 1000)
+
+    def stop(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+            self._stop.set()
+        if thread is not None:
+            thread.join()
+            log.info("🔬 Perfilador desactivado (%d muestras)", self.samples)
+
+    def reset(self):
+        with self._lock:
+            self._stacks.clear()
+            self.samples = 0
+
+    def _run(self, stop):
+        own = threading.get_ident()
+        while not stop.wait(self.interval):
+            frames = sys._current_frames()
+            stacks = []
+            for thread_id, frame in frames.items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stacks.append(';'.join(reversed(stack)))
+            del frames
+            with self._lock:
+                self._stacks.update(stacks)
+                self.samples += 1
+
+    def status(self):
+        return {'running': self.running, 'interval': self.interval, 'samples': self.samples,
+                'stacks': len(self._stacks)}
+
+    def collapsed(self):
+        with self._lock:
+            return ''.join(f'{stack} {count}\n' for stack, count in self._stacks.most_common())
+
+
+# Registro y perfilador del proceso (los usan offer_store, scoring, offer_search y los servidores)
+METRICS = Metrics()
+PROFILER = SamplingProfiler()
+stage = METRICS.stage
+
+
+def profiler_denied(client, token):
+    # (código HTTP, mensaje) si el cliente no puede encender o apagar el perfilador; None si puede
+    expected = os.environ.get('CHOLLOS_PROFILER_TOKEN')
+    if expected:
+        if token is None or not hmac.compare_digest(token.encode('utf-8'), expected.encode('utf-8')):
+            return 403, f"Falta la cabecera {PROFILER_TOKEN_HEADER} con el token del perfilador"
+        return None
+    if client not in LOCAL_CLIENTS:
+        return 403, "El perfilador sólo se puede cambiar desde la propia máquina (o con CHOLLOS_PROFILER_TOKEN)"
+    return None
+
+
+def configure_profiler(options):
+    # Cuerpo de POST /profiler: {"enabled": true|false, "interval": 0.005, "reset": true}.
+    # ValueError (400) si no es un objeto o el intervalo no es un número positivo; se valida antes de tocar nada
+    options = options or {}
+    if not isinstance(options, dict):
+        raise ValueError("El cuerpo tiene que ser un objeto JSON: {\"enabled\": true, \"interval\": 0.005}")
+    interval = options.get('interval')
+    if interval is not None and (isinstance(interval, bool) or not isinstance(interval, (int, float))
+                                 or not 0 < interval < float('inf')):
+        raise ValueError(f"'interval' tiene que ser un número de segundos mayor que 0: {interval!r}")
+    if options.get('reset'):
+        PROFILER.reset()
+    if 'enabled' in options:
+        if options['enabled']:
+            PROFILER.start(interval)
+        else:
+            PROFILER.stop()
+    return PROFILER.status()
@@ -0,0 +1,247 @@
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+# Columnas de la tabla de entrenamiento (specs_simplified*.csv), en orden
+FIELDNAMES = [
+    "Procesador",
+    "RAM",
+    "Tipo RAM",
+    "Almacenamiento",
+    "Graficos",
+    "Pantalla",
+    "Resolucion",
+    "Sistema Operativo",
+    "Bateria",
+    "Precio"
+]
+# La tabla exportada lleva además la URL de cada ficha: no es una variable del modelo, pero es la clave
+# del historial de precios (price_history.py) y llega con el etiquetado hasta el catálogo que se sirve
+URL_COLUMN = "URL"
+EXPORT_FIELDNAMES = FIELDNAMES + [URL_COLUMN]
+
+# Campos de la ficha que se usan: columna cruda -> (sección, clave)
+SPEC_FIELDS = {
+    "fabricante": ("Procesador", "Fabricante de procesador"),
+    "familia": ("Procesador", "Familia de procesador"),
+    "modelo": ("Procesador", "Modelo del procesador"),
+    "memoria": ("Memoria", "Memoria interna"),
+    "tipo_memoria": ("Memoria", "Tipo de memoria interna"),
+    "ssd": ("Medios de almacenaje", "Capacidad total de SSD"),
+    "sdd": ("Medios de almacenaje", "SDD, capacidad"),
+    "graficos": ("Gráficos", "Modelo de adaptador gráfico incorporado"),
+    "diagonal": ("Exhibición", "Diagonal de la pantalla"),
+    "resolucion": ("Exhibición", "Resolución de la pantalla"),
+    "sistema": ("Software", "Sistema operativo instalado"),
+    "bateria": ("Batería", "Capacidad de batería"),
+}
+
+# Tipo de CPU por fabricante, en el orden en que se comprueba
+CPU_TYPES = [("Intel", "Intel"), ("Apple", "Apple"), ("AMD", "AMD"), ("Qualcomm", "Qualcomm")]
+CPU_TYPE_DEFAULT = "Otro"
+# Generaciones Intel Core i3..i14 ("i7-" o "i7 "); Core Ultra cuenta como la más nueva
+CORE_GENERATIONS = range(3, 15)
+ULTRA_GENERATION = 15
+
+DEFAULT_RAM_TYPE = 4
+DEFAULT_SCREEN_SIZE = 15.6
+
+_TRADEMARKS = re.compile(r"[®™]")
+_FIRST_NUMBER = re.compile(r"(\d+)")
+_DDR = re.compile(r"(DDR\d+)", re.IGNORECASE)
+_INCHES = re.compile(r"\(([\d\.]+)\"")
+_TWO_NUMBERS = re.compile(r"(\d+)\D+(\d+)")
+# Lo que acepta int(): signo, dígitos con "_" entre ellos y espacios alrededor
+_INT = r"\s*([+-]?\d+(?:_\d+)*)\s*"
+_INT_ONLY = re.compile(rf"{_INT}\Z")
+_RESOLUTION = re.compile(rf"{_INT}x{_INT}\Z")
+_CORE_GENERATION = {i: re.compile(rf"i{i}[- ]") for i in CORE_GENERATIONS}
+
+
+def _by_value(values, fn, default):
+    # Aplica fn (vectorizada) sólo a los valores distintos de la columna y lo expande a todas las filas.
+    # Los valores que no son texto (NaN del CSV) reciben default, como en las funciones de chollo.py
+    values = pd.Series(values)
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    uniques = pd.Series(uniques, dtype=object)
+    is_text = uniques.map(type).eq(str).to_numpy()
+    mapped = pd.Series(default, index=uniques.index, dtype=object)
+    if is_text.any():
+        mapped[is_text] = fn(uniques[is_text])
+    lookup = np.append(mapped.to_numpy(), default)
+    return pd.Series(lookup[codes], index=values.index)
+
+
+def _first_number(col):
+    return col.str.extract(_FIRST_NUMBER, expand=False).fillna("")
+
+
+def _strip(col):
+    return col.str.strip()
+
+
+def _resolution(col):
+    # Los dos primeros números (ancho y alto): "1920 x 1080 Pixeles" -> "1920x1080"
+    numbers = col.str.extract(_TWO_NUMBERS)
+    return (numbers[0] + "x" + numbers[1]).fillna("")
+
+
+def _to_int(col, pattern, default):
+    # int() de cada valor que tenga el formato de pattern; default en el resto
+    out = pd.Series(default, index=col.index, dtype=object)
+    match = col.str.match(pattern)
+    out[match] = col[match].map(int)
+    return out
+
+
+# --- Fichas del scraper -> tabla de entrenamiento ---
+
+def raw_specs_frame(specs):
+    # Una columna por campo de la ficha ("" si falta), para normalizar columna a columna
+    specs = list(specs)
+    columns = {}
+    sections = {}
+    empty = {}
+    for name, (section, key) in SPEC_FIELDS.items():
+        if section not in sections:
+            sections[section] = [doc.get(section, empty) for doc in specs]
+        columns[name] = [values.get(key, "") for values in sections[section]]
+    columns["precio"] = [doc.get("Precio", "") for doc in specs]
+    return pd.DataFrame(columns, dtype=object)
+
+
+def _processor(raw):
+    # Se calcula sobre las CPUs distintas (fabricante, familia, modelo) y luego se expande
+    key = np.zeros(len(raw), dtype=np.int64)
+    levels = []
+    for col in ("fabricante", "familia", "modelo"):
+        codes, uniques = pd.factorize(raw[col], use_na_sentinel=False)
+        key = key * len(uniques) + codes
+        levels.append((codes, uniques))
+    _, first, codes = np.unique(key, return_index=True, return_inverse=True)
+    fabricante, familia, modelo = (pd.Series(uniques[level_codes[first]], dtype=object).str.strip()
+                                   for level_codes, uniques in levels)
+
+    familia = familia.str.replace(_TRADEMARKS, "", regex=True).str.strip()
+    # Si el fabricante no está incluido en la familia, se antepone
+    missing = [bool(fab) and fab not in fam for fab, fam in zip(fabricante, familia)]
+    familia = familia.mask(missing, (fabricante + " " + familia).str.strip())
+
+    # Si el modelo repite el último token de la familia seguido de guión, se une sin duplicarlo
+    last_token = familia.str.split().str[-1]
+    final = familia + "-" + modelo
+    for token in last_token.dropna().unique():
+        same = (last_token == token) & modelo.str.startswith(token + "-")
+        final[same] = familia[same] + modelo[same].str[len(token):]
+    # Sin fabricante ni familia no hay token: la versión fila a fila fallaba (IndexError); aquí queda vacío
+    final[last_token.isna()] = None
+    return pd.Series(final.to_numpy()[codes], index=raw.index)
+
+
+def normalize_specs(raw):
+    # Equivalente columna a columna de las antiguas funciones simplify_* de los notebooks
+    ram = _by_value(raw["memoria"], _first_number, "")
+    tipo_ram = _by_value(raw["tipo_memoria"],
+                         lambda col: col.str.extract(_DDR, expand=False).str.upper().fillna(""), "")
+    # Se prefiere "Capacidad total de SSD", pero si no existe se usa "SDD, capacidad"
+    almacenamiento = raw["ssd"].where(raw["ssd"] != "", raw["sdd"])
+    out = pd.DataFrame({
+        "Procesador": _processor(raw),
+        "RAM": ram,
+        "Tipo RAM": tipo_ram,
+        "Almacenamiento": _by_value(almacenamiento, _first_number, ""),
+        "Graficos": _by_value(raw["graficos"], _strip, ""),
+        "Pantalla": _by_value(raw["diagonal"], lambda col: col.str.extract(_INCHES, expand=False).fillna(""), ""),
+        "Resolucion": _by_value(raw["resolucion"], _resolution, ""),
+        "Sistema Operativo": _by_value(raw["sistema"], _strip, ""),
+        "Bateria": _by_value(raw["bateria"], _first_number, ""),
+        "Precio": raw["precio"],
+    }, index=raw.index)
+    return out[FIELDNAMES]
+
+
+def simplify_many(specs):
+    # Lista de fichas (dicts del scraper) -> DataFrame con las columnas de FIELDNAMES
+    return normalize_specs(raw_specs_frame(specs))
+
+
+# --- Columnas de la tabla de entrenamiento -> variables del modelo (chollo.py) ---
+
+def parse_price(precio):
+    # "1.299,00" -> 1299.0
+    return precio.str.replace('.', '').str.replace(',', '.').astype(float)
+
+
+def cpu_type(procesador):
+    # Como str(x) en chollo.py: los NaN se comparan como el texto "nan"
+    codes, uniques = pd.factorize(procesador, use_na_sentinel=False)
+    col = pd.Series(uniques, dtype=object).map(str)
+    types = np.select([col.str.contains(pattern, regex=False) for pattern, _ in CPU_TYPES],
+                      [name for _, name in CPU_TYPES], CPU_TYPE_DEFAULT)
+    return pd.Series(types[codes], index=procesador.index)
+
+
+def _apple_generation(col):
+    # "Apple M-M3 Pro" -> 3: segundo carácter del texto que sigue al primer guión
+    digit = col.str.split("-").str[1].str[1]
+    valid = digit.map(lambda c: isinstance(c, str) and unicodedata.decimal(c, None) is not None).astype(bool)
+    out = pd.Series(0, index=col.index, dtype=object)
+    out[valid] = digit[valid].map(int)
+    return out
+
+
+def _cpu_generations(col):
+    core = col.str.contains("Core i", regex=False)
+    gen = pd.Series(0, index=col.index, dtype=object)
+    # En orden inverso para que gane la generación más baja que aparezca, como el bucle original
+    for i in reversed(CORE_GENERATIONS):
+        gen = gen.mask(core & col.str.contains(_CORE_GENERATION[i]), i)
+    ultra = ~core & col.str.contains("Ultra", regex=False)
+    gen[ultra] = ULTRA_GENERATION
+    apple = ~core & ~ultra & col.str.contains("-M", regex=False)
+    if apple.any():
+        gen[apple] = _apple_generation(col[apple])
+    return gen
+
+
+def cpu_generation(procesador):
+    return _by_value(procesador, _cpu_generations, 0).astype(np.int64)
+
+
+def resolution_pixels(resolucion):
+    def pixels(col):
+        parts = col.str.extract(_RESOLUTION)
+        out = pd.Series(0, index=col.index, dtype=object)
+        valid = parts[0].notna()
+        out[valid] = parts.loc[valid, 0].map(int) * parts.loc[valid, 1].map(int)
+        return out
+    return _by_value(resolucion, pixels, 0).astype(np.int64)
+
+
+def ram_type_number(tipo_ram):
+    def numbers(col):
+        out = _to_int(col.str.replace("DDR", "", regex=False), _INT_ONLY, DEFAULT_RAM_TYPE)
+        return out.where(col.str.contains("DDR", regex=False), DEFAULT_RAM_TYPE)
+    return _by_value(tipo_ram, numbers, DEFAULT_RAM_TYPE).astype(np.int64)
+
+
+def screen_size(pantalla):
+    # Si pandas ya la ha leído como número no hay nada que convertir
+    if pd.api.types.is_numeric_dtype(pantalla.dtype):
+        return pantalla.astype(np.float64)
+
+    def to_float(value):
+        if isinstance(value, str):
+            try:
+                return float(value)
+            except ValueError:
+                return DEFAULT_SCREEN_SIZE
+        if isinstance(value, (int, float)):
+            return value
+        return DEFAULT_SCREEN_SIZE
+    # float() sobre cada valor distinto: hay pocos tamaños de pantalla
+    codes, uniques = pd.factorize(pantalla, use_na_sentinel=False)
+    lookup = np.array([to_float(v) for v in uniques], dtype=np.float64)
+    return pd.Series(lookup[codes], index=pantalla.index)
@@ -0,0 +1,147 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+API_URL = "http://localhost:5000"
+# Ofertas por página que se piden al backend
+PAGE_SIZE = 50
+# Espera antes de enviar una búsqueda: si llega otra antes, sólo se envía la última
+DEBOUNCE_SECONDS = 0.3
+TIMEOUT = 15
+# Portátiles parecidos que se piden a /similar
+SIMILAR_K = 8
+# Hilos que hacen las peticiones de la interfaz (búsquedas, páginas y similares a la vez)
+NETWORK_THREADS = 4
+
+
+class NetworkThreads:
+    """Hilos de red de app.py, cada uno con su propia sesión HTTP.
+
+    requests.Session no es thread-safe, así que no se comparte una entre las
+    búsquedas, las páginas y los similares: cada hilo del pool crea la suya
+    con session_factory la primera vez y la reutiliza (keep-alive) en las
+    peticiones siguientes. submit(fn, *args) ejecuta fn(session, *args) en
+    uno de esos hilos.
+    """
+
+    def __init__(self, session_factory, workers=NETWORK_THREADS):
+        self.session_factory = session_factory
+        self._local = threading.local()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='chollos-http')
+
+    def session(self):
+        # Sesión del hilo que llama (también vale fuera del pool, p. ej. en el hilo de la interfaz)
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = self.session_factory()
+        return session
+
+    def submit(self, fn, *args):
+        return self._pool.submit(lambda: fn(self.session(), *args))
+
+
+def fetch_similar(network, offer_id, catalog_version, on_result, on_error, k=SIMILAR_K, url=API_URL,
+                  timeout=TIMEOUT):
+    # GET /similar en un hilo de red para no bloquear la interfaz: on_result(respuesta) u on_error(mensaje).
+    # catalog_version es el de la búsqueda de la que salió offer_id (los id son posiciones en ese catálogo)
+    def run(session):
+        try:
+            response = session.get(f"{url}/similar", params={"id": offer_id, "version": catalog_version, "k": k},
+                                   timeout=timeout)
+            if response.status_code == 200:
+                on_result(response.json())
+            elif response.status_code == 409:
+                on_error("⚠️ El catálogo se ha actualizado desde la búsqueda: vuelve a buscar")
+            else:
+                on_error(f"❌ Error del servidor ({response.status_code})")
+        except Exception as e:
+            on_error(f"🚨 Error de conexión: {str(e)}")
+    return network.submit(run)
+
+
+class OfferPager:
+    """Búsqueda paginada de /search_offers en segundo plano para app.py.
+
+    search() no bloquea: la petición sale en un hilo de red (NetworkThreads)
+    tras DEBOUNCE_SECONDS.
+    Cada búsqueda nueva cancela la pendiente y deja obsoletas las que están en
+    vuelo (sus respuestas se descartan). load_more() pide la página siguiente
+    de la búsqueda actual. Los callbacks se llaman desde el hilo de la petición:
+    on_page(ofertas, offset, total) y on_error(mensaje); durante on_page,
+    catalog_version es la versión del catálogo de esas ofertas (para /similar).
+    """
+
+    def __init__(self, network, on_page, on_error, url=API_URL, page_size=PAGE_SIZE,
+                 debounce=DEBOUNCE_SECONDS, timeout=TIMEOUT):
+        self.network = network
+        self.on_page = on_page
+        self.on_error = on_error
+        self.url = url
+        self.page_size = page_size
+        self.debounce = debounce
+        self.timeout = timeout
+        self._lock = threading.RLock()
+        self._search_id = 0
+        self._timer = None
+        self.filters = None
+        self.loaded = 0
+        self.total = None
+        self.catalog_version = None
+        self.loading = False
+        self.sent = 0
+
+    @property
+    def exhausted(self):
+        return self.total is not None and self.loaded >= self.total
+
+    def search(self, filters):
+        with self._lock:
+            self._search_id += 1
+            if self._timer is not None:
+                self._timer.cancel()
+            self.filters = filters
+            self.loaded = 0
+            self.total = None
+            self.loading = True
+            # El temporizador sólo espera: la petición la hace un hilo de red
+            self._timer = threading.Timer(self.debounce, self.network.submit,
+                                          args=(self._fetch, self._search_id, filters, 0))
+            self._timer.daemon = True
+            self._timer.start()
+            return self._search_id
+
+    def load_more(self):
+        # Siguiente página, si no hay otra en camino y quedan ofertas
+        with self._lock:
+            if self.loading or self.total is None or self.exhausted:
+                return False
+            self.loading = True
+            args = (self._search_id, self.filters, self.loaded)
+        self.network.submit(self._fetch, *args)
+        return True
+
+    def _fetch(self, session, search_id, filters, offset):
+        if search_id != self._search_id:
+            return
+        self.sent += 1
+        error = None
+        try:
+            response = session.post(f"{self.url}/search_offers", json=filters, timeout=self.timeout,
+                                         params={"limit": self.page_size, "offset": offset})
+            if response.status_code == 200:
+                data = response.json()
+            else:
+                error = f"❌ Error del servidor ({response.status_code})"
+        except Exception as e:
+            error = f"🚨 Error de conexión: {str(e)}"
+        with self._lock:
+            # Mientras tanto el usuario ha hecho otra búsqueda: esta respuesta ya no vale
+            if search_id != self._search_id:
+                return
+            self.loading = False
+            if error is not None:
+                self.on_error(error)
+                return
+            self.loaded = offset + len(data["offers"])
+            self.total = data["total"]
+            self.catalog_version = data.get("catalog_version")
+            self.on_page(data["offers"], offset, self.total)
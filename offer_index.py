@@ -0,0 +1,200 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# Filtros de /search_offers -> columna del catálogo
+PROCESSOR_FILTER = ("processor", "Procesador")
+EQUALITY_FILTERS = {
+    "ramType": "Tipo RAM",
+    "graphics": "Graficos",
+    "screen": "Pantalla",
+    "resolution": "Resolucion",
+    "os": "Sistema Operativo",
+}
+RANGE_FILTERS = {
+    "ram": "RAM",
+    "storage": "Almacenamiento",
+    "battery": "Bateria",
+    "price": "Precio",
+}
+# Bajada mínima (%) frente a la mediana de 30 días; no es un índice del catálogo,
+# la aplica offer_search con el historial de precios (price_history.py)
+PRICE_DROP_FILTER = "priceDrop"
+
+NGRAM = 3
+# Por encima de esta fracción del catálogo es más barato un barrido vectorizado que ordenar filas
+DENSE_FRACTION = 1 / 16
+_REGEX_CHARS = re.compile(r"[.^$*+?{}\[\]\\|()]")
+
+
+def _ngrams(text):
+    return {text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+
+
+class PostingIndex:
+    # Índice de igualdad: para cada valor distinto, las filas que lo contienen (ordenadas)
+
+    def __init__(self, values):
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            codes = values.cat.codes.to_numpy()
+            uniques = values.cat.categories
+        else:
+            codes, uniques = pd.factorize(values, use_na_sentinel=True)
+        self.codes = codes.astype(np.int32)
+        self.uniques = list(uniques)
+        self.numeric = pd.api.types.is_numeric_dtype(values.dtype)
+        self.dtype = values.dtype if self.numeric else None
+        self._lookup = {value: code for code, value in enumerate(self.uniques)}
+        # Orden estable: dentro de cada valor las filas quedan en orden de catálogo
+        self._order = np.argsort(self.codes, kind="stable").astype(np.int64)
+        counts = np.bincount(self.codes + 1, minlength=len(self.uniques) + 1)
+        self._offsets = np.concatenate(([0], np.cumsum(counts)))
+
+    def code(self, value):
+        if self.numeric:
+            try:
+                value = self.dtype.type(value)
+            except (TypeError, ValueError):
+                return None
+        return self._lookup.get(value)
+
+    def postings(self, code):
+        if code is None:
+            return np.empty(0, dtype=np.int64)
+        return self._order[self._offsets[code + 1]:self._offsets[code + 2]]
+
+    def count(self, code):
+        if code is None:
+            return 0
+        return int(self._offsets[code + 2] - self._offsets[code + 1])
+
+
+class RangeIndex:
+    # Índice para filtros "<=": valores ordenados + posición original de cada uno
+
+    def __init__(self, values):
+        self.values = values.to_numpy()
+        order = np.argsort(self.values, kind="stable")
+        sorted_values = self.values[order]
+        # Los NaN quedan al final y nunca cumplen "<="
+        valid = int((~np.isnan(sorted_values)).sum())
+        self._order = order[:valid].astype(np.int64)
+        self._sorted = sorted_values[:valid]
+
+    def limit(self, value):
+        return self.values.dtype.type(float(value))
+
+    def count(self, limit):
+        return int(np.searchsorted(self._sorted, limit, side="right"))
+
+    def rows(self, limit):
+        count = self.count(limit)
+        if count > len(self.values) * DENSE_FRACTION:
+            return np.flatnonzero(self.values <= limit)
+        return np.sort(self._order[:count])
+
+
+class SubstringIndex:
+    # Índice de n-gramas sobre los procesadores distintos (no sobre las filas)
+
+    def __init__(self, postings):
+        self.postings = postings
+        self._lowered = [str(value).lower() for value in postings.uniques]
+        grams = {}
+        for code, text in enumerate(self._lowered):
+            for gram in _ngrams(text):
+                grams.setdefault(gram, []).append(code)
+        self._grams = {gram: np.array(codes, dtype=np.int32) for gram, codes in grams.items()}
+
+    def matching_codes(self, pattern):
+        # Misma semántica que str.contains(pattern, case=False): si hay metacaracteres es una regex
+        if _REGEX_CHARS.search(pattern):
+            regex = re.compile(pattern, re.IGNORECASE)
+            candidates = range(len(self._lowered))
+            return np.array([c for c in candidates if regex.search(str(self.postings.uniques[c]))], dtype=np.int32)
+        needle = pattern.lower()
+        if len(needle) < NGRAM:
+            candidates = range(len(self._lowered))
+        else:
+            candidates = None
+            for gram in _ngrams(needle):
+                codes = self._grams.get(gram)
+                if codes is None:
+                    return np.empty(0, dtype=np.int32)
+                candidates = codes if candidates is None else np.intersect1d(candidates, codes, assume_unique=True)
+        return np.array([c for c in candidates if needle in self._lowered[c]], dtype=np.int32)
+
+
+class OfferIndex:
+    """Índices secundarios del catálogo, construidos una vez por snapshot.
+
+    query() parte de la lista de filas más selectiva y comprueba el resto de
+    filtros sólo sobre esas filas candidatas, sin recorrer todo el catálogo.
+    """
+
+    def __init__(self, df):
+        self.size = len(df)
+        self.equality = {col: PostingIndex(df[col]) for col in EQUALITY_FILTERS.values() if col in df}
+        self.ranges = {col: RangeIndex(df[col]) for col in RANGE_FILTERS.values() if col in df}
+        self.processor = None
+        if PROCESSOR_FILTER[1] in df:
+            self.processor = SubstringIndex(PostingIndex(df[PROCESSOR_FILTER[1]]))
+
+    def _constraints(self, filters):
+        # Cada restricción: (nº estimado de filas, filas si es el punto de partida, máscara sobre candidatas)
+        constraints = []
+        key, col = PROCESSOR_FILTER
+        if filters.get(key) and self.processor is not None:
+            postings = self.processor.postings
+            codes = self.processor.matching_codes(filters[key])
+            allowed = np.zeros(len(postings.uniques) + 1, dtype=bool)
+            allowed[codes + 1] = True
+            count = sum(postings.count(c) for c in codes)
+            constraints.append((
+                count,
+                lambda codes=codes, allowed=allowed, postings=postings, count=count: self._union(postings, codes, allowed, count),
+                lambda rows, allowed=allowed, postings=postings: allowed[postings.codes[rows] + 1],
+            ))
+        for key, col in EQUALITY_FILTERS.items():
+            if filters.get(key) and col in self.equality:
+                index = self.equality[col]
+                code = index.code(filters[key])
+                constraints.append((
+                    index.count(code),
+                    lambda index=index, code=code: index.postings(code),
+                    lambda rows, index=index, code=code: index.codes[rows] == (-2 if code is None else code),
+                ))
+        for key, col in RANGE_FILTERS.items():
+            if filters.get(key) and col in self.ranges:
+                index = self.ranges[col]
+                limit = index.limit(filters[key])
+                constraints.append((
+                    index.count(limit),
+                    lambda index=index, limit=limit: index.rows(limit),
+                    lambda rows, index=index, limit=limit: index.values[rows] <= limit,
+                ))
+        return constraints
+
+    def _union(self, postings, codes, allowed, count):
+        if count > self.size * DENSE_FRACTION:
+            return np.flatnonzero(allowed[postings.codes + 1])
+        if len(codes) == 1:
+            return postings.postings(codes[0])
+        return np.sort(np.concatenate([postings.postings(c) for c in codes]))
+
+    def query(self, filters):
+        # Devuelve las posiciones (ordenadas) de las filas que cumplen todos los filtros
+        constraints = self._constraints(filters)
+        if not constraints:
+            return np.arange(self.size)
+        constraints.sort(key=lambda c: c[0])
+        count, rows_of, _ = constraints[0]
+        if count == 0:
+            return np.empty(0, dtype=np.int64)
+        rows = rows_of()
+        for _, _, keep in constraints[1:]:
+            rows = rows[keep(rows)]
+            if len(rows) == 0:
+                break
+        return rows
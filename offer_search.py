@@ -0,0 +1,71 @@
+import numpy as np
+
+from metrics import log, stage
+from offer_index import PRICE_DROP_FILTER
+from offer_store import iter_records
+
+
+class ScoringError(Exception):
+    # Fallo del modelo al puntuar las filas filtradas (el backend responde 500)
+    pass
+
+
+def search(snapshot, filters, page, lookup, price_drops=None):
+    # Filtros + IA + página de /search_offers. lookup(snapshot, rows) -> (predicciones, probabilidades);
+    # price_drops(snapshot) -> bajada de precio (%) de cada fila, o None si no hay historial.
+    # Devuelve (nº total de chollos, iterador de dicts de la página)
+
+    # 1. Filtros básicos con los índices del snapshot (nunca se modifica)
+    with stage('filter', len(snapshot)) as timer:
+        rows = snapshot.index.query(filters)
+        timer.rows_out = len(rows)
+
+    log.debug("📊 Datos después de filtros básicos: %d", len(rows))
+
+    # 1b. Bajada de precio frente a la mediana de 30 días del historial
+    if filters.get(PRICE_DROP_FILTER):
+        with stage('price_drop', len(rows)) as timer:
+            drops = price_drops(snapshot) if price_drops is not None else None
+            if drops is None:
+                log.warning("⚠️ Sin historial de precios o catálogo sin URL: ninguna oferta cumple priceDrop")
+                rows = rows[:0]
+            else:
+                rows = rows[drops[rows] >= float(filters[PRICE_DROP_FILTER])]
+            timer.rows_out = len(rows)
+        log.debug("📉 Ofertas con bajada de precio: %d", len(rows))
+
+    # 2. Aplicar IA si hay resultados
+    probabilidades = np.empty(0)
+    if len(rows):
+        try:
+            with stage('ai_filter', len(rows)) as timer:
+                # Predicciones precalculadas para esta versión del catálogo y del modelo
+                predicciones, probabilidades = lookup(snapshot, rows)
+
+                # Filtrar por IA
+                chollos = predicciones == 1
+                rows = rows[chollos]
+                probabilidades = np.round(probabilidades[chollos] * 100, 1)
+                timer.rows_out = len(rows)
+            log.debug("🎯 Ofertas después de IA: %d", len(rows))
+
+        except Exception as e:
+            log.error("❌ Error en IA: %s", e)
+            raise ScoringError(f"Error en IA: {str(e)}") from e
+
+    # 3. Página pedida: top-k con argpartition en vez de ordenar todas las ofertas
+    with stage('page', len(rows)) as timer:
+        sort_values = None
+        if page.sort == 'Probabilidad_IA':
+            sort_values = probabilidades
+        elif page.sort:
+            sort_values = snapshot.df[page.sort].to_numpy()[rows]
+        selected = page.select(len(rows), sort_values)
+        timer.rows_out = len(selected)
+    offers = iter_records(snapshot.df, rows[selected], {
+        # Posición de la oferta en esta versión del catálogo (la que se pasa a /similar)
+        "id": rows[selected],
+        "Prediccion_IA": np.ones(len(selected), dtype=np.int64),
+        "Probabilidad_IA": probabilidades[selected],
+    })
+    return len(rows), offers
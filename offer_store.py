@@ -0,0 +1,163 @@
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from catalog_artifact import CURRENT, read_artifact
+from metrics import log, stage
+from normalize import parse_price
+from offer_index import OfferIndex
+
+# Columnas del catálogo y su tipo en memoria
+NUMERIC_COLUMNS = ['RAM', 'Almacenamiento', 'Pantalla', 'Bateria', 'Precio', 'Probabilidad_Chollo']
+CATEGORICAL_COLUMNS = ['Procesador', 'Graficos', 'Sistema Operativo']
+
+# Decimales con los que se devuelven los float32 (el CSV nunca tiene más de 2)
+FLOAT_DECIMALS = 2
+# Filas por bloque al convertir el catálogo a dicts
+RECORD_CHUNK = 1000
+
+
+def _read_catalog(path):
+    # Directorio del artefacto Arrow (catalog_artifact.py): mapeado en memoria, sin parsear nada
+    if os.path.isdir(path):
+        return read_artifact(path)[0]
+    # Leer el CSV una sola vez con tipos compactos
+    dtypes = {col: np.float32 for col in NUMERIC_COLUMNS}
+    dtypes.update({col: 'category' for col in CATEGORICAL_COLUMNS})
+    header = pd.read_csv(path, nrows=0).columns
+    dtypes = {col: t for col, t in dtypes.items() if col in header}
+    try:
+        return pd.read_csv(path, dtype=dtypes)
+    except ValueError:
+        # Las tablas que salen del scraping traen el precio como texto ("1.299,00")
+        df = pd.read_csv(path, dtype=dict(dtypes, Precio=str))
+        df['Precio'] = parse_price(df['Precio']).astype(np.float32)
+        return df
+
+
+def restore_precision(df):
+    # Volver a float64 con los mismos valores que tenía el CSV (para el modelo y el JSON)
+    out = df.copy(deep=False)
+    for col in out.columns:
+        if out[col].dtype == np.float32:
+            out[col] = out[col].astype(np.float64).round(FLOAT_DECIMALS)
+    return out
+
+
+def _column_reader(values):
+    # Devuelve una función filas -> lista de valores de Python (NaN -> None), como to_records
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes = values.cat.codes.to_numpy()
+        categories = np.append(values.cat.categories.to_numpy(dtype=object), None)
+        return lambda rows: categories[codes[rows]].tolist()
+    array = values.to_numpy() if isinstance(values, pd.Series) else np.asarray(values)
+    if array.dtype == np.float32:
+        array = array.astype(np.float64).round(FLOAT_DECIMALS)
+
+    def read(rows):
+        chunk = array[rows]
+        out = chunk.tolist()
+        if chunk.dtype.kind in 'fO':
+            for i in np.flatnonzero(pd.isna(chunk)):
+                out[i] = None
+        return out
+    return read
+
+
+def iter_records(df, rows, extra=None, chunk_size=RECORD_CHUNK):
+    # Los mismos dicts que to_records(df.iloc[rows]) sin copiar el DataFrame: se leen los arrays
+    # de cada columna por bloques. extra: columnas añadidas, alineadas con rows
+    extra = extra or {}
+    names = list(df.columns) + list(extra)
+    readers = [_column_reader(df[col]) for col in df.columns]
+    extra_readers = [_column_reader(values) for values in extra.values()]
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        columns = [read(chunk) for read in readers]
+        columns += [read(slice(start, start + chunk_size)) for read in extra_readers]
+        for values in zip(*columns):
+            yield dict(zip(names, values))
+
+
+def to_records(df):
+    # Convertir un DataFrame del catálogo a lista de dicts serializable a JSON
+    return list(iter_records(df, np.arange(len(df))))
+
+
+class CatalogSnapshot:
+    # Versión inmutable del catálogo: nunca se modifica después de publicarse
+
+    def __init__(self, df, path, mtime_ns, size):
+        self.df = df
+        self.index = OfferIndex(df)
+        self.path = path
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.version = f"{mtime_ns:x}-{size:x}"
+        self.loaded_at = time.time()
+
+    def __len__(self):
+        return len(self.df)
+
+
+class OfferStore:
+    """Catálogo de ofertas compartido por todo el proceso.
+
+    Carga el CSV (o el artefacto Arrow publicado) una vez y lo vuelve a leer
+    sólo cuando cambia su mtime (en el artefacto, el de current.json).
+    La nueva versión se construye aparte y se publica con una única
+    asignación, así que las peticiones en curso siguen usando la anterior.
+    Los callbacks de on_load se ejecutan sobre el snapshot nuevo antes de
+    publicarlo (p. ej. para precalcular las predicciones).
+    """
+
+    def __init__(self, path, check_interval=1.0, on_load=()):
+        self.path = path
+        self.check_interval = check_interval
+        self.on_load = list(on_load)
+        self._snapshot = None
+        self._last_check = 0.0
+        self._reload_lock = threading.Lock()
+
+    def _stat(self):
+        st = os.stat(os.path.join(self.path, CURRENT) if os.path.isdir(self.path) else self.path)
+        return st.st_mtime_ns, st.st_size
+
+    def _load(self, mtime_ns, size):
+        with stage('catalog_load') as timer:
+            df = _read_catalog(self.path)
+            snapshot = CatalogSnapshot(df, self.path, mtime_ns, size)
+            timer.rows_out = len(df)
+        for callback in self.on_load:
+            callback(snapshot)
+        return snapshot
+
+    def reload(self, force=False):
+        # Sólo un hilo recarga; los demás devuelven la versión actual sin esperar
+        if not self._reload_lock.acquire(blocking=self._snapshot is None):
+            return self._snapshot
+        try:
+            self._last_check = time.monotonic()
+            mtime_ns, size = self._stat()
+            current = self._snapshot
+            if not force and current is not None and (current.mtime_ns, current.size) == (mtime_ns, size):
+                return current
+            self._snapshot = self._load(mtime_ns, size)
+            return self._snapshot
+        except Exception as e:
+            # Si el fichero está a medio escribir o desaparece, seguimos con la versión anterior
+            if self._snapshot is None:
+                raise
+            log.warning("⚠️ No se pudo recargar %s: %s", self.path, e)
+            return self._snapshot
+        finally:
+            self._reload_lock.release()
+
+    def snapshot(self):
+        current = self._snapshot
+        if current is None or time.monotonic() - self._last_check >= self.check_interval:
+            return self.reload()
+        return current
@@ -0,0 +1,119 @@
+import json
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # opcional: sin orjson se usa el json de la librería estándar
+    orjson = None
+
+# Columnas por las que se puede ordenar /search_offers (sort=Precio, sort=-Probabilidad_IA o sort=Precio:desc)
+SORT_KEYS = ['Precio', 'Probabilidad_IA', 'RAM', 'Almacenamiento', 'Pantalla', 'Bateria']
+FORMATS = ('json', 'ndjson')
+NDJSON_MIMETYPE = 'application/x-ndjson'
+# Ofertas por bloque al escribir el NDJSON
+STREAM_CHUNK = 1000
+
+
+def _non_negative_int(args, name):
+    value = args.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        value = int(value)
+    except ValueError:
+        raise ValueError(f"'{name}' tiene que ser un entero: {value}")
+    if value < 0:
+        raise ValueError(f"'{name}' no puede ser negativo: {value}")
+    return value
+
+
+def top_k(keys, k):
+    # Igual que np.argsort(keys, kind='stable')[:k] (NaN al final) pero sin ordenar todas las filas:
+    # se busca el k-ésimo valor en O(n) y sólo se ordenan las k posiciones que quedan por delante
+    n = len(keys)
+    if k >= n:
+        return np.argsort(keys, kind='stable')
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    kth = np.partition(keys, k - 1)[k - 1]
+    if np.isnan(kth):
+        before = np.flatnonzero(~np.isnan(keys))
+        ties = np.flatnonzero(np.isnan(keys))
+    else:
+        before = np.flatnonzero(keys < kth)
+        ties = np.flatnonzero(keys == kth)
+    # Los empates con el k-ésimo entran en orden de catálogo, como en un orden estable
+    chosen = np.concatenate((before, ties[:k - len(before)]))
+    return chosen[np.argsort(keys[chosen], kind='stable')]
+
+
+class PageRequest:
+    # Página pedida en la query string: limit, offset, sort y format
+
+    def __init__(self, limit=None, offset=0, sort=None, descending=False, format='json'):
+        self.limit = limit
+        self.offset = offset
+        self.sort = sort
+        self.descending = descending
+        self.format = format
+
+    @classmethod
+    def from_args(cls, args, accept=''):
+        sort = args.get('sort') or None
+        descending = False
+        if sort:
+            if sort.startswith('-'):
+                sort, descending = sort[1:], True
+            elif ':' in sort:
+                sort, direction = sort.rsplit(':', 1)
+                if direction not in ('asc', 'desc'):
+                    raise ValueError(f"Dirección de orden desconocida: {direction} (asc o desc)")
+                descending = direction == 'desc'
+            if sort not in SORT_KEYS:
+                raise ValueError(f"No se puede ordenar por {sort} (disponibles: {', '.join(SORT_KEYS)})")
+        fmt = args.get('format') or ('ndjson' if NDJSON_MIMETYPE in (accept or '') else 'json')
+        if fmt not in FORMATS:
+            raise ValueError(f"Formato desconocido: {fmt} (disponibles: {', '.join(FORMATS)})")
+        return cls(limit=_non_negative_int(args, 'limit'), offset=_non_negative_int(args, 'offset') or 0,
+                   sort=sort, descending=descending, format=fmt)
+
+    @property
+    def streaming(self):
+        return self.format == 'ndjson'
+
+    def select(self, n, sort_values=None):
+        # Posiciones (dentro de las n ofertas filtradas) que van en esta página, ya ordenadas
+        end = n if self.limit is None else min(n, self.offset + self.limit)
+        if self.offset >= end:
+            return np.empty(0, dtype=np.int64)
+        if self.sort is None:
+            return np.arange(self.offset, end)
+        keys = np.asarray(sort_values, dtype=np.float64)
+        if self.descending:
+            keys = -keys
+        return top_k(keys, end)[self.offset:]
+
+
+def dumps(obj):
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+
+def dumps_line(record):
+    if orjson is not None:
+        return orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+
+
+def ndjson_stream(records, chunk_size=STREAM_CHUNK):
+    # Una oferta por línea, enviadas por bloques: la respuesta nunca está entera en memoria
+    chunk = []
+    for record in records:
+        chunk.append(dumps_line(record))
+        if len(chunk) >= chunk_size:
+            yield b''.join(chunk)
+            chunk = []
+    if chunk:
+        yield b''.join(chunk)
@@ -0,0 +1,378 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import pandas as pd
+
+from catalog_artifact import ARTIFACT_DIR, CSV_PATH, publish as publish_artifact
+
+# Directorio de trabajo: checkpoints/<etapa>/<clave>/ con las salidas de cada etapa y runs/<id>.json por ejecución
+WORK_DIR = 'pipeline_runs'
+CHECKPOINTS = 'checkpoints'
+RUNS = 'runs'
+RESULT = 'result.json'
+# Checkpoints que se conservan por etapa: el último y alguno anterior por si se vuelve a unos datos viejos
+KEEP_CHECKPOINTS = 3
+SPECS_FILE = 'specs_simplified_all.csv'
+PRODUCTS_FILE = 'products.csv'
+# El backend lee el modelo de model/ y el notebook de predicciones de prediccions/
+MODEL_DIRS = ['model', 'prediccions']
+# model_chollo.json (con el model_hash de la pareja) va primero: hasta que llegan los dos .pkl que le
+# corresponden, ScoreCache sigue con el modelo anterior en vez de cargar un modelo con otro preprocesador
+MODEL_FILES = ['model_chollo.json', 'preprocessor.pkl', 'model_chollo.pkl']
+
+
+def _write_json(path, data):
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def _replace(src, dst):
+    # Copiar a un temporal junto al destino y renombrar: quien lea dst nunca ve un fichero a medias
+    os.makedirs(os.path.dirname(dst) or '.', exist_ok=True)
+    tmp = f"{dst}.tmp"
+    shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+
+
+def dir_hash(path):
+    # Hash del contenido de un directorio de salida (nombres + bytes), sin contar result.json
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            full = os.path.join(root, name)
+            if full == os.path.join(path, RESULT):
+                continue
+            digest.update(os.path.relpath(full, path).encode('utf-8') + b'\0')
+            with open(full, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+class Stage:
+    # Nodo del DAG: fn(params, salidas de las dependencias, directorio de salida) -> metadatos en JSON.
+    # state(params), si la etapa lee algo de fuera de sus dependencias (una base de datos): entra en la clave
+
+    def __init__(self, name, fn, deps=(), params=None, state=None):
+        self.name = name
+        self.fn = fn
+        self.deps = list(deps)
+        self.params = params or {}
+        self.state = state
+
+    def key(self, inputs):
+        # Clave del checkpoint: parámetros + hash de lo que produjeron las dependencias (+ estado externo)
+        data = {'stage': self.name, 'params': self.params, 'inputs': {dep: inputs[dep]['hash'] for dep in self.deps}}
+        if self.state is not None:
+            data['state'] = self.state(self.params)
+        return hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:16]
+
+
+class Pipeline:
+    """Ejecuta un DAG de etapas con checkpoints por hash de entrada.
+
+    Cada etapa escribe en un directorio propio cuya clave depende de sus
+    parámetros y de las salidas de sus dependencias: si no ha cambiado nada
+    se reutiliza el checkpoint sin ejecutarla. Las etapas independientes
+    corren en paralelo y una ejecución que falla se retoma relanzándola con el
+    mismo id: lo que ya terminó se salta y se sigue desde lo que faltaba.
+    """
+
+    def __init__(self, stages, work_dir=WORK_DIR, workers=4):
+        self.stages = {stage.name: stage for stage in stages}
+        self.work_dir = work_dir
+        self.workers = workers
+        for stage in stages:
+            unknown = [dep for dep in stage.deps if dep not in self.stages]
+            if unknown:
+                raise ValueError(f"La etapa {stage.name} depende de etapas que no existen: {', '.join(unknown)}")
+        self._check_acyclic()
+
+    def _check_acyclic(self):
+        done, visiting = set(), set()
+
+        def visit(name):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Ciclo en el pipeline en la etapa {name}")
+            visiting.add(name)
+            for dep in self.stages[name].deps:
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+
+        for name in self.stages:
+            visit(name)
+
+    def run_path(self, run_id):
+        return os.path.join(self.work_dir, RUNS, f"{run_id}.json")
+
+    def latest_run(self):
+        # Registro de la última ejecución (los ids empiezan por la fecha, así que se ordenan por nombre)
+        directory = os.path.join(self.work_dir, RUNS)
+        runs = sorted(name for name in os.listdir(directory) if name.endswith('.json')) if os.path.isdir(directory) else []
+        if not runs:
+            return None
+        with open(os.path.join(directory, runs[-1]), encoding='utf-8') as f:
+            return json.load(f)
+
+    def run(self, run_id):
+        # Devuelve el registro de la ejecución: estado, y por etapa clave, si se ejecutó o se saltó y cuánto tardó
+        os.makedirs(os.path.join(self.work_dir, RUNS), exist_ok=True)
+        path = self.run_path(run_id)
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                record = json.load(f)
+        else:
+            record = {'run': run_id, 'started_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'), 'attempts': 0, 'stages': {}}
+        record['attempts'] += 1
+        record['status'] = 'running'
+        _write_json(path, record)
+
+        start = time.perf_counter()
+        results, failed = {}, []
+        pending, running = dict(self.stages), {}
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while pending or running:
+                # Tras un fallo no se lanza nada nuevo, pero se deja terminar (y guardar) lo que ya está en marcha
+                for name, stage in list(pending.items()):
+                    if not failed and all(dep in results for dep in stage.deps):
+                        del pending[name]
+                        running[pool.submit(self._run_stage, stage, {dep: results[dep] for dep in stage.deps})] = name
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    try:
+                        results[name], info = future.result()
+                    except Exception as e:
+                        traceback.print_exc()
+                        print(f"❌ {name}: {type(e).__name__}: {e}")
+                        failed.append(name)
+                        info = {'status': 'failed', 'error': f"{type(e).__name__}: {e}"}
+                    record['stages'][name] = info
+                    _write_json(path, record)
+        record['status'] = 'failed' if failed else 'done'
+        record['seconds'] = round(time.perf_counter() - start, 3)
+        record['finished_at'] = time.strftime('%Y-%m-%dT%H:%M:%S%z')
+        record['pending'] = sorted(pending)
+        _write_json(path, record)
+        return record
+
+    def _run_stage(self, stage, inputs):
+        key = stage.key(inputs)
+        directory = os.path.join(self.work_dir, CHECKPOINTS, stage.name)
+        final = os.path.join(directory, key)
+        if os.path.exists(os.path.join(final, RESULT)):
+            with open(os.path.join(final, RESULT), encoding='utf-8') as f:
+                result = json.load(f)
+            # Usado ahora: cuenta como reciente al podar
+            os.utime(final)
+            print(f"⏭️ {stage.name}: sin cambios, checkpoint {key}")
+            return dict(result, dir=final), {'status': 'skipped', 'key': key, 'seconds': 0.0}
+
+        os.makedirs(directory, exist_ok=True)
+        tmp = tempfile.mkdtemp(prefix='.tmp-', dir=directory)
+        print(f"▶️ {stage.name} ({key})")
+        started = time.perf_counter()
+        try:
+            result = dict(stage.fn(stage.params, inputs, tmp) or {})
+            result['hash'] = dir_hash(tmp)
+            _write_json(os.path.join(tmp, RESULT), result)
+            # El checkpoint aparece entero o no aparece
+            os.replace(tmp, final)
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        seconds = time.perf_counter() - started
+        print(f"✅ {stage.name}: {seconds:.2f} s")
+        self._prune(directory, keep=final)
+        return dict(result, dir=final), {'status': 'done', 'key': key, 'seconds': round(seconds, 3)}
+
+    def _prune(self, directory, keep):
+        entries = [entry for entry in os.scandir(directory)
+                   if entry.is_dir() and entry.path != keep and os.path.exists(os.path.join(entry.path, RESULT))]
+        entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+        for entry in entries[KEEP_CHECKPOINTS - 1:]:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+
+# Etapas: scrape (una por tienda) -> normalize -> label -> train -> publish
+
+def _collection(store, params):
+    from webscrapping.storage import open_collection
+    return open_collection(store, **({'path': params['db_path']} if params.get('db_path') else {}))
+
+
+def save_specs(params, specs, out_dir):
+    # Fichas nuevas o cambiadas de un rastreo: a la base de la tienda (de donde sale la tabla de normalize)
+    # y a specs.json (lo que ha traído esta ejecución)
+    if specs:
+        collection = _collection(params['store'], params)
+        collection.bulk_upsert(specs)
+        collection.close()
+    with open(os.path.join(out_dir, 'specs.json'), 'w', encoding='utf-8') as f:
+        json.dump(specs, f, ensure_ascii=False)
+
+
+def scrape(params, inputs, out_dir):
+    from webscrapping.crawler import crawl_store
+    specs, stats = asyncio.run(crawl_store(params['store'], pages=params['pages'], cache_dir=params['cache_dir'],
+                                           parse_workers=params['parse_workers'], history_dir=params['history_dir']))
+    save_specs(params, specs, out_dir)
+    return {'store': params['store'], 'specs': len(specs), 'crawl': stats.as_dict()}
+
+
+def specs_state(params):
+    # Lo que lee normalize de la base: si no cambia (y los rastreos tampoco), se reutiliza su checkpoint
+    collection = _collection(params['stores'][0], params)
+    try:
+        return collection.content_hash(all_stores=True)
+    finally:
+        collection.close()
+
+
+def normalize(params, inputs, out_dir):
+    # Exporta la tabla de entrenamiento de todas las tiendas de la base (las etapas scrape ya han guardado
+    # sus fichas en ella) y asigna a cada ficha su id de producto entre tiendas (products.csv)
+    from entity_resolution import EntityResolver, report
+    if not inputs:
+        raise ValueError("normalize necesita al menos una etapa scrape (ninguna tienda que rastrear)")
+    collection = _collection(params['stores'][0], params)
+    rows = collection.export_training_table(os.path.join(out_dir, SPECS_FILE), all_stores=True)
+    products = collection.product_table(all_stores=True)
+    collection.close()
+    resolver = EntityResolver()
+    products['product_id'] = resolver.resolve(products)
+    products[['store', 'url', 'product_id']].to_csv(os.path.join(out_dir, PRODUCTS_FILE), index=False)
+    print(report(resolver.stats))
+    return {'rows': rows, 'entity_resolution': resolver.stats}
+
+
+def copy_input(params, inputs, out_dir):
+    # --input: la tabla de entrenamiento ya exportada sustituye a scrape + normalize
+    shutil.copyfile(params['path'], os.path.join(out_dir, SPECS_FILE))
+    return {'rows': int(len(pd.read_csv(params['path'])))}
+
+
+def label(params, inputs, out_dir):
+    from chollos.chollo import train as label_offers
+    (source,) = inputs.values()
+    model_hash = label_offers(os.path.join(source['dir'], SPECS_FILE), os.path.join(out_dir, 'chollos.csv'),
+                              os.path.join(out_dir, 'feature_importance.csv'), artifact_dir=None)
+    return {'model_hash': model_hash}
+
+
+def train(params, inputs, out_dir):
+    import train_model
+    options = {'storage': params['storage']} if params['storage'] else {}
+    # Un estudio de Optuna por tabla etiquetada: si el entrenamiento se corta, al retomarlo sigue el mismo estudio
+    metadata = train_model.train(os.path.join(inputs['label']['dir'], 'chollos.csv'), out_dir, params['trials'],
+                                 params['jobs'], study_name=f"{train_model.STUDY_NAME}-{inputs['label']['hash']}",
+                                 seed=params['seed'], **options)
+    return {key: metadata[key] for key in ('model_hash', 'cv_accuracy', 'test_accuracy', 'params', 'trials')}
+
+
+def publish(params, inputs, out_dir):
+    # Primero el modelo y al final el catálogo: al ver la versión nueva, el backend ya puntúa con el modelo nuevo
+    for target in params['model_dirs']:
+        for name in MODEL_FILES:
+            _replace(os.path.join(inputs['train']['dir'], name), os.path.join(target, name))
+    catalog = os.path.join(inputs['label']['dir'], 'chollos.csv')
+    _replace(catalog, params['catalog_csv'])
+    artifact = publish_artifact(pd.read_csv(catalog), params['artifact_dir'], inputs['label']['model_hash'],
+                                source=catalog)
+    published = {'artifact': artifact, 'model_hash': inputs['train']['model_hash'], 'model_dirs': params['model_dirs']}
+    _write_json(os.path.join(out_dir, 'published.json'), published)
+    print(f"📦 Catálogo publicado en {artifact} y modelo en {', '.join(params['model_dirs'])}")
+    return published
+
+
+def build_stages(run_id, stores=(), input_csv=None, pages=None, cache_dir=None, parse_workers=0, history_dir=None,
+                 trials=50, jobs=None, seed=42, storage=None, model_dirs=MODEL_DIRS, artifact_dir=ARTIFACT_DIR,
+                 catalog_csv=CSV_PATH, publish_catalog=True, db_path=None):
+    if input_csv:
+        from scoring import file_hash
+        stages = [Stage('input', copy_input, params={'path': os.path.abspath(input_csv), 'hash': file_hash(input_csv)})]
+        source = 'input'
+    else:
+        if not stores:
+            raise ValueError("No hay tiendas que rastrear: indica --stores o una tabla ya exportada con --input")
+        # Rastrear depende de la web, no de un fichero: se repite una vez por ejecución (run en los parámetros)
+        stages = [Stage(f'scrape:{store}', scrape, params={'store': store, 'run': run_id, 'pages': pages,
+                                                          'cache_dir': cache_dir, 'parse_workers': parse_workers,
+                                                          'history_dir': history_dir, 'db_path': db_path})
+                  for store in stores]
+        stages.append(Stage('normalize', normalize, [stage.name for stage in stages],
+                            {'stores': list(stores), 'db_path': db_path}, state=specs_state))
+        source = 'normalize'
+    stages.append(Stage('label', label, [source]))
+    stages.append(Stage('train', train, ['label'], {'trials': trials, 'jobs': jobs, 'seed': seed, 'storage': storage}))
+    if publish_catalog:
+        stages.append(Stage('publish', publish, ['label', 'train'],
+                            {'run': run_id, 'model_dirs': list(model_dirs), 'artifact_dir': artifact_dir,
+                             'catalog_csv': catalog_csv}))
+    return stages
+
+
+def print_summary(record):
+    print(f"\n⏱️ Ejecución {record['run']} ({record['status']}, intento {record['attempts']}): {record['seconds']:.1f} s")
+    for name, info in record['stages'].items():
+        detail = info.get('error') or f"{info['seconds']:.2f} s" + (' (checkpoint)' if info['status'] == 'skipped' else '')
+        print(f"  {name:<24} {info['status']:<8} {detail}")
+    for name in record['pending']:
+        print(f"  {name:<24} pendiente")
+
+
+def main():
+    from webscrapping.crawler import STORES
+    parser = argparse.ArgumentParser(description="Pipeline completo: scrape -> normalize -> label -> train -> publish")
+    parser.add_argument('--stores', default=','.join(sorted(STORES)), help="tiendas a rastrear, separadas por comas")
+    parser.add_argument('--input', default=None, help=f"usar un {SPECS_FILE} ya exportado en vez de rastrear")
+    parser.add_argument('--pages', type=int, default=None)
+    parser.add_argument('--cache-dir', default=None, help="caché de páginas del crawler (rastreo incremental)")
+    parser.add_argument('--parse-workers', type=int, default=os.cpu_count())
+    parser.add_argument('--history-dir', default=None, help="historial de precios al que añadir cada rastreo")
+    parser.add_argument('--db', default=None, help="base SQLite de las fichas (por defecto webscrapping/specs.db)")
+    parser.add_argument('--trials', type=int, default=50)
+    parser.add_argument('--jobs', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--storage', default=None, help="almacenamiento de Optuna (por defecto el de train_model.py)")
+    parser.add_argument('--no-publish', action='store_true', help="entrenar sin publicar el catálogo ni el modelo")
+    parser.add_argument('--work-dir', default=WORK_DIR)
+    parser.add_argument('--workers', type=int, default=4, help="etapas en paralelo como máximo")
+    parser.add_argument('--new-run', action='store_true', help="no retomar la última ejecución aunque fallara")
+    args = parser.parse_args()
+
+    run_id = time.strftime('%Y%m%d-%H%M%S')
+    if not args.new_run:
+        last = Pipeline([], args.work_dir).latest_run()
+        if last is not None and last['status'] != 'done':
+            run_id = last['run']
+            print(f"🔁 Retomando la ejecución {run_id} (terminó como '{last['status']}')")
+    stores = [store for store in args.stores.split(',') if store]
+    stages = build_stages(run_id, stores, args.input, args.pages, args.cache_dir, args.parse_workers, args.history_dir,
+                          args.trials, args.jobs, args.seed, args.storage, publish_catalog=not args.no_publish,
+                          db_path=args.db)
+    record = Pipeline(stages, args.work_dir, args.workers).run(run_id)
+    print_summary(record)
+    print(f"📝 Registro en {Pipeline([], args.work_dir).run_path(run_id)}")
+    return 0 if record['status'] == 'done' else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,63 @@
+import argparse
+import sys
+import time
+from functools import partial
+
+import joblib
+
+from batch_scoring import BATCH_CHUNK, INPUT_FORMATS, format_for_path, predict_chunks, read_offers
+from pagination import dumps_line
+from scoring import compile_model, predict
+
+
+def run(input_path, output_path=None, fmt=None, chunk_size=BATCH_CHUNK,
+        model_path='model/model_chollo.pkl', preprocessor_path='model/preprocessor.pkl'):
+    # Puntúa un fichero de ofertas por bloques y escribe una predicción por fila. Devuelve nº de filas
+    fmt = fmt or format_for_path(input_path)
+    model, preprocessor = joblib.load(model_path), joblib.load(preprocessor_path)
+    predict_fn = partial(predict, model, preprocessor, compiled=compile_model(model, preprocessor))
+    as_csv = output_path is not None and output_path.lower().endswith('.csv')
+    source = sys.stdin if input_path == '-' else open(input_path, encoding='utf-8', newline='' if fmt == 'csv' else None)
+    target = sys.stdout.buffer if output_path is None else open(output_path, 'wb')
+    rows = 0
+    try:
+        for pred, prob in predict_chunks(read_offers(source, fmt, chunk_size), predict_fn):
+            if as_csv:
+                lines = [f"{p == 1},{q!r}\n" for p, q in zip(pred.tolist(), prob.tolist())]
+                if rows == 0:
+                    lines.insert(0, 'es_chollo,probabilidad\n')
+                target.write(''.join(lines).encode('utf-8'))
+            else:
+                target.write(b''.join(dumps_line({'es_chollo': p == 1, 'probabilidad': q})
+                                      for p, q in zip(pred.tolist(), prob.tolist())))
+            rows += len(pred)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output_path is not None:
+            target.close()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="¿Es chollo? para muchas ofertas a la vez (JSON, CSV o NDJSON)")
+    parser.add_argument('input', help="fichero de ofertas (.json, .csv, .ndjson) o - para la entrada estándar")
+    parser.add_argument('--format', choices=INPUT_FORMATS, default=None,
+                        help="formato de entrada (por defecto, según la extensión)")
+    parser.add_argument('--out', default=None, help="fichero de salida .ndjson o .csv (por defecto, NDJSON por stdout)")
+    parser.add_argument('--chunk-size', type=int, default=BATCH_CHUNK)
+    parser.add_argument('--model', default='model/model_chollo.pkl')
+    parser.add_argument('--preprocessor', default='model/preprocessor.pkl')
+    args = parser.parse_args()
+
+    if args.input == '-' and args.format is None:
+        parser.error("con la entrada estándar hay que indicar --format")
+    start = time.perf_counter()
+    rows = run(args.input, args.out, args.format, args.chunk_size, args.model, args.preprocessor)
+    elapsed = time.perf_counter() - start
+    print(f"{rows} ofertas puntuadas en {elapsed:.1f} s ({rows / elapsed if elapsed else 0:.0f} filas/s)",
+          file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
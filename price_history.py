@@ -0,0 +1,246 @@
+import fcntl
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from normalize import URL_COLUMN
+
+HISTORY_DIR = 'price_history'
+# Ventana de la mediana con la que se compara el último precio
+WINDOW_DAYS = 30
+AGGREGATES = 'aggregates.parquet'
+# Cerrojo de fichero junto a los agregados: cada tienda se rastrea en su propio proceso
+# (las etapas scrape del pipeline van en paralelo) y todas reescriben la misma tabla
+LOCK_FILE = 'aggregates.lock'
+SCHEMA = pa.schema([
+    ('url', pa.string()),
+    ('store', pa.string()),
+    ('crawled_at', pa.timestamp('s', tz='UTC')),
+    ('price', pa.float64()),
+])
+
+
+def _prices(values):
+    # "1.299,00" -> 1299.0 como normalize.parse_price, pero lo que no es un precio queda NaN
+    text = pd.Series(values, dtype=object).astype(str).str.replace('.', '', regex=False)
+    return pd.to_numeric(text.str.replace(',', '.', regex=False), errors='coerce').to_numpy(dtype=np.float64)
+
+
+def _atomic_write(table, path):
+    tmp = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    pq.write_table(table, tmp)
+    os.replace(tmp, path)
+
+
+class PriceHistory:
+    """Historial de precios: una fila por URL y rastreo, en Parquet particionado por día.
+
+    append() sólo añade un fichero (nunca reescribe los anteriores) y actualiza
+    la tabla de agregados por producto (último precio, mínimo, mediana de los
+    últimos WINDOW_DAYS días) leyendo sólo las particiones de la ventana y las
+    URLs de ese rastreo. Las consultas de bajadas de precio van sobre esa tabla.
+    Los rastreos de cada tienda se añaden en orden cronológico; varias
+    tiendas (o procesos) pueden añadir a la vez: la tabla se actualiza bajo
+    un cerrojo de fichero.
+    """
+
+    def __init__(self, directory=HISTORY_DIR, window_days=WINDOW_DAYS):
+        self.directory = directory
+        self.window = timedelta(days=window_days)
+        self._lock = threading.Lock()
+        self._aggregates = None
+        self._aggregates_stat = None
+
+    @property
+    def aggregates_path(self):
+        return os.path.join(self.directory, AGGREGATES)
+
+    @contextmanager
+    def _locked(self):
+        # Cerrojo del hilo (flock es por descriptor, no por hilo) y del fichero (entre procesos)
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock, open(os.path.join(self.directory, LOCK_FILE), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _partition(self, day):
+        return os.path.join(self.directory, f"day={day:%Y-%m-%d}")
+
+    def _stat(self):
+        try:
+            st = os.stat(self.aggregates_path)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    @property
+    def version(self):
+        stat = self._stat()
+        return None if stat is None else f"{stat[0]:x}-{stat[1]:x}"
+
+    def aggregates(self):
+        # Tabla por URL (índice): store, first_seen, last_seen, last_price, min_price, median_price, n_window
+        stat = self._stat()
+        if stat is None:
+            return None
+        if stat != self._aggregates_stat:
+            self._aggregates = pq.read_table(self.aggregates_path).to_pandas().set_index('url')
+            self._aggregates_stat = stat
+        return self._aggregates
+
+    def files(self, start=None, end=None):
+        # Ficheros de las particiones que caen en [start, end] (poda por día, sin abrir los demás)
+        if not os.path.isdir(self.directory):
+            return []
+        paths = []
+        for entry in sorted(os.scandir(self.directory), key=lambda e: e.name):
+            if not entry.is_dir() or not entry.name.startswith('day='):
+                continue
+            day = datetime.strptime(entry.name[4:], '%Y-%m-%d').date()
+            if (start is not None and day < start.date()) or (end is not None and day > end.date()):
+                continue
+            paths.extend(os.path.join(entry.path, f) for f in sorted(os.listdir(entry.path)) if f.endswith('.parquet'))
+        return paths
+
+    def read(self, start=None, end=None, urls=None):
+        # Filas del historial entre start y end (ambos incluidos), opcionalmente sólo de unas URLs
+        files = self.files(start, end)
+        if not files:
+            return SCHEMA.empty_table().to_pandas()
+        condition = None
+        for part in ((pc.field('crawled_at') >= pa.scalar(start, SCHEMA.field('crawled_at').type)) if start else None,
+                     (pc.field('crawled_at') <= pa.scalar(end, SCHEMA.field('crawled_at').type)) if end else None,
+                     pc.field('url').isin(pa.array(urls, pa.string())) if urls is not None else None):
+            if part is not None:
+                condition = part if condition is None else condition & part
+        return ds.dataset(files, schema=SCHEMA, format='parquet').to_table(filter=condition).to_pandas()
+
+    def append(self, urls, prices, crawled_at=None, store=''):
+        # Añade un rastreo (una fila por URL; si se repite, vale la última) y actualiza los agregados
+        crawled_at = (crawled_at or datetime.now(timezone.utc)).astimezone(timezone.utc).replace(microsecond=0)
+        batch = pd.DataFrame({'url': pd.Series(urls, dtype=object), 'price': np.asarray(prices, dtype=np.float64)})
+        batch = batch[batch['url'].notna() & (batch['url'] != '') & batch['price'].notna()]
+        batch = batch.drop_duplicates('url', keep='last')
+        if batch.empty:
+            return 0
+        with self._locked():
+            # Se vuelve a leer dentro del cerrojo: otro proceso puede haber reescrito la tabla
+            current = self.aggregates()
+            if current is not None and len(current):
+                last = current.loc[current['store'] == store, 'last_seen'].max()
+                if pd.notna(last) and crawled_at < last:
+                    raise ValueError(f"El historial sólo admite rastreos en orden cronológico ({crawled_at} es "
+                                     f"anterior al último de la tienda '{store}', {last})")
+            table = pa.table({
+                'url': pa.array(batch['url'], pa.string()),
+                'store': pa.array([store] * len(batch), pa.string()),
+                'crawled_at': pa.array([crawled_at] * len(batch), SCHEMA.field('crawled_at').type),
+                'price': pa.array(batch['price'], pa.float64()),
+            }, schema=SCHEMA)
+            directory = self._partition(crawled_at)
+            os.makedirs(directory, exist_ok=True)
+            _atomic_write(table, os.path.join(directory, f"{crawled_at:%H%M%S}-{uuid.uuid4().hex[:8]}.parquet"))
+            self._update_aggregates(batch, store, crawled_at, current)
+        return len(batch)
+
+    def _update_aggregates(self, batch, store, crawled_at, current):
+        # Sólo se recalculan las URLs del rastreo, con las filas de su ventana
+        urls = batch['url'].tolist()
+        window = self.read(crawled_at - self.window, crawled_at, urls)
+        stats = window.groupby('url')['price'].agg(['median', 'count'])
+        updated = pd.DataFrame({
+            'store': store,
+            'first_seen': crawled_at,
+            'last_seen': crawled_at,
+            'last_price': batch['price'].to_numpy(),
+            'min_price': batch['price'].to_numpy(),
+        }, index=pd.Index(urls, name='url'))
+        updated['first_seen'] = updated['first_seen'].astype('datetime64[s, UTC]')
+        updated['last_seen'] = updated['last_seen'].astype('datetime64[s, UTC]')
+        updated['median_price'] = stats['median'].reindex(updated.index).to_numpy()
+        updated['n_window'] = stats['count'].reindex(updated.index).fillna(0).astype(np.int64).to_numpy()
+        if current is not None and len(current):
+            known = current.reindex(updated.index)
+            seen = known['first_seen'].notna().to_numpy()
+            updated.loc[seen, 'first_seen'] = known.loc[seen, 'first_seen']
+            updated['min_price'] = np.fmin(updated['min_price'].to_numpy(), known['min_price'].to_numpy())
+            current = current[~current.index.isin(updated.index)]
+            updated = pd.concat([current, updated])
+        table = pa.Table.from_pandas(updated.reset_index(), preserve_index=False)
+        _atomic_write(table, self.aggregates_path)
+
+    def record_crawl(self, store, specs, unchanged_urls=(), crawled_at=None):
+        # Rastreo del crawler: fichas nuevas o cambiadas (con su precio) + URLs que no han cambiado,
+        # que repiten el último precio conocido
+        urls = [doc.get('URL') for doc in specs]
+        prices = list(_prices([doc.get('Precio', '') for doc in specs]))
+        unchanged_urls = list(unchanged_urls)
+        current = self.aggregates()
+        if unchanged_urls and current is not None:
+            urls += unchanged_urls
+            prices += current['last_price'].reindex(unchanged_urls).tolist()
+        return self.append(urls, prices, crawled_at, store)
+
+    def price_drops(self, min_drop_pct=0.0, since=None):
+        # Productos cuyo último precio está al menos min_drop_pct % por debajo de su mediana de la ventana.
+        # since: sólo los vistos desde esa fecha (p. ej. el último rastreo)
+        aggregates = self.aggregates()
+        if aggregates is None:
+            return pd.DataFrame(columns=['last_price', 'median_price', 'drop_pct'])
+        drop = self.drop_pct(aggregates)
+        keep = drop >= min_drop_pct
+        if since is not None:
+            keep &= (aggregates['last_seen'] >= since).to_numpy()
+        result = aggregates.loc[keep, ['store', 'last_seen', 'last_price', 'median_price', 'min_price']]
+        result = result.assign(drop_pct=drop[keep])
+        return result.sort_values('drop_pct', ascending=False, kind='stable')
+
+    @staticmethod
+    def drop_pct(aggregates):
+        median = aggregates['median_price'].to_numpy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return (median - aggregates['last_price'].to_numpy()) / median * 100
+
+
+class PriceDropLookup:
+    # Bajada de precio (%) de cada fila del catálogo, por versión del catálogo y del historial.
+    # El catálogo necesita la columna URL (la exporta storage.py y la conservan chollo.py y el artefacto);
+    # sin ella (o sin historial) devuelve None
+
+    def __init__(self, history, url_column=URL_COLUMN):
+        self.history = history
+        self.url_column = url_column
+        self._key = None
+        self._drops = None
+        self._lock = threading.Lock()
+
+    @property
+    def version(self):
+        return self.history.version
+
+    def __call__(self, snapshot):
+        if self.url_column not in snapshot.df:
+            return None
+        key = (snapshot.version, self.history.version)
+        with self._lock:
+            if key != self._key:
+                aggregates = self.history.aggregates()
+                drops = None
+                if aggregates is not None:
+                    drop = pd.Series(PriceHistory.drop_pct(aggregates), index=aggregates.index)
+                    urls = np.asarray(snapshot.df[self.url_column], dtype=object)
+                    drops = drop.reindex(urls).to_numpy(dtype=np.float64)
+                self._key, self._drops = key, drops
+            return self._drops
@@ -0,0 +1,171 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from offer_index import _REGEX_CHARS, EQUALITY_FILTERS, PRICE_DROP_FILTER, PROCESSOR_FILTER, RANGE_FILTERS
+
+# Memoria máxima de las respuestas guardadas (MB) y segundos que vale cada una.
+# CHOLLOS_CACHE_MB / CHOLLOS_CACHE_TTL los cambian (serve.py los fija con --cache-mb / --cache-ttl)
+CACHE_MB = 64
+CACHE_TTL = 300.0
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def canonical_filters(filters):
+    # Dos filtros que devuelven lo mismo dan la misma clave: sin filtros vacíos ni claves que
+    # OfferIndex no usa, claves ordenadas y límites numéricos como float ("8", 8 y 8.0)
+    canonical = {}
+    for key, value in filters.items():
+        if not value:
+            continue
+        if key == PROCESSOR_FILTER[0]:
+            # Sin metacaracteres se busca en minúsculas; una regex se deja tal cual (\D no es \d)
+            if isinstance(value, str) and not _REGEX_CHARS.search(value):
+                value = value.lower()
+        elif key in RANGE_FILTERS or key == PRICE_DROP_FILTER:
+            value = _number(value)
+        elif key in EQUALITY_FILTERS:
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                value = float(value)
+        else:
+            continue
+        canonical[key] = value
+    return json.dumps(canonical, sort_keys=True, ensure_ascii=False, default=str)
+
+
+def etag_matches(header, etag):
+    # If-None-Match: "*" o una lista de ETags, débiles (W/"...") o no
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(',')]
+    return '*' in tags or any(tag.removeprefix('W/') == etag for tag in tags)
+
+
+class CachedQuery:
+    # Resultado de ResultCache.lookup() para una petición
+
+    def __init__(self, cache, generation, key, etag, body=None, not_modified=False):
+        self.cache = cache
+        self.generation = generation
+        self.key = key
+        self.etag = etag
+        self.body = body
+        self.not_modified = not_modified
+
+    @property
+    def headers(self):
+        if self.key is None:
+            return {}
+        return {"ETag": self.etag, "X-Cache": "HIT" if self.body is not None else "MISS"}
+
+    def store(self, body):
+        if self.key is not None:
+            self.cache.put(self.generation, self.key, body)
+
+
+class ResultCache:
+    """Respuestas JSON de /search_offers ya serializadas, por filtros canónicos + página.
+
+    Las entradas son de una generación (versión del catálogo + hash del modelo):
+    cuando cambia, la caché se vacía entera. LRU con límite de memoria y
+    caducidad. El ETag sólo depende de la generación y de la consulta, así que
+    un If-None-Match se contesta con 304 sin buscar nada.
+    """
+
+    def __init__(self, max_bytes=None, ttl=None):
+        if max_bytes is None:
+            max_bytes = int(float(os.environ.get('CHOLLOS_CACHE_MB', CACHE_MB)) * 2 ** 20)
+        if ttl is None:
+            ttl = float(os.environ.get('CHOLLOS_CACHE_TTL', CACHE_TTL))
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._generation = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+        self.expired = 0
+        self.invalidations = 0
+
+    def _use_generation(self, generation):
+        # Catálogo o modelo nuevos: nada de lo guardado sirve
+        if generation != self._generation:
+            if self._generation is not None:
+                self.invalidations += 1
+            self._entries.clear()
+            self._bytes = 0
+            self._generation = generation
+
+    def _remove(self, key):
+        _, body = self._entries.pop(key)
+        self._bytes -= len(key) + len(body)
+
+    def lookup(self, generation, filters, page, if_none_match=None):
+        if not isinstance(filters, dict):
+            # Sin filtros válidos no hay clave: la petición sigue su camino (y su error) normal
+            return CachedQuery(self, generation, None, None)
+        key = f"{canonical_filters(filters)}|{page.limit}|{page.offset}|{page.sort}|{page.descending}|{page.format}"
+        etag = '"' + hashlib.sha1(f"{generation}|{key}".encode('utf-8')).hexdigest()[:20] + '"'
+        with self._lock:
+            self._use_generation(generation)
+            if etag_matches(if_none_match, etag):
+                self.not_modified += 1
+                return CachedQuery(self, generation, key, etag, not_modified=True)
+            if page.streaming:
+                # El NDJSON no se guarda (puede ser el catálogo entero), pero sí lleva ETag
+                return CachedQuery(self, generation, key, etag)
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                self._remove(key)
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return CachedQuery(self, generation, key, etag)
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return CachedQuery(self, generation, key, etag, body=entry[1])
+
+    def put(self, generation, key, body):
+        size = len(key) + len(body)
+        with self._lock:
+            # Una respuesta calculada con la generación anterior ya no vale
+            if generation != self._generation or size > self.max_bytes:
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, body)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "not_modified": self.not_modified,
+                "evictions": self.evictions,
+                "expired": self.expired,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "generation": self._generation,
+            }
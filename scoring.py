@@ -0,0 +1,245 @@
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from fast_model import CompiledForest
+from metrics import log, stage
+from offer_store import restore_precision
+
+# Columnas que usa el preprocesador: si no cambian, la predicción tampoco
+FEATURE_COLUMNS = ['Procesador', 'RAM', 'Tipo RAM', 'Almacenamiento', 'Graficos',
+                   'Pantalla', 'Resolucion', 'Sistema Operativo', 'Bateria', 'Precio']
+NUMERIC_FEATURES = ['RAM', 'Almacenamiento', 'Pantalla', 'Bateria', 'Precio']
+# Al arrancar, lo que se espera a que termine una publicación del modelo a medias
+PUBLISH_WAIT = 5.0
+
+
+def file_hash(*paths):
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def info_path(model_path):
+    # model/model_chollo.pkl -> model/model_chollo.json (metadatos que escribe train_model.py)
+    return os.path.splitext(model_path)[0] + '.json'
+
+
+class ModelMismatch(Exception):
+    # Los .pkl no coinciden con el model_hash de model_chollo.json: hay una publicación a medias
+    pass
+
+
+def row_hashes(df):
+    # Hash por fila de las columnas de entrada del modelo
+    cols = [c for c in FEATURE_COLUMNS if c in df]
+    return pd.util.hash_pandas_object(df[cols], index=False).to_numpy()
+
+
+def compile_model(model, preprocessor):
+    # Bosque compilado a arrays (mismas probabilidades que sklearn) o None si no se puede compilar
+    try:
+        return CompiledForest(model, preprocessor)
+    except ValueError as e:
+        log.warning("⚠️ Se usará sklearn para predecir: %s", e)
+        return None
+
+
+def predict(model, preprocessor, df, compiled=None):
+    # Una sola pasada por el bosque: predict() es el argmax de predict_proba()
+    with stage('transform', len(df)) as timer:
+        df = restore_precision(df)
+        X = compiled.transform(df) if compiled is not None else preprocessor.transform(df)
+        timer.rows_out = X.shape[0]
+    with stage('score', X.shape[0]) as timer:
+        proba = compiled.proba(X) if compiled is not None else model.predict_proba(X)
+        pred = (compiled or model).classes_[np.argmax(proba, axis=1)]
+        timer.rows_out = len(pred)
+    return pred.astype(np.int8), proba[:, 1]
+
+
+class CatalogScores:
+    # Predicciones de un catálogo concreto con un modelo concreto, model_hash (NaN = aún sin puntuar)
+
+    def __init__(self, size, model_hash):
+        self.pred = np.zeros(size, dtype=np.int8)
+        self.prob = np.full(size, np.nan)
+        self.model_hash = model_hash
+
+    def missing(self, rows):
+        return rows[np.isnan(self.prob[rows])]
+
+
+class PinnedScores:
+    # lookup(snapshot, rows) con un modelo fijo: una petición entera puntúa (y se guarda en caché) con el mismo
+
+    def __init__(self, cache, bundle):
+        self.cache = cache
+        self.bundle = bundle
+
+    @property
+    def model_hash(self):
+        return self.bundle[2]
+
+    def __call__(self, snapshot, rows):
+        return self.cache.lookup(snapshot, rows, self.bundle)
+
+
+class ScoreCache:
+    """Predicciones del modelo precalculadas por versión de catálogo + hash del modelo.
+
+    refresh() puntúa el catálogo completo al cargarlo, reutilizando las filas que
+    ya se habían puntuado en la versión anterior. lookup() sólo indexa arrays;
+    las filas que todavía no tienen predicción se puntúan en el momento.
+    """
+
+    def __init__(self, model_path, preprocessor_path, check_interval=1.0):
+        self.model_path = model_path
+        self.preprocessor_path = preprocessor_path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        # Se guardan las dos últimas versiones: la nueva y la que aún usan peticiones en curso
+        self._entries = OrderedDict()
+        self._memo = None
+        self._memo_model = None
+        self._last_check = 0.0
+        deadline = time.monotonic() + PUBLISH_WAIT
+        while True:
+            try:
+                self._load_model()
+                break
+            except ModelMismatch:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.1)
+
+    def _model_stat(self):
+        return tuple(os.stat(p).st_mtime_ns for p in (self.model_path, self.preprocessor_path))
+
+    def _published_hash(self, stat):
+        # model_hash de model_chollo.json si se está publicando una pareja nueva, None si no hay nada que comprobar.
+        # Quien publica escribe el .json antes que los .pkl: si es más nuevo que alguno de ellos, falta por llegar
+        # algún .pkl; si es más viejo que los dos, los .pkl se han cambiado sin él (p. ej. desde el notebook)
+        path = info_path(self.model_path)
+        try:
+            with open(path, encoding='utf-8') as f:
+                expected = json.load(f).get('model_hash')
+            written = os.stat(path).st_mtime_ns
+        except (OSError, ValueError):
+            return None
+        return expected if written > min(stat) else None
+
+    def _load_model(self):
+        stat = self._model_stat()
+        # Se leen los bytes una sola vez: el hash es el de lo que se carga, no el de lo que haya después en disco
+        data = []
+        for path in (self.model_path, self.preprocessor_path):
+            with open(path, 'rb') as f:
+                data.append(f.read())
+        model_hash = hashlib.sha256(b''.join(data)).hexdigest()[:16]
+        expected = self._published_hash(stat)
+        if expected is not None and expected != model_hash:
+            raise ModelMismatch(f"Los .pkl ({model_hash}) no coinciden con {info_path(self.model_path)} ({expected})")
+        model = joblib.load(io.BytesIO(data[0]))
+        preprocessor = joblib.load(io.BytesIO(data[1]))
+        # Se publica todo junto para no mezclar un modelo con el preprocesador de otro
+        self._bundle = (model, preprocessor, model_hash, compile_model(model, preprocessor))
+        self._stat = stat
+
+    @property
+    def model_hash(self):
+        return self._bundle[2]
+
+    @property
+    def compiled(self):
+        return self._bundle[3]
+
+    def _check_model(self):
+        # Recargar el modelo si alguien ha publicado otro .pkl
+        if time.monotonic() - self._last_check < self.check_interval:
+            return
+        self._last_check = time.monotonic()
+        try:
+            if self._model_stat() != self._stat:
+                self._load_model()
+        except ModelMismatch as e:
+            # Se sigue con el modelo anterior y se vuelve a mirar en la próxima comprobación
+            log.debug("⏳ %s", e)
+        except Exception as e:
+            log.warning("⚠️ No se pudo recargar el modelo: %s", e)
+
+    def predict(self, df, bundle=None):
+        model, preprocessor, _, compiled = bundle or self._bundle
+        return predict(model, preprocessor, df, compiled)
+
+    def _store(self, key, scores):
+        with self._lock:
+            self._entries[key] = scores
+            self._entries.move_to_end(key)
+            while len(self._entries) > 2:
+                self._entries.popitem(last=False)
+
+    def refresh(self, snapshot):
+        # Puntuar todo el catálogo, reaprovechando filas idénticas ya puntuadas con este modelo.
+        # Devuelve las CatalogScores completas; su model_hash es el del modelo que las ha calculado
+        self._check_model()
+        bundle = self._bundle
+        done = self._entries.get((snapshot.version, bundle[2]))
+        if done is not None and not np.isnan(done.prob).any():
+            return done
+        scores = CatalogScores(len(snapshot), bundle[2])
+        hashes = row_hashes(snapshot.df)
+        memo = self._memo
+        if memo is not None and self._memo_model == bundle[2]:
+            known = memo.reindex(hashes)
+            hit = known['prob'].notna().to_numpy()
+            scores.prob[hit] = known['prob'].to_numpy()[hit]
+            scores.pred[hit] = known['pred'].to_numpy()[hit]
+        self._fill(snapshot, scores, np.flatnonzero(np.isnan(scores.prob)), bundle)
+        memo = pd.DataFrame({'pred': scores.pred, 'prob': scores.prob}, index=hashes)
+        self._memo = memo[~memo.index.duplicated()]
+        self._memo_model = bundle[2]
+        self._store((snapshot.version, bundle[2]), scores)
+        return scores
+
+    def _fill(self, snapshot, scores, rows, bundle=None):
+        if len(rows):
+            pred, prob = self.predict(snapshot.df.iloc[rows], bundle)
+            scores.pred[rows] = pred
+            scores.prob[rows] = prob
+
+    def pinned(self):
+        # Recarga el modelo si toca y lo fija para una petición (PinnedScores)
+        self._check_model()
+        return PinnedScores(self, self._bundle)
+
+    def lookup(self, snapshot, rows, bundle=None):
+        # Devuelve (predicción, probabilidad) para las filas pedidas del snapshot, con bundle si se pasa
+        # (PinnedScores) o con el modelo actual
+        if bundle is None:
+            self._check_model()
+            bundle = self._bundle
+        key = (snapshot.version, bundle[2])
+        scores = self._entries.get(key)
+        if scores is None:
+            # Catálogo o modelo nuevos que aún no se han puntuado enteros:
+            # se puntúa en segundo plano y mientras tanto sólo lo que se pide
+            with self._lock:
+                scores = self._entries.get(key)
+                if scores is None:
+                    scores = CatalogScores(len(snapshot), bundle[2])
+                    self._entries[key] = scores
+                    threading.Thread(target=self.refresh, args=(snapshot,), daemon=True).start()
+        self._fill(snapshot, scores, scores.missing(rows), bundle)
+        return scores.pred[rows], scores.prob[rows]
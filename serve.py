@@ -0,0 +1,40 @@
+import argparse
+import os
+
+import uvicorn
+
+from catalog_artifact import catalog_path
+from metrics import log, setup_logging
+from offer_store import OfferStore
+from result_cache import CACHE_MB, CACHE_TTL
+from scoring import ScoreCache
+from shared_catalog import CatalogPublisher, shared_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API de chollos en producción: FastAPI con varios workers")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--catalog', default=catalog_path(), help="chollos.csv o el directorio del artefacto Arrow")
+    parser.add_argument('--cache-mb', type=float, default=float(os.environ.get('CHOLLOS_CACHE_MB', CACHE_MB)), help="memoria de la caché de respuestas por worker")
+    parser.add_argument('--cache-ttl', type=float, default=float(os.environ.get('CHOLLOS_CACHE_TTL', CACHE_TTL)), help="segundos que vale una respuesta en caché")
+    parser.add_argument('--shared-dir', default=shared_dir(), help="dónde se publica el catálogo (mejor en /dev/shm)")
+    args = parser.parse_args()
+    setup_logging()
+
+    # Este proceso lee el CSV, lo puntúa y lo publica; los workers sólo mapean lo publicado
+    os.environ['CHOLLOS_SHARED_DIR'] = args.shared_dir
+    os.environ['CHOLLOS_CACHE_MB'] = str(args.cache_mb)
+    os.environ['CHOLLOS_CACHE_TTL'] = str(args.cache_ttl)
+    scores = ScoreCache('model/model_chollo.pkl', 'model/preprocessor.pkl')
+    publisher = CatalogPublisher(OfferStore(args.catalog, on_load=[scores.refresh]), scores, args.shared_dir)
+    publisher.refresh()
+    # Vuelve a publicar cuando cambian el catálogo o los .pkl
+    publisher.watch()
+    log.info("🚀 %d workers en http://%s:%d", args.workers, args.host, args.port)
+    uvicorn.run('asgi:app', host=args.host, port=args.port, workers=args.workers, log_level='warning')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from metrics import log, stage
+from offer_index import OfferIndex
+
+# Catálogo publicado para los workers: en /dev/shm (memoria compartida) si existe.
+# CHOLLOS_SHARED_DIR lo cambia (serve.py lo fija antes de arrancar los workers)
+SHARED_DIR = os.path.join('/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(), 'chollos')
+CURRENT = 'current.json'
+MANIFEST = 'manifest.json'
+# Versiones que se conservan: la nueva y la que aún tienen abierta los workers que no han recargado
+KEEP_VERSIONS = 2
+
+
+def _write_array(directory, name, array):
+    np.save(os.path.join(directory, name), np.ascontiguousarray(array))
+    return name
+
+
+def _write_json(path, data):
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def shared_dir():
+    return os.environ.get('CHOLLOS_SHARED_DIR') or SHARED_DIR
+
+
+def _write_current(directory, name):
+    # current.json lleva también el pid de quien publica: si ya no existe, el catálogo es de una ejecución anterior
+    _write_json(os.path.join(directory, CURRENT), {'version': name, 'publisher': os.getpid()})
+
+
+def has_publisher(directory=None):
+    # Hay un catálogo publicado y el proceso que lo publica (y lo vigila) sigue vivo
+    try:
+        with open(os.path.join(directory or shared_dir(), CURRENT), encoding='utf-8') as f:
+            pid = json.load(f).get('publisher')
+    except (OSError, ValueError):
+        return False
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Existe, pero es de otro usuario
+        pass
+    return True
+
+
+def publish(snapshot, pred, prob, model_hash, directory=None):
+    # Escribe el catálogo como arrays .npy (uno por columna) + predicciones
+    # y lo publica cambiando current.json: los workers sólo ven versiones completas
+    directory = directory or shared_dir()
+    os.makedirs(directory, exist_ok=True)
+    name = f"{snapshot.version}-{model_hash}"
+    final = os.path.join(directory, name)
+    if os.path.exists(os.path.join(final, MANIFEST)):
+        _write_current(directory, name)
+        return final
+    tmp = tempfile.mkdtemp(prefix=f".{name}-", dir=directory)
+    columns = []
+    for i, col in enumerate(snapshot.df.columns):
+        values = snapshot.df[col]
+        if isinstance(values.dtype, pd.CategoricalDtype) or values.dtype == object:
+            # Texto: códigos enteros (compartidos) + valores distintos en el manifest
+            categorical = values.astype('category') if values.dtype == object else values
+            columns.append({'name': col, 'kind': 'category',
+                            'codes': _write_array(tmp, f'col{i}.npy', categorical.cat.codes.to_numpy()),
+                            'categories': categorical.cat.categories.tolist()})
+        else:
+            columns.append({'name': col, 'kind': 'array', 'file': _write_array(tmp, f'col{i}.npy', values.to_numpy())})
+    manifest = {
+        'version': snapshot.version,
+        'model_hash': model_hash,
+        'rows': len(snapshot),
+        'columns': columns,
+        'pred': _write_array(tmp, 'pred.npy', np.asarray(pred, dtype=np.int8)),
+        'prob': _write_array(tmp, 'prob.npy', np.asarray(prob, dtype=np.float64)),
+    }
+    _write_json(os.path.join(tmp, MANIFEST), manifest)
+    os.replace(tmp, final)
+    _write_current(directory, name)
+    _prune(directory, keep=name)
+    return final
+
+
+def _prune(directory, keep):
+    # Borrar versiones viejas; un worker que aún las tenga mapeadas sigue leyéndolas sin problema
+    versions = [entry for entry in os.scandir(directory)
+                if entry.is_dir() and entry.name != keep and os.path.exists(os.path.join(entry.path, MANIFEST))]
+    versions.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in versions[KEEP_VERSIONS - 1:]:
+        shutil.rmtree(entry.path, ignore_errors=True)
+
+
+class SharedSnapshot:
+    """Versión publicada del catálogo, abierta con mmap en modo sólo lectura.
+
+    Las columnas y las predicciones son vistas sobre los .npy: todos los
+    workers comparten las mismas páginas en memoria. Cada worker sólo
+    construye sus índices (OfferIndex).
+    """
+
+    def __init__(self, path):
+        with open(os.path.join(path, MANIFEST), encoding='utf-8') as f:
+            manifest = json.load(f)
+        data = {}
+        for column in manifest['columns']:
+            if column['kind'] == 'category':
+                codes = np.load(os.path.join(path, column['codes']), mmap_mode='r')
+                data[column['name']] = pd.Categorical.from_codes(codes, categories=column['categories'])
+            else:
+                data[column['name']] = np.load(os.path.join(path, column['file']), mmap_mode='r')
+        self.df = pd.DataFrame(data, copy=False)
+        self.index = OfferIndex(self.df)
+        self.pred = np.load(os.path.join(path, manifest['pred']), mmap_mode='r')
+        self.prob = np.load(os.path.join(path, manifest['prob']), mmap_mode='r')
+        self.path = path
+        self.version = manifest['version']
+        self.model_hash = manifest['model_hash']
+
+    def __len__(self):
+        return len(self.df)
+
+    def lookup(self, rows):
+        return self.pred[rows], self.prob[rows]
+
+
+class SharedCatalog:
+    # Lado de los workers: abre la versión que indica current.json y la cambia cuando se publica otra
+
+    def __init__(self, directory=None, check_interval=1.0):
+        self.directory = directory or shared_dir()
+        self.check_interval = check_interval
+        self._snapshot = None
+        self._name = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    def _current(self):
+        with open(os.path.join(self.directory, CURRENT), encoding='utf-8') as f:
+            return json.load(f)['version']
+
+    def reload(self):
+        if not self._lock.acquire(blocking=self._snapshot is None):
+            return self._snapshot
+        try:
+            self._last_check = time.monotonic()
+            name = self._current()
+            if name != self._name:
+                with stage('catalog_load') as timer:
+                    self._snapshot = SharedSnapshot(os.path.join(self.directory, name))
+                    timer.rows_out = len(self._snapshot)
+                self._name = name
+            return self._snapshot
+        except Exception as e:
+            if self._snapshot is None:
+                raise
+            log.warning("⚠️ No se pudo abrir el catálogo publicado: %s", e)
+            return self._snapshot
+        finally:
+            self._lock.release()
+
+    def snapshot(self):
+        current = self._snapshot
+        if current is None or time.monotonic() - self._last_check >= self.check_interval:
+            return self.reload()
+        return current
+
+
+class CatalogPublisher:
+    # Lado del proceso principal: vigila chollos.csv y el modelo y publica cada versión nueva
+
+    def __init__(self, store, scores, directory=None):
+        self.store = store
+        self.scores = scores
+        self.directory = directory or shared_dir()
+        self._published = None
+
+    def refresh(self):
+        snapshot = self.store.snapshot()
+        # refresh() también recarga el modelo si han cambiado los .pkl; se publica con el hash del modelo
+        # que ha puntuado (scores.model_hash), no con el que haya cargado después
+        scores = self.scores.refresh(snapshot)
+        key = (snapshot.version, scores.model_hash)
+        if key != self._published:
+            path = publish(snapshot, scores.pred, scores.prob, scores.model_hash, self.directory)
+            self._published = key
+            log.info("📦 Catálogo publicado en %s (%d ofertas)", path, len(snapshot))
+        return self._published
+
+    def watch(self, interval=1.0):
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.refresh()
+                except Exception as e:
+                    log.warning("⚠️ No se pudo publicar el catálogo: %s", e)
+        thread = threading.Thread(target=loop, daemon=True)
+        thread.start()
+        return thread
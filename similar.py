@@ -0,0 +1,211 @@
+import copy
+import hashlib
+import threading
+import warnings
+
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import KDTree
+
+from metrics import log, stage
+from normalize import cpu_generation, cpu_type, resolution_pixels
+from offer_store import FLOAT_DECIMALS, iter_records
+
+# Specs con las que se comparan los portátiles (estandarizadas dentro de cada partición)
+SIMILAR_FEATURES = ['RAM', 'Almacenamiento', 'Pantalla', 'Bateria', 'CPU_Generation', 'Resolution_Pixels']
+# Clase de la gráfica: la primera coincidencia gana; lo demás cuenta como integrada
+GPU_CLASSES = [("RTX", "NVIDIA"), ("GTX", "NVIDIA"), ("GeForce", "NVIDIA"), ("NVIDIA", "NVIDIA"),
+               ("Radeon RX", "AMD dedicada"), ("Arc A", "Intel dedicada")]
+GPU_CLASS_DEFAULT = "Integrada"
+DEFAULT_K = 10
+MAX_K = 100
+LEAF_SIZE = 40
+
+
+def gpu_class(graficos):
+    # Como cpu_type: se clasifica cada valor distinto y se expande a todas las filas
+    codes, uniques = pd.factorize(graficos, use_na_sentinel=False)
+    col = pd.Series(uniques, dtype=object).map(str)
+    classes = np.select([col.str.contains(pattern, regex=False) for pattern, _ in GPU_CLASSES],
+                        [name for _, name in GPU_CLASSES], GPU_CLASS_DEFAULT)
+    return classes[codes]
+
+
+def similarity_features(df):
+    # Matriz (filas, SIMILAR_FEATURES) en float64, con NaN donde falta el dato
+    return np.column_stack([
+        df['RAM'].to_numpy(dtype=np.float64),
+        df['Almacenamiento'].to_numpy(dtype=np.float64),
+        df['Pantalla'].to_numpy(dtype=np.float64),
+        df['Bateria'].to_numpy(dtype=np.float64),
+        cpu_generation(df['Procesador']).to_numpy(dtype=np.float64),
+        resolution_pixels(df['Resolucion']).to_numpy(dtype=np.float64),
+    ])
+
+
+def fill_missing(block):
+    # Huecos -> mediana de la partición (así una partición no depende de las demás); 0 si no hay ningún dato
+    missing = np.isnan(block)
+    if not missing.any():
+        return block
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        fill = np.nan_to_num(np.nanmedian(block, axis=0))
+    return np.where(missing, fill, block)
+
+
+def partition_keys(df):
+    # "fabricante de CPU / clase de GPU" de cada fila -> (códigos, nombres)
+    keys = cpu_type(df['Procesador']).to_numpy(dtype=object) + ' / ' + gpu_class(df['Graficos'])
+    return pd.factorize(keys)
+
+
+class CatalogChanged(Exception):
+    # El id de /similar es de otra versión del catálogo: esa posición ya no es la misma oferta (409)
+    pass
+
+
+def parse_similar_args(args):
+    # id (posición de la oferta en el catálogo, el "id" de /search_offers), version (el "catalog_version"
+    # de la respuesta en la que venía ese id) y k de la query string
+    version = args.get('version')
+    if not version:
+        raise ValueError("Falta 'version' (el catalog_version de /search_offers)")
+    values = {}
+    for name, default in (('id', None), ('k', DEFAULT_K)):
+        value = args.get(name)
+        if value in (None, ''):
+            if default is None:
+                raise ValueError(f"Falta '{name}'")
+            value = default
+        try:
+            values[name] = int(value)
+        except ValueError:
+            raise ValueError(f"'{name}' tiene que ser un entero: {value}")
+    if values['id'] < 0:
+        raise ValueError(f"'id' no puede ser negativo: {values['id']}")
+    if not 1 <= values['k'] <= MAX_K:
+        raise ValueError(f"'k' tiene que estar entre 1 y {MAX_K}: {values['k']}")
+    return values['id'], version, values['k']
+
+
+class _Partition:
+    # KDTree de una partición: filas del catálogo, media y escala con las que se estandarizó y hash del contenido
+
+    def __init__(self, name, rows, block, digest, leaf_size):
+        self.name = name
+        self.rows = rows
+        self.digest = digest
+        block = fill_missing(block)
+        self.mean = block.mean(axis=0)
+        self.scale = block.std(axis=0)
+        self.scale[self.scale == 0] = 1.0
+        self.tree = KDTree((block - self.mean) / self.scale, leaf_size=leaf_size)
+
+    def reuse(self, rows):
+        # Mismo contenido en otra versión del catálogo: el árbol vale, sólo cambian las posiciones
+        partition = copy.copy(self)
+        partition.rows = rows
+        return partition
+
+
+class SimilarIndex:
+    """Índice de vecinos más cercanos para /similar, uno por versión del catálogo.
+
+    Las ofertas se parten por fabricante de CPU y clase de GPU y cada partición
+    tiene su KDTree sobre las specs estandarizadas. Al cambiar el catálogo sólo
+    se reconstruyen las particiones cuyo contenido ha cambiado; las demás
+    reutilizan el árbol de la versión anterior.
+    """
+
+    def __init__(self, leaf_size=LEAF_SIZE):
+        self.leaf_size = leaf_size
+        self._lock = threading.Lock()
+        self._state = None
+        self.rebuilt = 0
+        self.reused = 0
+
+    def refresh(self, snapshot):
+        # Se puede usar como callback de OfferStore (on_load): construye el índice al cargar el catálogo
+        state = self._state
+        if state is not None and state['version'] == snapshot.version:
+            return state
+        with self._lock:
+            state = self._state
+            if state is not None and state['version'] == snapshot.version:
+                return state
+            with stage('similar_build', len(snapshot)) as timer:
+                state = self._build(snapshot, state['partitions'] if state else {})
+                timer.rows_out = len(snapshot)
+            self._state = state
+        return state
+
+    def _build(self, snapshot, previous):
+        X = similarity_features(snapshot.df)
+        codes, names = partition_keys(snapshot.df)
+        order = np.argsort(codes, kind='stable')
+        bounds = np.cumsum(np.bincount(codes, minlength=len(names)))[:-1]
+        partitions = {}
+        local = np.empty(len(codes), dtype=np.int64)
+        rebuilt = reused = 0
+        for name, rows in zip(names, np.split(order, bounds)):
+            block = X[rows]
+            digest = hashlib.sha1(block.tobytes()).hexdigest()
+            old = previous.get(name)
+            if old is not None and old.digest == digest:
+                partitions[name] = old.reuse(rows)
+                reused += 1
+            else:
+                partitions[name] = _Partition(name, rows, block, digest, self.leaf_size)
+                rebuilt += 1
+            local[rows] = np.arange(len(rows))
+        self.rebuilt += rebuilt
+        self.reused += reused
+        log.info("🧭 Índice de similares: %d particiones reconstruidas, %d reutilizadas", rebuilt, reused)
+        return {'version': snapshot.version, 'partitions': partitions, 'names': np.asarray(names, dtype=object),
+                'codes': codes, 'local': local}
+
+    def neighbours(self, snapshot, row, k):
+        # (partición, filas de los k vecinos más cercanos sin contar la propia oferta, distancias)
+        state = self.refresh(snapshot)
+        if not 0 <= row < len(state['codes']):
+            raise IndexError(f"No existe la oferta {row}")
+        partition = state['partitions'][state['names'][state['codes'][row]]]
+        point = np.asarray(partition.tree.data)[state['local'][row]][np.newaxis, :]
+        distances, positions = partition.tree.query(point, k=min(k + 1, len(partition.rows)))
+        rows = partition.rows[positions[0]]
+        keep = rows != row
+        rows, distances = rows[keep][:k], distances[0][keep][:k]
+        return partition.name, rows, distances
+
+
+def similar_offers(snapshot, index, row, k, lookup, version=None):
+    # Respuesta de /similar: la oferta, sus k vecinos y cuánto se aleja cada precio de la mediana de los vecinos.
+    # lookup(snapshot, rows) -> (predicciones, probabilidades), como en offer_search.search.
+    # Con version, el id tiene que ser de esa versión del catálogo (si no, CatalogChanged)
+    if version is not None and version != snapshot.version:
+        raise CatalogChanged(f"El catálogo ha cambiado (versión {version}, ahora {snapshot.version}): vuelve a buscar")
+    with stage('similar_query', k) as timer:
+        partition, rows, distances = index.neighbours(snapshot, row, k)
+        timer.rows_out = len(rows)
+    all_rows = np.concatenate(([row], rows))
+    prices = snapshot.df['Precio'].to_numpy()[all_rows].astype(np.float64).round(FLOAT_DECIMALS)
+    known = prices[1:][~np.isnan(prices[1:])]
+    median = float(np.median(known)) if len(known) else float('nan')
+    with np.errstate(all='ignore'):
+        delta = np.round((prices - median) / median * 100, 1)
+    pred, prob = lookup(snapshot, all_rows)
+    records = list(iter_records(snapshot.df, all_rows, {
+        "id": all_rows,
+        "Prediccion_IA": np.asarray(pred, dtype=np.int64),
+        "Probabilidad_IA": np.round(np.asarray(prob, dtype=np.float64) * 100, 1),
+        "distance": np.round(np.concatenate(([0.0], distances)), 4),
+        "price_delta_pct": delta,
+    }))
+    return {
+        "offer": records[0],
+        "partition": partition,
+        "median_price": None if np.isnan(median) else round(median, 2),
+        "similar": records[1:],
+        "catalog_version": snapshot.version,
+    }
@@ -1,46 +1,15 @@
-import os
+import argparse
 import asyncio
 import json
+
+import aiohttp
 from pydantic import BaseModel, Field
-from typing import List
 from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig, CacheMode
-from crawl4ai.extraction_strategy import LLMExtractionStrategy
-
-INSTRUCTION_TO_LLM = """
-Analiza la tabla HTML de especificaciones técnicas y extrae la siguiente información específica:
-
-1. Para el procesador:
-   - Busca "Modelo del procesador" y extrae su valor
-   
-2. Para la memoria:
-   - Busca "Memoria interna" y extrae su valor en GB
-
-3. Para el almacenamiento:
-   - Busca "Capacidad total de almacenaje" y extrae su valor
-
-4. Para los gráficos:
-   - Busca "Modelo de adaptador gráfico incorporado" y extrae su valor
-
-5. Para la pantalla:
-   - Combina "Diagonal de la pantalla" y "Resolución de la pantalla"
+from crawl4ai.async_dispatcher import SemaphoreDispatcher
 
-6. Para el sistema operativo:
-   - Busca "Sistema operativo instalado" y extrae su valor
+from webscrapping.spec_extraction import OLLAMA_MODEL, OLLAMA_URL, LLMCache, OllamaExtractor, SpecExtractor
 
-7. Para la batería:
-   - Busca "Capacidad de batería" y extrae su valor
-
-Devuelve los datos extraídos en un único objeto JSON con los campos exactamente como se definen en el esquema:
-{
-    "procesador": "valor",
-    "memoria": "valor",
-    "almacenamiento": "valor",
-    "graficos": "valor",
-    "pantalla": "valor",
-    "sistema_operativo": "valor",
-    "bateria": "valor"
-}
-"""
+DEFAULT_URL = "https://www.pcbox.com/ht5306qa-lx004w-portatil-asus-proart-ht5306qa-lx004w--13-3--2k--snapdragon-x1-p/p"
 
 class Product(BaseModel):
     procesador: str = Field(description="Modelo del procesador")
@@ -51,55 +20,68 @@ class Product(BaseModel):
     sistema_operativo: str = Field(description="Sistema operativo instalado")
     bateria: str = Field(description="Capacidad de batería")
 
-async def main():
-    # 1. Define the LLM extraction strategy
-    llm_strategy = LLMExtractionStrategy(
-        provider="ollama/deepseek-custom",            # e.g. "ollama/llama2"
-        api_token="",
-        schema=Product.model_json_schema(),            # Or use model_json_schema()
-        extraction_type="schema",
-        instruction=INSTRUCTION_TO_LLM,
-        chunk_token_threshold=2048,
-        overlap_rate=0.1,
-        apply_chunking=True,
-        input_format="html",   # or "html", "fit_markdown"
-        extra_args={
-        "temperature": 0.0,
-        "max_tokens": 8192,     # Aumentado
-        "top_p": 0.1
-        }
-    )
-
-    # 2. Build the crawler config
+async def crawl(urls, extractor, concurrency):
+    # 1. Build the crawler config: sin estrategia LLM, la extracción se hace al recibir cada página
     crawl_config = CrawlerRunConfig(
-        extraction_strategy=llm_strategy,
-        cache_mode=CacheMode.BYPASS,
+        cache_mode=CacheMode.ENABLED,
         process_iframes=False,
         remove_overlay_elements=True,
         exclude_external_links=True,
-        css_selector="tr.vtex-table-description-content",
-        excluded_selector="div.vtex-render__container-id-product-comparator"
+        excluded_selector="div.vtex-render__container-id-product-comparator",
+        stream=True
     )
 
-    # 3. Create a browser config if needed
-    browser_cfg = BrowserConfig(headless=True, verbose=True)
-
-    async with AsyncWebCrawler(config=browser_cfg) as crawler:
-        # 4. Let's say we want to crawl a single page
-        result = await crawler.arun(
-            url="https://www.pcbox.com/ht5306qa-lx004w-portatil-asus-proart-ht5306qa-lx004w--13-3--2k--snapdragon-x1-p/p",
-            config=crawl_config
-        )
-
-        if result.success:
-            # 5. The extracted content is presumably JSON
-            data = json.loads(result.extracted_content)
-            print("Extracted items:", data)
-
-            # 6. Show usage stats
-            llm_strategy.show_usage()  # prints token usage
-        else:
-            print("Error:", result.error_message)
+    # 2. Create a browser config if needed
+    browser_cfg = BrowserConfig(headless=True, verbose=False)
+
+    # 3. Como mucho `concurrency` páginas abiertas a la vez en el navegador
+    dispatcher = SemaphoreDispatcher(semaphore_count=concurrency)
+
+    products = []
+    async with AsyncWebCrawler(config=browser_cfg) as crawler, aiohttp.ClientSession() as session:
+        pending = []
+        async for result in await crawler.arun_many(urls=urls, config=crawl_config, dispatcher=dispatcher):
+            if result.success:
+                # 4. Tabla primero, LLM sólo para los campos que falten (mientras se descargan las siguientes)
+                pending.append(asyncio.create_task(extractor.extract(session, result.url, result.html)))
+            else:
+                extractor.stats.errors += 1
+                print("Error:", result.url, result.error_message)
+        for product in await asyncio.gather(*pending):
+            Product.model_validate(product)
+            products.append(product)
+    extractor.stats.stop()
+    return products
+
+def main():
+    parser = argparse.ArgumentParser(description="Especificaciones de fichas de PCBox: tabla primero, LLM para lo que falte")
+    parser.add_argument('urls', nargs='*', default=[DEFAULT_URL])
+    parser.add_argument('--urls-file', help="fichero con una URL por línea")
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--llm-url', default=OLLAMA_URL)
+    parser.add_argument('--model', default=OLLAMA_MODEL)
+    parser.add_argument('--llm-concurrency', type=int, default=2)
+    parser.add_argument('--cache-dir', default='.llm_cache')
+    parser.add_argument('--no-llm', action='store_true', help="sólo la tabla; los campos que falten quedan vacíos")
+    parser.add_argument('--output', help="fichero JSON con los productos extraídos")
+    args = parser.parse_args()
+
+    urls = list(args.urls)
+    if args.urls_file:
+        with open(args.urls_file, encoding='utf-8') as f:
+            urls = [line.strip() for line in f if line.strip()]
+
+    llm = None if args.no_llm else OllamaExtractor(args.llm_url, args.model, args.llm_concurrency)
+    extractor = SpecExtractor(llm, LLMCache(args.cache_dir))
+    products = asyncio.run(crawl(urls, extractor, args.concurrency))
+
+    # 5. The extracted content + usage stats
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(products, f, ensure_ascii=False, indent=2)
+    else:
+        print("Extracted items:", json.dumps(products, ensure_ascii=False, indent=2))
+    print(json.dumps(extractor.stats.as_dict(), indent=2))
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    main()
@@ -0,0 +1,241 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+import joblib
+import numpy as np
+import optuna
+import pandas as pd
+import sklearn
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.impute import SimpleImputer
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import StratifiedKFold, train_test_split
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+from normalize import URL_COLUMN
+from scoring import file_hash
+
+NUMERIC_FEATURES = ['RAM', 'Almacenamiento', 'Pantalla', 'Bateria', 'Precio']
+CATEGORICAL_FEATURES = ['Procesador', 'Tipo RAM', 'Graficos', 'Resolucion', 'Sistema Operativo']
+STORAGE = 'sqlite:///model/optuna.db'
+STUDY_NAME = 'chollo-rf'
+# Estados que cuentan para el número de pruebas pedido (las podadas también gastan su tiempo)
+FINISHED = (optuna.trial.TrialState.COMPLETE, optuna.trial.TrialState.PRUNED)
+
+
+def load_training_data(path='chollos.csv'):
+    # Misma limpieza que model/model.ipynb antes de ajustar el preprocesador
+    df = pd.read_csv(path)
+    df = df.dropna(subset=['RAM'])
+    df['Tipo RAM'] = df['Tipo RAM'].fillna(df['Tipo RAM'].mode()[0])
+    df = df.dropna(subset=['Almacenamiento'])
+    df['Almacenamiento'] = df['Almacenamiento'].where(~df['Almacenamiento'].isin([1, 2]), df['Almacenamiento'] * 1000)
+    intel = df['Graficos'].isna() & df['Procesador'].str.contains('Intel', na=False)
+    df.loc[intel, 'Graficos'] = 'Intel® UHD Graphics'
+    df = df.dropna(subset=['Graficos', 'Pantalla'])
+    df['Resolucion'] = df['Resolucion'].fillna(df['Resolucion'].mode()[0])
+    df['Sistema Operativo'] = df['Sistema Operativo'].replace(
+        {'No': 'FreeDOS', 'FreeDos': 'FreeDOS', 'Windows 11': 'Windows 11 Home'})
+    df['Sistema Operativo'] = df['Sistema Operativo'].fillna(df['Sistema Operativo'].mode()[0])
+    q1, q3 = df['Bateria'].quantile(0.25), df['Bateria'].quantile(0.75)
+    outliers = (df['Bateria'] < q1 - 1.5 * (q3 - q1)) | (df['Bateria'] > q3 + 1.5 * (q3 - q1))
+    df.loc[outliers, 'Bateria'] = df['Bateria'].mode()[0]
+    df['Bateria'] = df['Bateria'].fillna(df['Bateria'].mode()[0])
+    df = df.dropna(subset=['Precio'])
+    # La URL y el id de producto identifican la oferta, no son variables del modelo
+    return (df.drop(columns=['Chollo', 'Probabilidad_Chollo', URL_COLUMN, 'product_id'], errors='ignore'),
+            df['Chollo'].astype(int))
+
+
+def build_preprocessor():
+    numeric = Pipeline(steps=[
+        ('imputer', SimpleImputer(strategy='median')),
+        ('scaler', StandardScaler())
+    ])
+    categorical = Pipeline(steps=[
+        ('imputer', SimpleImputer(strategy='most_frequent')),
+        ('onehot', OneHotEncoder(handle_unknown='ignore'))
+    ])
+    return ColumnTransformer(transformers=[
+        ('num', numeric, NUMERIC_FEATURES),
+        ('cat', categorical, CATEGORICAL_FEATURES)
+    ])
+
+
+def suggest_params(trial):
+    # El mismo espacio de búsqueda que la celda de Optuna del notebook
+    return {
+        'n_estimators': trial.suggest_int('n_estimators', 50, 300),
+        'max_depth': trial.suggest_int('max_depth', 3, 30),
+        'min_samples_split': trial.suggest_int('min_samples_split', 2, 10),
+        'min_samples_leaf': trial.suggest_int('min_samples_leaf', 1, 5),
+        'max_features': trial.suggest_categorical('max_features', ['sqrt', 'log2', None]),
+        'bootstrap': trial.suggest_categorical('bootstrap', [True, False]),
+    }
+
+
+class CrossValObjective:
+    """Accuracy media en validación cruzada, fold a fold.
+
+    Tras cada fold se informa la media parcial: el MedianPruner corta la prueba
+    si va por debajo de la mediana de las anteriores en ese mismo fold.
+    """
+
+    def __init__(self, X, y, folds=5, seed=42):
+        self.X = X
+        self.y = np.asarray(y)
+        self.splits = list(StratifiedKFold(n_splits=folds, shuffle=True, random_state=seed).split(X, self.y))
+        self.seed = seed
+
+    def __call__(self, trial):
+        params = suggest_params(trial)
+        scores = []
+        start = time.process_time()
+        try:
+            for fold, (train, test) in enumerate(self.splits):
+                # Un núcleo por prueba: el paralelismo está en las pruebas, no dentro del bosque
+                model = RandomForestClassifier(**params, random_state=self.seed, n_jobs=1)
+                model.fit(self.X[train], self.y[train])
+                scores.append(accuracy_score(self.y[test], model.predict(self.X[test])))
+                trial.report(float(np.mean(scores)), fold)
+                if trial.should_prune():
+                    raise optuna.TrialPruned()
+        finally:
+            # Tiempo de CPU, no de reloj: con más procesos que núcleos el de reloj se infla
+            trial.set_user_attr('cpu_seconds', time.process_time() - start)
+        return float(np.mean(scores))
+
+
+def open_study(storage=STORAGE, study_name=STUDY_NAME, seed=None):
+    # Estudio persistente: si ya existe se continúa donde se quedó
+    return optuna.create_study(
+        study_name=study_name,
+        storage=optuna.storages.RDBStorage(storage, engine_kwargs={'connect_args': {'timeout': 60}}),
+        direction='maximize',
+        load_if_exists=True,
+        sampler=optuna.samplers.TPESampler(seed=seed, constant_liar=True),
+        pruner=optuna.pruners.MedianPruner(n_startup_trials=5, n_warmup_steps=1),
+    )
+
+
+def _run_worker(X, y, n_trials, storage, study_name, folds, seed):
+    # Un proceso por núcleo; todos comparten el estudio a través del almacenamiento
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    study = open_study(storage, study_name, seed=seed)
+    callback = optuna.study.MaxTrialsCallback(n_trials, states=FINISHED)
+    study.optimize(CrossValObjective(X, y, folds), callbacks=[callback], n_trials=n_trials)
+
+
+def search(X, y, n_trials=50, jobs=None, storage=STORAGE, study_name=STUDY_NAME, folds=5, seed=42):
+    # Lanza las pruebas que falten hasta n_trials en jobs procesos.
+    # Devuelve (estudio, segundos, uso de CPU, pruebas nuevas)
+    jobs = jobs or os.cpu_count() or 1
+    study = open_study(storage, study_name, seed=seed)
+    done_before = {t.number for t in study.get_trials(deepcopy=False, states=FINISHED)}
+    start = time.perf_counter()
+    if len(done_before) < n_trials:
+        if jobs == 1:
+            _run_worker(X, y, n_trials, storage, study_name, folds, seed)
+        else:
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                futures = [pool.submit(_run_worker, X, y, n_trials, storage, study_name, folds, seed + worker)
+                           for worker in range(jobs)]
+                for future in futures:
+                    future.result()
+    elapsed = time.perf_counter() - start
+    study = open_study(storage, study_name, seed=seed)
+    # Uso de CPU: segundos de CPU de las pruebas de esta ejecución / tiempo real, es decir, cuántos núcleos
+    # se han aprovechado de media. No es un speedup medido (eso necesitaría repetir la búsqueda con jobs=1)
+    new = [t for t in study.get_trials(deepcopy=False, states=FINISHED) if t.number not in done_before]
+    cpu_seconds = sum(t.user_attrs.get('cpu_seconds', 0.0) for t in new)
+    return study, elapsed, (cpu_seconds / elapsed if elapsed else 0.0), len(new)
+
+
+def _write_json(path, data):
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def publish_model(model, preprocessor, out_dir, metadata):
+    # Los .pkl se escriben a temporales y model_chollo.json (con el hash de la pareja) se publica antes
+    # que ellos: ScoreCache no cambia de modelo hasta que los dos .pkl coinciden con ese hash
+    model_path = os.path.join(out_dir, 'model_chollo.pkl')
+    preprocessor_path = os.path.join(out_dir, 'preprocessor.pkl')
+    tmp_model, tmp_preprocessor = f"{model_path}.tmp", f"{preprocessor_path}.tmp"
+    joblib.dump(model, tmp_model)
+    joblib.dump(preprocessor, tmp_preprocessor)
+    metadata = dict(metadata, model_hash=file_hash(tmp_model, tmp_preprocessor))
+    _write_json(os.path.join(out_dir, 'model_chollo.json'), metadata)
+    os.replace(tmp_preprocessor, preprocessor_path)
+    os.replace(tmp_model, model_path)
+    return model_path, preprocessor_path, metadata
+
+
+def train(data_path='chollos.csv', out_dir='model', n_trials=50, jobs=None, storage=STORAGE,
+          study_name=STUDY_NAME, folds=5, seed=42):
+    X_raw, y = load_training_data(data_path)
+    # Se separa antes de ajustar el preprocesador: medianas, escalado y categorías sólo ven el conjunto
+    # de entrenamiento, y el de prueba se transforma como cualquier oferta nueva
+    raw_train, raw_test, y_train, y_test = train_test_split(X_raw, y.to_numpy(), test_size=0.2, random_state=seed)
+    preprocessor = build_preprocessor()
+    X_train = preprocessor.fit_transform(raw_train)
+    X_test = preprocessor.transform(raw_test)
+
+    study, elapsed, cpu_utilisation, new_trials = search(X_train, y_train, n_trials, jobs, storage, study_name, folds, seed)
+    pruned = len(study.get_trials(deepcopy=False, states=(optuna.trial.TrialState.PRUNED,)))
+    print(f"⏱️ {new_trials} pruebas nuevas en {elapsed:.1f} s con {jobs or os.cpu_count()} procesos "
+          f"(CPU en uso: {cpu_utilisation:.1f} núcleos de media, {pruned} podadas en total)")
+    print(f"🏆 Mejor accuracy en validación cruzada: {study.best_value:.4f} con {study.best_params}")
+
+    model = RandomForestClassifier(**study.best_params, random_state=seed, n_jobs=jobs or -1)
+    model.fit(X_train, y_train)
+    test_accuracy = accuracy_score(y_test, model.predict(X_test))
+    # El backend predice con n_jobs por defecto, como el modelo del notebook
+    model.set_params(n_jobs=None)
+    print(f"🎯 Accuracy en el conjunto de prueba: {test_accuracy:.4f}")
+
+    metadata = {
+        'trained_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'data': data_path,
+        'data_hash': file_hash(data_path),
+        'rows': int(len(y)),
+        'params': study.best_params,
+        'cv_accuracy': study.best_value,
+        'test_accuracy': test_accuracy,
+        'study': study_name,
+        'storage': storage,
+        'trials': len(study.get_trials(deepcopy=False, states=FINISHED)),
+        'search_seconds': elapsed,
+        'cpu_utilisation': cpu_utilisation,
+        'jobs': jobs or os.cpu_count(),
+        'sklearn': sklearn.__version__,
+    }
+    model_path, preprocessor_path, metadata = publish_model(model, preprocessor, out_dir, metadata)
+    print(f"💾 Modelo guardado en {model_path} y {preprocessor_path}")
+    return metadata
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Búsqueda de hiperparámetros con Optuna y entrenamiento del modelo de chollos")
+    parser.add_argument('--data', default='chollos.csv')
+    parser.add_argument('--out-dir', default='model')
+    parser.add_argument('--trials', type=int, default=50, help="pruebas en total (las de ejecuciones anteriores cuentan)")
+    parser.add_argument('--jobs', type=int, default=None, help="procesos en paralelo (por defecto, uno por núcleo)")
+    parser.add_argument('--storage', default=STORAGE, help="almacenamiento del estudio; permite reanudar la búsqueda")
+    parser.add_argument('--study', default=STUDY_NAME)
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    train(args.data, args.out_dir, args.trials, args.jobs, args.storage, args.study, args.folds, args.seed)
+
+
+if __name__ == '__main__':
+    main()
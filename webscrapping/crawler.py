@@ -0,0 +1,310 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from price_history import PriceHistory
+from webscrapping.page_cache import PageCache
+from webscrapping.parse_stage import ParseStage
+from webscrapping.parsers import PARSER_BACKENDS, parse_laptop_specs, parse_listing_links
+
+# Tiendas con plantilla VTEX: URL del listado paginado y número de páginas
+STORES = {
+    'pcbox': {
+        'listing': 'https://www.pcbox.com/ordenadores/ordenadores-portatiles?page={page}',
+        'pages': 20,
+    },
+    'appinformatica': {
+        'listing': 'https://www.appinformatica.com/ordenadores/ordenadores-portatiles?page={page}',
+        'pages': 20,
+    },
+}
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (compatible; PROYECTO-PIA-OFERTAS crawler)',
+    'Accept-Language': 'es-ES,es;q=0.9',
+}
+
+
+class HostRateLimiter:
+    # Separa las peticiones a un mismo host al menos 1/rate segundos
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = {}
+        self._locks = {}
+
+    async def wait(self, host):
+        if not self.interval:
+            return
+        lock = self._locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            now = time.monotonic()
+            start = max(now, self._next.get(host, now))
+            self._next[host] = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+
+class CrawlStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.finished = None
+        self.pages = 0
+        self.bytes = 0
+        self.errors = 0
+        self.retries = 0
+        self.skipped = 0
+        # Caché de páginas: consultas, aciertos (304 o mismo hash) y bytes no descargados
+        self.cache_lookups = 0
+        self.cache_hits = 0
+        self.bytes_saved = 0
+
+    def stop(self):
+        self.finished = time.perf_counter()
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def pages_per_s(self):
+        return self.pages / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def cache_hit_rate(self):
+        return self.cache_hits / self.cache_lookups if self.cache_lookups else 0.0
+
+    def as_dict(self):
+        return {
+            'pages': self.pages,
+            'bytes': self.bytes,
+            'errors': self.errors,
+            'retries': self.retries,
+            'skipped': self.skipped,
+            'elapsed_s': round(self.elapsed, 3),
+            'pages_per_s': round(self.pages_per_s, 2),
+            'cache_hits': self.cache_hits,
+            'cache_hit_rate': round(self.cache_hit_rate, 3),
+            'bytes_saved': self.bytes_saved,
+        }
+
+
+class FetchResult:
+    def __init__(self, url, status, text, headers, unchanged=False, cache_entry=None):
+        self.url = url
+        self.status = status
+        self.text = text
+        self.headers = headers
+        # unchanged: la página es igual que en la última ejecución (no hace falta parsearla)
+        self.unchanged = unchanged
+        self.cache_entry = cache_entry
+
+
+class Crawler:
+    """Descargador asíncrono con concurrencia acotada.
+
+    Reutiliza las conexiones (keep-alive) con un único ClientSession, limita
+    el ritmo por host, reintenta con backoff exponencial los errores
+    transitorios y no descarga dos veces la misma URL. Con una PageCache
+    hace peticiones condicionales y marca las páginas que no han cambiado.
+    """
+
+    def __init__(self, concurrency=16, per_host_rate=8.0, retries=3, backoff=0.5, timeout=20, headers=None,
+                 cache=None):
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.headers = dict(DEFAULT_HEADERS, **(headers or {}))
+        self.rate_limiter = HostRateLimiter(per_host_rate)
+        self.seen = set()
+        # Fichas que no han cambiado desde la última ejecución (no se vuelven a parsear)
+        self.unchanged = []
+        self.stats = CrawlStats()
+        self.cache = cache
+        self._semaphore = None
+        self._session = None
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=self.concurrency, keepalive_timeout=30, ttl_dns_cache=300)
+        self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout, headers=self.headers)
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self.stats = CrawlStats()
+        return self
+
+    async def __aexit__(self, *exc):
+        self.stats.stop()
+        await self._session.close()
+
+    def mark_seen(self, url):
+        # True si la URL es nueva (y queda marcada), False si ya se había pedido
+        if url in self.seen:
+            self.stats.skipped += 1
+            return False
+        self.seen.add(url)
+        return True
+
+    async def _request(self, url, headers):
+        async with self._session.get(url, headers=headers) as response:
+            body = await response.read()
+            return response.status, body, response.headers
+
+    async def fetch(self, url, headers=None, use_cache=True):
+        host = urlsplit(url).netloc
+        entry = None
+        if self.cache is not None and use_cache:
+            self.stats.cache_lookups += 1
+            entry = self.cache.get(url)
+            headers = dict(headers or {}, **self.cache.conditional_headers(entry))
+        async with self._semaphore:
+            for attempt in range(self.retries + 1):
+                await self.rate_limiter.wait(host)
+                try:
+                    status, body, response_headers = await self._request(url, headers)
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    status, body, response_headers, error = None, b'', {}, e
+                else:
+                    error = None
+                if status is not None and status not in RETRY_STATUS:
+                    self.stats.pages += 1
+                    self.stats.bytes += len(body)
+                    if status == 304 and entry:
+                        self.stats.cache_hits += 1
+                        self.stats.bytes_saved += entry['size']
+                        return FetchResult(url, status, None, response_headers, unchanged=True)
+                    if status >= 400:
+                        self.stats.errors += 1
+                        print(f"Error al realizar la petición HTTP: {status} {url}")
+                        return None
+                    new_entry = None
+                    unchanged = False
+                    if self.cache is not None and use_cache:
+                        new_entry = self.cache.entry_for(url, response_headers, body)
+                        unchanged = entry is not None and entry['content_hash'] == new_entry['content_hash']
+                        if unchanged:
+                            self.stats.cache_hits += 1
+                    return FetchResult(url, status, body.decode('utf-8', errors='replace'), response_headers,
+                                       unchanged=unchanged, cache_entry=new_entry)
+                if attempt == self.retries:
+                    break
+                self.stats.retries += 1
+                delay = self.backoff * 2 ** attempt * (1 + random.random())
+                retry_after = response_headers.get('Retry-After') if response_headers else None
+                if retry_after and retry_after.isdigit():
+                    delay = max(delay, float(retry_after))
+                await asyncio.sleep(delay)
+        self.stats.errors += 1
+        print(f"Error al realizar la petición HTTP: {error or status} {url}")
+        return None
+
+    async def fetch_many(self, urls, use_cache=True):
+        # Descarga en paralelo las URLs que no se hayan visto antes (en el orden recibido)
+        new_urls = [url for url in urls if self.mark_seen(url)]
+        results = await asyncio.gather(*(self.fetch(url, use_cache=use_cache) for url in new_urls))
+        return [r for r in results if r is not None]
+
+    def remember(self, result):
+        # Guardar en caché una página ya procesada (sólo después de parsearla bien)
+        if self.cache is not None and result.cache_entry is not None:
+            self.cache.put(result.cache_entry)
+
+
+async def crawl_listing(crawler, listing_urls):
+    # Los listados siempre se descargan: de ellos salen los productos nuevos
+    pages = await crawler.fetch_many(listing_urls, use_cache=False)
+    links = []
+    for page in pages:
+        links.extend(parse_listing_links(page.text, page.url))
+    return list(dict.fromkeys(links))
+
+
+async def crawl_specs(crawler, product_urls, parse_stage=None, backend='html.parser'):
+    # Sólo se parsean (y luego se guardan) las fichas nuevas o que han cambiado
+    if parse_stage is None:
+        parsed = []
+        for page in await crawler.fetch_many(product_urls):
+            if page.unchanged:
+                # Puede traer un ETag nuevo aunque el contenido sea el mismo
+                crawler.remember(page)
+                crawler.unchanged.append(page.url)
+                continue
+            parsed.append((page, parse_laptop_specs(page.text, page.url, backend)))
+    else:
+        # Cada ficha pasa a la etapa de parseo en cuanto termina de descargarse
+        async def fetch_into_stage(url):
+            page = await crawler.fetch(url)
+            if page is None:
+                return
+            if page.unchanged:
+                crawler.remember(page)
+                crawler.unchanged.append(page.url)
+            else:
+                await parse_stage.put(page)
+
+        await asyncio.gather(*(fetch_into_stage(url) for url in product_urls if crawler.mark_seen(url)))
+        order = {url: i for i, url in enumerate(product_urls)}
+        parsed = sorted(await parse_stage.join(), key=lambda item: order[item[0].url])
+
+    specs = []
+    for page, specs_dict in parsed:
+        if specs_dict is not None:
+            specs.append(specs_dict)
+            crawler.remember(page)
+    return specs
+
+
+async def crawl_store(store, pages=None, listing=None, cache_dir=None, parse_workers=0, parser='html.parser',
+                      history_dir=None, **crawler_options):
+    # Listado + fichas de una tienda. Devuelve (lista de specs nuevas o cambiadas, estadísticas)
+    config = STORES.get(store, {})
+    listing = listing or config['listing']
+    pages = pages or config.get('pages', 20)
+    if cache_dir:
+        crawler_options['cache'] = PageCache(cache_dir)
+    async with Crawler(**crawler_options) as crawler:
+        links = await crawl_listing(crawler, [listing.format(page=i) for i in range(1, pages + 1)])
+        print(f"{store}: {len(links)} portátiles encontrados")
+        if parse_workers:
+            # parse_workers > 0: parseo en paralelo en otros procesos mientras se sigue descargando
+            async with ParseStage(workers=parse_workers, backend=parser) as stage:
+                specs = await crawl_specs(crawler, links, parse_stage=stage)
+        else:
+            specs = await crawl_specs(crawler, links, backend=parser)
+    if history_dir:
+        # Una fila por ficha y rastreo; las que no han cambiado repiten su último precio
+        recorded = PriceHistory(history_dir).record_crawl(store, specs, crawler.unchanged)
+        print(f"{store}: {recorded} precios añadidos al historial")
+    return specs, crawler.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crawler concurrente de tiendas VTEX")
+    parser.add_argument('store', choices=sorted(STORES))
+    parser.add_argument('--pages', type=int, default=None)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--rate', type=float, default=8.0, help="peticiones por segundo y host")
+    parser.add_argument('--out', default=None, help="fichero JSON de salida")
+    parser.add_argument('--cache-dir', default=None, help="caché de páginas para ejecuciones incrementales")
+    parser.add_argument('--parse-workers', type=int, default=os.cpu_count(),
+                        help="procesos de parseo (0 = parsear en el propio proceso)")
+    parser.add_argument('--parser', choices=PARSER_BACKENDS, default='html.parser')
+    parser.add_argument('--history-dir', default=None, help="historial de precios (Parquet) al que añadir este rastreo")
+    args = parser.parse_args()
+
+    specs, stats = asyncio.run(crawl_store(args.store, pages=args.pages, cache_dir=args.cache_dir,
+                                           parse_workers=args.parse_workers, parser=args.parser,
+                                           history_dir=args.history_dir, concurrency=args.concurrency, per_host_rate=args.rate))
+    print(json.dumps(stats.as_dict()))
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(specs, f, ensure_ascii=False, indent=4)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+import hashlib
+import json
+import os
+import time
+
+
+def content_hash(body):
+    return hashlib.sha256(body).hexdigest()
+
+
+class PageCache:
+    """Caché en disco de las fichas ya procesadas, una entrada JSON por URL.
+
+    Guarda ETag, Last-Modified, el hash del contenido y su tamaño para poder
+    pedir la página de forma condicional y saber si ha cambiado sin parsearla.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, url):
+        return os.path.join(self.directory, hashlib.sha1(url.encode('utf-8')).hexdigest() + '.json')
+
+    def get(self, url):
+        try:
+            with open(self._path(url), encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def conditional_headers(self, entry):
+        headers = {}
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def entry_for(self, url, headers, body):
+        return {
+            'url': url,
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'content_hash': content_hash(body),
+            'size': len(body),
+            'fetched_at': time.time(),
+        }
+
+    def put(self, entry):
+        # Escritura atómica: nunca queda una entrada a medias
+        path = self._path(entry['url'])
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(entry, f)
+        os.replace(tmp, path)
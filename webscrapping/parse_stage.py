@@ -0,0 +1,63 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from webscrapping.parsers import PARSER_BACKENDS, parse_laptop_specs
+
+
+class ParseStage:
+    """Etapa de parseo en un pool de procesos, alimentada por una cola.
+
+    El crawler mete cada ficha en la cola en cuanto se descarga; varios
+    consumidores la envían al pool, así que descargar y parsear se solapan
+    y el parseo (CPU) usa todos los núcleos en vez de bloquear el bucle.
+    """
+
+    def __init__(self, workers=None, backend='html.parser', queue_size=64):
+        if backend not in PARSER_BACKENDS:
+            raise ValueError(f"Backend de parseo desconocido: {backend} (disponibles: {', '.join(PARSER_BACKENDS)})")
+        self.workers = workers or os.cpu_count() or 1
+        self.backend = backend
+        self.queue_size = queue_size
+        self.results = []
+        self._pool = None
+        self._queue = None
+        self._consumers = []
+
+    async def __aenter__(self):
+        self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self.results = []
+        # Un consumidor más que procesos para que el pool nunca espere a la cola
+        self._consumers = [asyncio.create_task(self._consume()) for _ in range(self.workers + 1)]
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.join()
+        self._pool.shutdown()
+
+    async def put(self, page):
+        # Bloquea si la cola está llena: el parseo frena al descargador (backpressure)
+        await self._queue.put(page)
+
+    async def _consume(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            page = await self._queue.get()
+            if page is None:
+                break
+            try:
+                specs = await loop.run_in_executor(self._pool, parse_laptop_specs, page.text, page.url, self.backend)
+            except Exception as e:
+                print(f"Error general al procesar la página: {e}")
+                specs = None
+            self.results.append((page, specs))
+
+    async def join(self):
+        # Cerrar la cola y esperar a que se parsee todo lo pendiente
+        if self._consumers:
+            for _ in self._consumers:
+                await self._queue.put(None)
+            await asyncio.gather(*self._consumers)
+            self._consumers = []
+        return self.results
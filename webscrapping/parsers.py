@@ -0,0 +1,150 @@
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+
+# Selectores de las tiendas VTEX (PCBox y AppInformática comparten plantilla)
+LISTING_LINK_SELECTOR = 'a.vtex-product-summary-2-x-clearLink.vtex-product-summary-2-x-clearLink--main-product-summary.h-100.flex.flex-column'
+TITLE_CLASS = "vtex-store-components-3-x-productNameContainer vtex-store-components-3-x-productNameContainer--quickview mv0 t-heading-4"
+BRAND_CLASS = "ticnova-commons-components-0-x-ProductInfo c-action-primary ml2"
+PRICE_CLASS = 'ticnova-commons-components-0-x-price'
+SPECS_TABLE_CLASS = "vtex-table-description-extended_carac"
+SPECS_ROW_CLASS = "vtex-table-description-row"
+
+# Backends de parseo disponibles: los dos primeros con BeautifulSoup, el último con selectolax (lexbor)
+PARSER_BACKENDS = ('html.parser', 'lxml', 'selectolax')
+
+
+def parse_listing_links(html, base_url):
+    # Enlaces absolutos (sin repetir) a las fichas de producto de una página de listado
+    soup = BeautifulSoup(html, "html.parser")
+    links = []
+    for link in soup.select(LISTING_LINK_SELECTOR):
+        href = link.get('href')
+        if href:
+            links.append(urljoin(base_url, href))
+    return list(dict.fromkeys(links))
+
+
+def parse_laptop_specs(html, url, backend='html.parser'):
+    # Misma extracción que scrape_laptop_specs de los notebooks, sin la petición HTTP
+    if backend == 'selectolax':
+        return _parse_laptop_specs_selectolax(html, url)
+    if backend not in PARSER_BACKENDS:
+        raise ValueError(f"Backend de parseo desconocido: {backend} (disponibles: {', '.join(PARSER_BACKENDS)})")
+    try:
+        soup = BeautifulSoup(html, backend)
+
+        # Características del portátil
+        sections = {}
+
+        # URL del producto
+        sections["URL"] = url
+
+        # Título del portátil
+        title = soup.find("h1", class_=TITLE_CLASS)
+        if title:
+            sections["Titulo"] = title.text
+
+        # Marca
+        marca = soup.find("span", class_=BRAND_CLASS)
+        if marca:
+            sections['Marca'] = marca.text
+
+        # Se buscan todas las tablas con la clase utilizada en las especificaciones
+        tables = soup.find_all("table", class_=SPECS_TABLE_CLASS)
+
+        # Iteramos sobre cada tabla
+        for table in tables:
+            current_section = None
+            # Iteramos sobre las filas que contienen la clase indicativa
+            for row in table.find_all("tr", class_=SPECS_ROW_CLASS):
+                try:
+                    # Si la fila tiene un <td> con colspan="2" y un div de título, es un encabezado de sección
+                    header_td = row.find("td", colspan="2")
+                    if header_td:
+                        title_div = header_td.find("div", class_="vtex-table-description-title")
+                        if title_div:
+                            current_section = title_div.get_text(strip=True)
+                            sections.setdefault(current_section, {})
+                            continue
+
+                    # Si la fila contiene clave y valor, los extraemos
+                    key_td = row.find("td", class_="vtex-table-description-key")
+                    value_td = row.find("td", class_="vtex-table-description-value")
+                    if key_td and value_td and current_section:
+                        key = key_td.get_text(strip=True)
+                        value = value_td.get_text(strip=True)
+                        sections[current_section][key] = value
+                except Exception as e:
+                    print(f"Error al procesar una fila de la tabla: {e}")
+                    continue
+
+        try:
+            price = soup.find('div', class_=PRICE_CLASS)
+            if price:
+                sections['Precio'] = price.text.replace('\xa0', '').replace('€', '').strip()
+        except Exception as e:
+            print(f"Error al extraer el precio: {e}")
+
+        return sections
+
+    except Exception as e:
+        print(f"Error general al procesar la página: {e}")
+        return None
+
+
+def _parse_laptop_specs_selectolax(html, url):
+    # Misma salida que la versión con BeautifulSoup, recorriendo el árbol en C
+    try:
+        from selectolax.lexbor import LexborHTMLParser
+    except ImportError:
+        raise ImportError("El backend 'selectolax' necesita el paquete selectolax (pip install selectolax)")
+
+    def first_with_class(tag, classes):
+        # Como soup.find(tag, class_="a b"): el atributo class tiene que coincidir entero
+        for node in tree.css(tag):
+            if node.attributes.get('class') == classes:
+                return node
+        return None
+
+    try:
+        tree = LexborHTMLParser(html)
+        sections = {"URL": url}
+
+        title = first_with_class("h1", TITLE_CLASS)
+        if title:
+            sections["Titulo"] = title.text()
+
+        marca = first_with_class("span", BRAND_CLASS)
+        if marca:
+            sections['Marca'] = marca.text()
+
+        for table in tree.css(f"table.{SPECS_TABLE_CLASS}"):
+            current_section = None
+            for row in table.css(f"tr.{SPECS_ROW_CLASS}"):
+                try:
+                    header_td = row.css_first('td[colspan="2"]')
+                    if header_td:
+                        title_div = header_td.css_first("div.vtex-table-description-title")
+                        if title_div:
+                            current_section = title_div.text(strip=True)
+                            sections.setdefault(current_section, {})
+                            continue
+
+                    key_td = row.css_first("td.vtex-table-description-key")
+                    value_td = row.css_first("td.vtex-table-description-value")
+                    if key_td and value_td and current_section:
+                        sections[current_section][key_td.text(strip=True)] = value_td.text(strip=True)
+                except Exception as e:
+                    print(f"Error al procesar una fila de la tabla: {e}")
+                    continue
+
+        price = tree.css_first(f"div.{PRICE_CLASS}")
+        if price:
+            sections['Precio'] = price.text().replace('\xa0', '').replace('€', '').strip()
+
+        return sections
+
+    except Exception as e:
+        print(f"Error general al procesar la página: {e}")
+        return None
@@ -0,0 +1,287 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+
+import aiohttp
+from bs4 import BeautifulSoup
+
+# Filas de la tabla de especificaciones que se le pasaban al LLM (css_selector de test.py)
+SPEC_CONTENT_SELECTOR = "tr.vtex-table-description-content"
+
+# Campos del esquema Product de test.py -> claves de la tabla donde está cada uno, por orden de preferencia.
+# La pantalla junta dos claves (diagonal y resolución)
+PRODUCT_FIELDS = {
+    "procesador": ("Modelo del procesador",),
+    "memoria": ("Memoria interna",),
+    "almacenamiento": ("Capacidad total de almacenaje", "Capacidad total de SSD", "SDD, capacidad"),
+    "graficos": ("Modelo de adaptador gráfico incorporado",),
+    "pantalla": ("Diagonal de la pantalla", "Resolución de la pantalla"),
+    "sistema_operativo": ("Sistema operativo instalado",),
+    "bateria": ("Capacidad de batería",),
+}
+COMBINED_FIELDS = {"pantalla"}
+
+# Qué buscar para cada campo: se le pide al LLM sólo lo que falta
+FIELD_INSTRUCTIONS = {
+    "procesador": 'Busca "Modelo del procesador" y extrae su valor',
+    "memoria": 'Busca "Memoria interna" y extrae su valor en GB',
+    "almacenamiento": 'Busca "Capacidad total de almacenaje" y extrae su valor',
+    "graficos": 'Busca "Modelo de adaptador gráfico incorporado" y extrae su valor',
+    "pantalla": 'Combina "Diagonal de la pantalla" y "Resolución de la pantalla"',
+    "sistema_operativo": 'Busca "Sistema operativo instalado" y extrae su valor',
+    "bateria": 'Busca "Capacidad de batería" y extrae su valor',
+}
+
+OLLAMA_URL = "http://localhost:11434"
+OLLAMA_MODEL = "deepseek-custom"
+# Aproximación habitual de tokens por carácter para estimar lo que cuesta un prompt que no se envía
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def spec_rows(html):
+    # Filas clave -> valor de la tabla y su HTML (lo único que ve el LLM y lo que se usa como clave de caché)
+    try:
+        from selectolax.lexbor import LexborHTMLParser
+    except ImportError:
+        return _spec_rows_bs4(html)
+    rows = {}
+    parts = []
+    for row in LexborHTMLParser(html).css(SPEC_CONTENT_SELECTOR):
+        parts.append(row.html)
+        key_td = row.css_first("td.vtex-table-description-key")
+        value_td = row.css_first("td.vtex-table-description-value")
+        if key_td and value_td:
+            rows.setdefault(key_td.text(strip=True), value_td.text(strip=True))
+    return rows, "".join(parts)
+
+
+def _spec_rows_bs4(html):
+    rows = {}
+    parts = []
+    for row in BeautifulSoup(html, "html.parser").select(SPEC_CONTENT_SELECTOR):
+        parts.append(str(row))
+        key_td = row.find("td", class_="vtex-table-description-key")
+        value_td = row.find("td", class_="vtex-table-description-value")
+        if key_td and value_td:
+            rows.setdefault(key_td.get_text(strip=True), value_td.get_text(strip=True))
+    return rows, "".join(parts)
+
+
+def table_fields(rows):
+    # Campos del esquema que se pueden leer directamente de la tabla (sin valores vacíos)
+    fields = {}
+    for field, keys in PRODUCT_FIELDS.items():
+        if field in COMBINED_FIELDS:
+            values = [rows.get(key) for key in keys]
+            if all(values):
+                fields[field] = " ".join(values)
+            continue
+        for key in keys:
+            if rows.get(key):
+                fields[field] = rows[key]
+                break
+    return fields
+
+
+def build_instruction(fields):
+    steps = "\n".join(f"{i}. {field}: {FIELD_INSTRUCTIONS[field]}" for i, field in enumerate(fields, 1))
+    template = json.dumps({field: "valor" for field in fields}, ensure_ascii=False, indent=4)
+    return ("Analiza la tabla HTML de especificaciones técnicas y extrae la siguiente información específica:\n\n"
+            f"{steps}\n\nDevuelve los datos extraídos en un único objeto JSON con los campos exactamente "
+            f"como se definen en el esquema (cadena vacía si no aparece):\n{template}")
+
+
+class LLMCache:
+    # Respuestas del LLM en disco, una entrada JSON por hash de (modelo, campos pedidos, HTML de la tabla)
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(model, fields, table_html):
+        digest = hashlib.sha256()
+        digest.update(f"{model}\n{','.join(sorted(fields))}\n".encode('utf-8'))
+        digest.update(table_html.encode('utf-8'))
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.json')
+
+    def get(self, key):
+        try:
+            with open(self._path(key), encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def put(self, key, fields):
+        path = self._path(key)
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(fields, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+
+class OllamaExtractor:
+    # Cliente de /api/chat de Ollama con concurrencia acotada (el servidor atiende pocas peticiones a la vez)
+
+    def __init__(self, url=OLLAMA_URL, model=OLLAMA_MODEL, concurrency=2, timeout=120):
+        self.url = url.rstrip('/')
+        self.model = model
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    async def extract(self, session, table_html, fields):
+        # Devuelve ({campo: valor}, tokens del prompt, tokens generados)
+        payload = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": build_instruction(fields)},
+                {"role": "user", "content": table_html},
+            ],
+            "format": "json",
+            "stream": False,
+            "options": {"temperature": 0.0, "top_p": 0.1, "num_predict": 8192},
+        }
+        async with self._semaphore:
+            async with session.post(f"{self.url}/api/chat", json=payload, timeout=self.timeout) as response:
+                response.raise_for_status()
+                data = await response.json()
+        if not isinstance(data, dict):
+            raise ValueError(f"respuesta inesperada de Ollama: {type(data).__name__}")
+        try:
+            answer = json.loads(data["message"]["content"])
+        except (KeyError, TypeError, ValueError):
+            answer = {}
+        values = {field: str(answer[field]).strip() for field in fields
+                  if isinstance(answer, dict) and answer.get(field) not in (None, "")}
+        return values, data.get("prompt_eval_count", 0), data.get("eval_count", 0)
+
+
+class ExtractionStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.finished = None
+        self.pages = 0
+        self.errors = 0
+        # Páginas resueltas sólo con la tabla, llamadas al LLM y aciertos de la caché
+        self.table_only = 0
+        self.llm_calls = 0
+        self.cache_hits = 0
+        self.fields_from_table = 0
+        self.fields_from_llm = 0
+        self.fields_missing = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        # Lo que habría costado mandar cada página entera al LLM, como hacía test.py
+        self.baseline_tokens = 0
+
+    def stop(self):
+        self.finished = time.perf_counter()
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def pages_per_s(self):
+        return self.pages / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def tokens_saved(self):
+        return max(self.baseline_tokens - self.prompt_tokens - self.completion_tokens, 0)
+
+    def as_dict(self):
+        return {
+            'pages': self.pages,
+            'errors': self.errors,
+            'table_only': self.table_only,
+            'llm_calls': self.llm_calls,
+            'cache_hits': self.cache_hits,
+            'fields_from_table': self.fields_from_table,
+            'fields_from_llm': self.fields_from_llm,
+            'fields_missing': self.fields_missing,
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens,
+            'baseline_tokens_est': self.baseline_tokens,
+            'tokens_saved_est': self.tokens_saved,
+            'elapsed_s': round(self.elapsed, 3),
+            'pages_per_s': round(self.pages_per_s, 2),
+        }
+
+
+class SpecExtractor:
+    """Extracción de los campos de Product: primero la tabla, el LLM sólo para lo que falte.
+
+    Las filas de especificaciones se leen de forma determinista; si aún falta
+    algún campo se le piden exactamente esos al LLM, con el HTML de la tabla.
+    Las respuestas se guardan por hash del contenido, así que una ficha
+    repetida (o la misma en otra ejecución) no vuelve a llamar al LLM.
+    Con use_table=False todo va al LLM (el comportamiento anterior, para comparar).
+    """
+
+    def __init__(self, llm=None, cache=None, use_table=True):
+        self.llm = llm
+        self.cache = cache
+        self.use_table = use_table
+        self.stats = ExtractionStats()
+        # Consultas en curso por clave: dos fichas iguales a la vez comparten la misma llamada
+        self._pending = {}
+
+    async def extract(self, session, url, html):
+        rows, table_html = spec_rows(html)
+        fields = table_fields(rows) if self.use_table else {}
+        missing = [field for field in PRODUCT_FIELDS if field not in fields]
+        stats = self.stats
+        stats.pages += 1
+        stats.baseline_tokens += (estimate_tokens(build_instruction(list(PRODUCT_FIELDS)) + table_html)
+                                  + estimate_tokens(json.dumps(dict.fromkeys(PRODUCT_FIELDS, "valor"))))
+        stats.fields_from_table += len(fields)
+        if not missing:
+            stats.table_only += 1
+        elif self.llm is not None and table_html:
+            found = await self._ask_llm(session, table_html, missing)
+            stats.fields_from_llm += len(found)
+            fields.update(found)
+        stats.fields_missing += sum(field not in fields for field in PRODUCT_FIELDS)
+        return {"URL": url, **{field: fields.get(field, "") for field in PRODUCT_FIELDS}}
+
+    async def _ask_llm(self, session, table_html, fields):
+        key = LLMCache.key(self.llm.model, fields, table_html)
+        if key in self._pending:
+            self.stats.cache_hits += 1
+            return dict(await self._pending[key])
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.stats.cache_hits += 1
+                return cached
+        task = asyncio.ensure_future(self._call_llm(session, table_html, fields, key))
+        self._pending[key] = task
+        try:
+            return dict(await task)
+        finally:
+            del self._pending[key]
+
+    async def _call_llm(self, session, table_html, fields, key):
+        try:
+            found, prompt_tokens, completion_tokens = await self.llm.extract(session, table_html, fields)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            # Fallos del servidor o de su respuesta: la ficha se queda con los campos de la tabla.
+            # Cualquier otra excepción es un error de programación y se propaga
+            self.stats.errors += 1
+            print(f"Error al consultar el LLM: {type(e).__name__} {e}")
+            return {}
+        self.stats.llm_calls += 1
+        self.stats.prompt_tokens += prompt_tokens
+        self.stats.completion_tokens += completion_tokens
+        if self.cache is not None:
+            self.cache.put(key, found)
+        return found
@@ -0,0 +1,242 @@
+import csv
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+from normalize import EXPORT_FIELDNAMES, FIELDNAMES, simplify_many
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'specs.db')
+BATCH_SIZE = 500
+PRODUCT_COLUMNS = ['store', 'url', 'Titulo', 'Marca']
+
+
+def _simplified(docs):
+    # Columnas de entrenamiento calculadas al guardar (un lote a la vez), para exportarlas sin releer los documentos
+    table = simplify_many(docs).astype(object)
+    return table.where(table.notna(), None).values.tolist()
+
+
+def _quoted(col):
+    return '"' + col.replace('"', '""') + '"'
+
+
+class SQLiteCollection:
+    """Colección de fichas de una tienda con interfaz al estilo de pymongo.
+
+    Los documentos se guardan por URL de producto (upsert): volver a insertar
+    una ficha la actualiza en vez de duplicarla. Las escrituras van en lotes
+    dentro de una transacción y la base usa WAL para no bloquear a los lectores.
+    """
+
+    def __init__(self, store, path=DEFAULT_DB_PATH):
+        self.store = store
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        columns = ', '.join(f'{_quoted(col)} TEXT' for col in FIELDNAMES)
+        with self._conn:
+            self._conn.execute(f'''
+                CREATE TABLE IF NOT EXISTS specs (
+                    url TEXT PRIMARY KEY,
+                    store TEXT NOT NULL,
+                    doc TEXT NOT NULL,
+                    {columns},
+                    updated_at REAL NOT NULL
+                )''')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_specs_store ON specs (store, url)')
+
+    def close(self):
+        self._conn.close()
+
+    def bulk_upsert(self, docs, batch_size=BATCH_SIZE):
+        # Inserta o actualiza por URL en lotes; devuelve cuántos documentos se han escrito
+        columns = ['url', 'store', 'doc'] + FIELDNAMES + ['updated_at']
+        placeholders = ', '.join('?' for _ in columns)
+        updates = ', '.join(f'{_quoted(col)} = excluded.{_quoted(col)}' for col in columns[1:])
+        sql = (f'INSERT INTO specs ({", ".join(_quoted(c) for c in columns)}) VALUES ({placeholders}) '
+               f'ON CONFLICT(url) DO UPDATE SET {updates}')
+        now = time.time()
+
+        def write(batch):
+            rows = [[doc['URL'], self.store, json.dumps(doc, ensure_ascii=False)] + simplified + [now]
+                    for doc, simplified in zip(batch, _simplified(batch))]
+            with self._conn:
+                self._conn.executemany(sql, rows)
+            return len(rows)
+
+        written = 0
+        batch = []
+        with self._lock:
+            for doc in docs:
+                doc = {k: v for k, v in doc.items() if k != '_id'}
+                if not doc.get('URL'):
+                    continue
+                batch.append(doc)
+                if len(batch) >= batch_size:
+                    written += write(batch)
+                    batch = []
+            if batch:
+                written += write(batch)
+        return written
+
+    # Interfaz de pymongo que ya usaban los notebooks
+    def insert_one(self, doc):
+        return self.bulk_upsert([doc])
+
+    def insert_many(self, docs):
+        return self.bulk_upsert(docs)
+
+    def find(self, filter=None):
+        filter = dict(filter or {})
+        sql = 'SELECT doc FROM specs WHERE store = ?'
+        params = [self.store]
+        # La URL va por el índice; el resto de condiciones se comprueban sobre el documento
+        if 'URL' in filter:
+            sql += ' AND url = ?'
+            params.append(filter.pop('URL'))
+        with self._lock:
+            rows = self._conn.execute(sql + ' ORDER BY url', params).fetchall()
+        docs = (json.loads(doc) for (doc,) in rows)
+        return [doc for doc in docs if all(doc.get(k) == v for k, v in filter.items())]
+
+    def find_one(self, filter=None):
+        docs = self.find(filter)
+        return docs[0] if docs else None
+
+    def count_documents(self, filter=None):
+        if not filter:
+            with self._lock:
+                return self._conn.execute('SELECT COUNT(*) FROM specs WHERE store = ?', (self.store,)).fetchone()[0]
+        return len(self.find(filter))
+
+    def training_rows(self, all_stores=False):
+        # Tabla Procesador…Precio + URL en una sola consulta (una fila por URL: ya no hay que deduplicar)
+        sql = f'SELECT {", ".join(_quoted(c) for c in FIELDNAMES)}, url FROM specs'
+        params = []
+        if not all_stores:
+            sql += ' WHERE store = ?'
+            params.append(self.store)
+        with self._lock:
+            return self._conn.execute(sql + ' ORDER BY store, url', params).fetchall()
+
+    def product_table(self, all_stores=False):
+        # Tabla para la resolución de entidades: tienda, URL, título y marca de la ficha + columnas de entrenamiento
+        sql = (f"SELECT store, url, json_extract(doc, '$.Titulo'), json_extract(doc, '$.Marca'), "
+               f"{', '.join(_quoted(c) for c in FIELDNAMES)} FROM specs")
+        params = []
+        if not all_stores:
+            sql += ' WHERE store = ?'
+            params.append(self.store)
+        with self._lock:
+            rows = self._conn.execute(sql + ' ORDER BY store, url', params).fetchall()
+        return pd.DataFrame(rows, columns=PRODUCT_COLUMNS + FIELDNAMES)
+
+    def content_hash(self, all_stores=False):
+        # Hash de las fichas guardadas (tienda, URL y documento; no la hora de escritura): cambia si cambia lo exportado
+        sql = 'SELECT store, url, doc FROM specs'
+        params = []
+        if not all_stores:
+            sql += ' WHERE store = ?'
+            params.append(self.store)
+        digest = hashlib.sha256()
+        with self._lock:
+            for row in self._conn.execute(sql + ' ORDER BY store, url', params):
+                digest.update('\0'.join(row).encode('utf-8') + b'\n')
+        return digest.hexdigest()[:16]
+
+    def export_training_table(self, csv_path, all_stores=False):
+        # all_stores=True junta todas las tiendas de la base (specs_simplified_all.csv)
+        rows = self.training_rows(all_stores)
+        with open(csv_path, 'w', newline='', encoding='utf-8') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(EXPORT_FIELDNAMES)
+            writer.writerows(rows)
+        return len(rows)
+
+
+class MongoCollection:
+    # Mismo interfaz sobre MongoDB: upserts por URL con bulk_write en vez de insert_one uno a uno
+
+    def __init__(self, store, uri='mongodb://localhost:27017/'):
+        from pymongo import MongoClient
+
+        self.store = store
+        self._collection = MongoClient(uri)[store]['portatiles']
+        self._collection.create_index('URL', unique=True)
+
+    def bulk_upsert(self, docs, batch_size=BATCH_SIZE):
+        from pymongo import UpdateOne
+
+        written = 0
+        batch = []
+        for doc in docs:
+            doc = {k: v for k, v in doc.items() if k != '_id'}
+            if not doc.get('URL'):
+                continue
+            batch.append(UpdateOne({'URL': doc['URL']}, {'$set': doc}, upsert=True))
+            if len(batch) >= batch_size:
+                self._collection.bulk_write(batch, ordered=False)
+                written += len(batch)
+                batch = []
+        if batch:
+            self._collection.bulk_write(batch, ordered=False)
+            written += len(batch)
+        return written
+
+    def insert_one(self, doc):
+        return self.bulk_upsert([doc])
+
+    def insert_many(self, docs):
+        return self.bulk_upsert(docs)
+
+    def find(self, filter=None):
+        return list(self._collection.find(filter or {}))
+
+    def find_one(self, filter=None):
+        return self._collection.find_one(filter or {})
+
+    def count_documents(self, filter=None):
+        return self._collection.count_documents(filter or {})
+
+    def training_rows(self, all_stores=False):
+        # En MongoDB cada tienda es una base distinta: sólo se exporta la de esta colección
+        docs = list(self._collection.find({}, {'_id': 0}))
+        return [row + [doc.get('URL')] for row, doc in zip(_simplified(docs), docs)]
+
+    def product_table(self, all_stores=False):
+        docs = list(self._collection.find({}, {'_id': 0}))
+        table = pd.DataFrame(_simplified(docs), columns=FIELDNAMES)
+        info = pd.DataFrame([[self.store, doc.get('URL'), doc.get('Titulo'), doc.get('Marca')] for doc in docs],
+                            columns=PRODUCT_COLUMNS)
+        return pd.concat([info, table], axis=1)
+
+    def content_hash(self, all_stores=False):
+        docs = self._collection.find({}, {'_id': 0}).sort('URL', 1)
+        digest = hashlib.sha256(self.store.encode('utf-8') + b'\n')
+        for doc in docs:
+            digest.update(json.dumps(doc, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8') + b'\n')
+        return digest.hexdigest()[:16]
+
+    def export_training_table(self, csv_path, all_stores=False):
+        rows = self.training_rows(all_stores)
+        with open(csv_path, 'w', newline='', encoding='utf-8') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(EXPORT_FIELDNAMES)
+            writer.writerows(rows)
+        return len(rows)
+
+
+def open_collection(store, backend='sqlite', **options):
+    # backend='sqlite' (por defecto, fichero local) o 'mongo' (el servidor que usaban los notebooks)
+    if backend == 'sqlite':
+        return SQLiteCollection(store, **options)
+    if backend == 'mongo':
+        return MongoCollection(store, **options)
+    raise ValueError(f"Backend de almacenamiento desconocido: {backend}")